@@ -1,6 +1,7 @@
 import os
 import re
 import sys
+import time
 import copy
 import warnings
 import functools
@@ -9,7 +10,9 @@ import traceback
 import numpy as np
 
 from . import mpi
-from .utils import BaseClass, UserDict, Monitor, deep_eq, is_sequence
+from .jax import jax
+from .jax import numpy as jnp
+from .utils import BaseClass, UserDict, Monitor, LRUCache, CallProfile, ProfileReport, deep_eq, is_sequence
 from .io import BaseConfig
 from .parameter import Parameter, ParameterCollection, ParameterConfig, ParameterCollectionConfig, ParameterArray, Samples
 
@@ -116,10 +119,23 @@ for name in ['__delitem__', '__getitem__', '__setitem__', 'clear', 'fromkeys', '
     setattr(InitConfig, name, _make_wrapper(getattr(UserDict, name)))
 
 
+def _value_changed(value1, value2):
+    # Is parameter value ``value2`` different from ``value1``?
+    if value1 is value2:
+        return False
+    if type(value1) is not type(value2):
+        return True
+    try:
+        return bool(value1 != value2)
+    except Exception:  # e.g. arrays, jax tracers
+        return True
+
+
 class BasePipeline(BaseClass):
     """
     Pipeline, used internally in the code, connecting all caclulators up to the calculator that it is attached to
     (:attr:`calculator.runtime_info.pipeline`).
+    Set :attr:`nthreads` > 1 to run independent branches of the calculator tree concurrently (see :meth:`calculate`).
     """
     def __init__(self, calculator):
         """
@@ -145,7 +161,13 @@ class BasePipeline(BaseClass):
             calculator.runtime_info.tocalculate = True
         self._params = ParameterCollection()
         self._set_params()
-        self.more_derived, self.more_calculate = None, None
+        self.more_derived, self.more_calculate, self.more_batch_calculate = None, None, None
+        self.calculate_overridden = False  # set when calculate is replaced (e.g. by Differentiation), to disable batch and jitted calculation
+        self.jit = False
+        self.nthreads = 1
+        self.mpischedule, self.mpichunksize = 'static', 1
+        self.mpistats = None
+        self.profile_fn = self.trace_fn = None
 
     def _set_params(self, params=None):
         # Internal method to reset parameters, based on calculator's :class:`BaseCalculator.runtime_info.params`
@@ -187,6 +209,46 @@ class BasePipeline(BaseClass):
         self._varied_params = self._params.select(varied=True, derived=False)
         self.input_values = {param.name: param.value for param in self._params}
         self.derived = Samples()
+        self._jit_cache = {}
+        self._last_input_values = self._last_values = None
+
+    def _set_dependency_index(self):
+        # Internal method to map each parameter to the parameters that depend on it (through :attr:`Parameter.depends`),
+        # and to the indices of calculators that take it as input
+        self._params_by_name = {param.name: param for param in self._params}
+        self._depends_params = [param for param in self._params if param.depends]
+        self._depends_on = {}
+        for param in self._depends_params:
+            for name in param.depends.values():
+                self._depends_on.setdefault(name, []).append(param.name)
+        self._input_calculators = {}
+        for icalculator, calculator in enumerate(self.calculators):
+            for name in calculator.runtime_info.input_names:
+                self._input_calculators.setdefault(name, []).append(icalculator)
+        self._input_versions = [None] * len(self.calculators)
+
+    def _eval_input_values(self):
+        # Internal method to evaluate parameter values (including those with :attr:`Parameter.depends`) given :attr:`input_values`,
+        # only re-evaluating those that depend on input values that changed since the last call.
+        # Returns parameter values and a dictionary mapping indices of calculators to the names of their changed input parameters,
+        # or ``None`` if all calculators are to be updated
+        if self._last_values is None:
+            self._set_dependency_index()
+            values, changed = self.params.eval(**self.input_values), None
+        else:
+            last_input_values, values = self._last_input_values, dict(self._last_values)
+            names = [name for name, value in self.input_values.items() if name not in last_input_values or _value_changed(last_input_values[name], value)]
+            for name in list(names):
+                for dname in self._depends_on.get(name, []):
+                    if dname not in names: names.append(dname)  # a parameter may depend on several changed inputs
+            changed = {}
+            for name in names:
+                if name in self._params_by_name:
+                    values[name] = self._params_by_name[name].eval(**self.input_values)
+                for icalculator in self._input_calculators.get(name, []):
+                    changed.setdefault(icalculator, []).append(name)
+        self._last_input_values, self._last_values = dict(self.input_values), values
+        return values, changed
 
     @property
     def params(self):
@@ -224,24 +286,39 @@ class BasePipeline(BaseClass):
         Calculate, i.e. call calculators' :meth:`BaseCalculator.calculate` if their parameters are updated,
         or if they depend on previous calculation that has been updated.
         Derived parameter values are stored in :attr:`derived`.
+        If :attr:`nthreads` > 1, calculators that do not depend on each other are run concurrently on a pool of :attr:`nthreads` threads
+        (which only helps if their calculations release the GIL, as most of numpy, jax or C extensions do);
+        else they are run one after the other.
         """
         for name in params:
             if name not in self.params:
                 raise PipelineError('Input parameter {} is not one of parameters: {}'.format(name, self.params))
         self.input_values.update(params)
-        params = self.params.eval(**self.input_values)
+        params, changed = self._eval_input_values()
         self.derived, self.error = Samples(), None
-        for param in self._params:
-            if param.depends: self.derived.set(ParameterArray(np.asarray(params[param.name]), param=param))
-        for calculator in self.calculators:  # start by first calculator
+        for param in self._depends_params:
+            self.derived.set(ParameterArray(np.asarray(params[param.name]), param=param))
+        for icalculator, calculator in enumerate(self.calculators):  # start by first calculator
             runtime_info = calculator.runtime_info
-            runtime_info.set_input_values(params, full=True)
+            runtime_info.update_params()  # set input names and values from calculator's parameters, if updated
+            # Only update input values of calculators that depend on changed parameters,
+            # unless input values have been set by someone else (e.g. another pipeline) in the meantime
+            if changed is None or runtime_info._input_version != self._input_versions[icalculator]:
+                if changed is not None: self._last_values = None  # calculator parameters may have changed: rebuild index at next call
+                runtime_info.set_input_values(params, full=True)
+            elif icalculator in changed:
+                runtime_info.set_input_values({name: params[name] for name in changed[icalculator]}, full=True)
+            self._input_versions[icalculator] = runtime_info._input_version
+            if self.nthreads > 1: continue
             try:
                 result = runtime_info.calculate()
             except Exception as exc:
-                self.error = (exc, traceback.format_exc())
-                raise PipelineError('Error in method calculate of {} with calculator parameters {} and pipeline parameters {}'.format(calculator, runtime_info.input_values, self.input_values)) from exc
+                self._calculate_error(calculator, exc)
             self.derived.update(runtime_info.derived)
+        if self.nthreads > 1:
+            result = self._threaded_calculate()
+            for calculator in self.calculators:
+                self.derived.update(calculator.runtime_info.derived)
         if self.more_calculate:
             toret = self.more_calculate()
             if toret is not None: result = toret
@@ -250,8 +327,71 @@ class BasePipeline(BaseClass):
             if tmp is not None: self.derived.update(tmp)
         return result
 
+    def _calculate_error(self, calculator, exc):
+        # Internal method to raise :class:`PipelineError` when calculation of ``calculator`` fails with exception ``exc``
+        self._last_values = None  # next calculators may have not been updated: update all at next call
+        self.error = (exc, ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__)))
+        raise PipelineError('Error in method calculate of {} with calculator parameters {} and pipeline parameters {}'.format(calculator, calculator.runtime_info.input_values, self.input_values)) from exc
+
+    def _threaded_calculate(self):
+        # Internal method to calculate all calculators, running independent branches concurrently on :attr:`nthreads` threads.
+        # A calculator is submitted as soon as all calculators it depends upon are calculated; returns the result of the last calculator
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        indices = {id(calculator): icalculator for icalculator, calculator in enumerate(self.calculators)}
+        nrequires = [0] * len(self.calculators)
+        required_by = [[] for calculator in self.calculators]
+        for icalculator, calculator in enumerate(self.calculators):
+            for require in calculator.runtime_info.requires:
+                irequire = indices.get(id(require), None)
+                if irequire is not None:
+                    nrequires[icalculator] += 1
+                    required_by[irequire].append(icalculator)
+        results, errors, futures = {}, {}, {}
+        with ThreadPoolExecutor(max_workers=self.nthreads) as executor:
+
+            def submit(icalculator):
+                futures[executor.submit(self.calculators[icalculator].runtime_info.calculate)] = icalculator
+
+            for icalculator, nrequire in enumerate(nrequires):
+                if not nrequire: submit(icalculator)
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=futures.get):
+                    icalculator = futures.pop(future)
+                    try:
+                        results[icalculator] = future.result()
+                    except Exception as exc:
+                        errors[icalculator] = exc
+                        continue
+                    if errors: continue  # do not submit new calculations
+                    for idependent in required_by[icalculator]:
+                        nrequires[idependent] -= 1
+                        if not nrequires[idependent]: submit(idependent)
+        if errors:  # report first error, in pipeline order
+            icalculator = min(errors)
+            self._calculate_error(self.calculators[icalculator], errors[icalculator])
+        return results[len(self.calculators) - 1]
+
     def mpicalculate(self, **params):
-        """MPI-parallel version of the above: one can pass arrays as input parameter values."""
+        """
+        MPI-parallel version of the above: one can pass arrays as input parameter values.
+        If :attr:`jit` is ``True`` and the pipeline can be traced by jax, points are calculated with a (cached) jitted function
+        (see :meth:`get_jit`).
+        Else, if all calculators that depend on varying parameters accept a leading batch axis (see :class:`BaseCalculator`),
+        points are calculated all at once on each MPI rank (including analytic marginalization over solved parameters, if these enter linearly);
+        else calculation falls back to a loop over points.
+
+        If :attr:`mpischedule` is 'static' (default), points are evenly scattered over MPI ranks.
+        If 'dynamic', the root rank hands out chunks of :attr:`mpichunksize` points on demand to the other ranks,
+        which send back results as soon as they are done (with :class:`utils.MPITaskManager`):
+        this balances the load when the calculation time varies from one point to the other.
+        Utilization statistics are stored in :attr:`mpistats` (on the root rank): ``wall_time``, and for each rank,
+        ``npoints`` (number of calculated points), ``busy_time`` (time spent calculating) and ``utilization`` (``busy_time / wall_time``).
+        """
+        t0 = time.time()
+        dynamic = self.mpischedule == 'dynamic' and self.mpicomm.size > 1
+        if self.mpischedule not in ['static', 'dynamic']:
+            raise PipelineError('Unknown MPI schedule {}; should be one of ["static", "dynamic"]'.format(self.mpischedule))
         size, cshape = 0, ()
         names = self.mpicomm.bcast(list(params.keys()) if self.mpicomm.rank == 0 else None, root=0)
         for name in names:
@@ -260,8 +400,12 @@ class BasePipeline(BaseClass):
                 array = np.asarray(params[name])
                 cshape = array.shape
                 array = array.ravel()
-            params[name] = mpi.scatter(array, mpicomm=self.mpicomm, mpiroot=0)
-            size = params[name].size
+            if dynamic:  # points stay on the root rank, which will distribute them
+                params[name] = array
+                size = array.size if array is not None else 0
+            else:
+                params[name] = mpi.scatter(array, mpicomm=self.mpicomm, mpiroot=0)
+                size = params[name].size
         cumsizes = np.cumsum([0] + self.mpicomm.allgather(size))
         self.derived, self.errors = Samples(), {}
         if not cumsizes[-1]:
@@ -272,23 +416,32 @@ class BasePipeline(BaseClass):
             return
         mpicomm, more_derived = self.mpicomm, self.more_derived
         self.mpicomm, self.more_derived = mpi.COMM_SELF, None
-        states = {}
-        for ivalue in range(size):
-            istate = ivalue + cumsizes[mpicomm.rank]
-            try:
-                self.calculate(**{name: value[ivalue] for name, value in params.items()})
-            except PipelineError as exc:
-                if self.error is None:
-                    self.error = (exc, traceback.format_exc())
-                states[istate] = self.error
-                continue
-            states[istate] = self.derived
-            if more_derived:
-                tmp = more_derived(istate)
-                if tmp is not None: states[istate].update(tmp)
-        self.mpicomm, self.more_derived = mpicomm, more_derived
-        states = self.mpicomm.gather(states, root=0)
+        try:
+            if dynamic:
+                from .utils import MPITaskManager
+                tasks = []
+                if mpicomm.rank == 0:
+                    tasks = [(start, {name: value[start:start + self.mpichunksize] for name, value in params.items()}) for start in range(0, size, self.mpichunksize)]
+
+                def calculate(start, params):
+                    return self._calculate_points(start, more_derived=more_derived, **params)
+
+                with MPITaskManager(mpicomm=mpicomm) as tm:
+                    states = tm.map(calculate, tasks)
+                npoints = [sum(len(tasks[itask][1][names[0]]) for itask in itasks) for itasks in tm.stats['tasks']] if mpicomm.rank == 0 else None
+                busy_time = tm.stats['busy_time']
+            else:
+                t1 = time.time()
+                states = self._calculate_points(cumsizes[mpicomm.rank], more_derived=more_derived, **params)
+                busy_time = mpicomm.gather(time.time() - t1, root=0)
+                npoints = np.diff(cumsizes).tolist()
+                states = mpicomm.gather(states, root=0)
+        finally:
+            self.mpicomm, self.more_derived = mpicomm, more_derived
         if self.mpicomm.rank == 0:
+            wall_time = time.time() - t0
+            self.mpistats = {'wall_time': wall_time, 'npoints': npoints, 'busy_time': busy_time, 'utilization': [busy / wall_time for busy in busy_time]}
+            self.log_debug('MPI utilization of ranks: {}.'.format(', '.join(['{:.2f}'.format(utilization) for utilization in self.mpistats['utilization']])))
             cstate = {}
             for state in states:
                 cstate.update(state)
@@ -308,6 +461,305 @@ class BasePipeline(BaseClass):
             if samples:
                 self.derived = Samples.concatenate(samples).reshape(cshape)
 
+    def _calculate_points(self, start, more_derived=None, **params):
+        # Internal method to calculate input points (arrays of same size for each parameter), with indices starting at ``start``.
+        # Returns a dictionary mapping point index to derived parameters (:class:`Samples`), or error
+        size = len(next(iter(params.values())))
+        states, derived = {}, None
+        if not size:
+            return states
+        if more_derived is None and self.jit:
+            derived = self._jit_calculate(size, **params)
+        if more_derived is None and derived is None:
+            derived = self._batch_calculate(size, **params)
+        if derived is not None:
+            for ivalue in range(size):
+                states[ivalue + start] = derived[ivalue]
+            size = 0  # no need to loop
+        for ivalue in range(size):
+            istate = ivalue + start
+            try:
+                self.calculate(**{name: value[ivalue] for name, value in params.items()})
+            except PipelineError as exc:
+                if self.error is None:
+                    self.error = (exc, traceback.format_exc())
+                states[istate] = self.error
+                continue
+            states[istate] = self.derived
+            if more_derived:
+                tmp = more_derived(istate)
+                if tmp is not None: states[istate].update(tmp)
+        return states
+
+    def set_profile(self, profile=True, save_fn=None, trace_fn=None):
+        """
+        Enable (or disable, if ``profile`` is ``False``) profiling of calculators' :meth:`BaseCalculator.calculate`:
+        for each calculator, record number of calls, of skipped calls (input parameters unchanged, or state restored from cache),
+        their duration and memory change (the latter requires package psutil to be installed).
+        Calls to :meth:`BaseCalculator.initialize` are always recorded. See :meth:`get_profile` to get the report.
+
+        Parameters
+        ----------
+        profile : bool, default=True
+            Whether to enable profiling. If ``True``, previous records of :meth:`BaseCalculator.calculate` calls are reset.
+
+        save_fn : str, Path, default=None
+            If not ``None``, where :meth:`dump_profile` saves the report, as JSON.
+
+        trace_fn : str, Path, default=None
+            If not ``None``, where :meth:`dump_profile` saves the recorded calls, in Chrome trace format.
+        """
+        for calculator in self.calculators:
+            calculator.runtime_info.calculate_profile = CallProfile() if profile else None
+        self.profile_fn, self.trace_fn = save_fn, trace_fn
+
+    def get_profile(self, mpicomm=None, mpiroot=0):
+        """
+        Return :class:`utils.ProfileReport` of calls to calculators' :meth:`BaseCalculator.initialize` and :meth:`BaseCalculator.calculate`
+        (if profiling is enabled, see :meth:`set_profile`), gathered over all ranks of ``mpicomm`` on rank ``mpiroot``
+        (``None`` is returned on other ranks). This is a collective operation.
+        """
+        if mpicomm is None: mpicomm = self.mpicomm
+        names = [calculator.runtime_info.name for calculator in self.calculators]
+        profiles = {}
+        for icalculator, (name, calculator) in enumerate(zip(names, self.calculators)):
+            if names.count(name) > 1:
+                name = '{}_{:d}'.format(name, names[:icalculator].count(name))
+            runtime_info = calculator.runtime_info
+            profiles[name] = {'initialize': runtime_info.initialize_profile}
+            if runtime_info.calculate_profile is not None:
+                profiles[name]['calculate'] = runtime_info.calculate_profile
+        return ProfileReport.gather(ProfileReport(profiles), mpicomm=mpicomm, mpiroot=mpiroot)
+
+    def dump_profile(self, mpicomm=None, mpiroot=0):
+        """
+        If profiling is enabled (see :meth:`set_profile`), log the profiling report (:meth:`get_profile`),
+        and save it to :attr:`profile_fn` (JSON) and :attr:`trace_fn` (Chrome trace format), if provided.
+        Typically called at the end of a run by samplers and profilers. This is a collective operation.
+        """
+        if mpicomm is None: mpicomm = self.mpicomm
+        if not any(calculator.runtime_info.calculate_profile is not None for calculator in self.calculators):
+            return
+        report = self.get_profile(mpicomm=mpicomm, mpiroot=mpiroot)
+        if mpicomm.rank == mpiroot:
+            self.log_info('Profile of pipeline calculators:\n{}'.format(report.table()))
+            if self.profile_fn is not None:
+                report.to_json(self.profile_fn)
+            if self.trace_fn is not None:
+                report.to_chrome_trace(self.trace_fn)
+
+    def _batch_calculate(self, size, **params):
+        # Internal method to calculate all ``size`` input points at once, if all calculators that depend on the input varying parameters
+        # accept a leading batch axis (see :class:`BaseCalculator`).
+        # Returns derived parameters (:class:`Samples` of shape ``(size,)``), or ``None`` if this is not possible,
+        # in which case one should fall back to point-by-point calculation
+        if size <= 1 or (self.more_calculate is not None and self.more_batch_calculate is None) or self.calculate_overridden:
+            return None
+        if any(name not in self.params for name in params):
+            return None
+        input_values = dict(self.input_values)
+        for name, value in params.items():
+            value = np.asarray(value)
+            input_values[name] = value if np.any(value != value[0]) else value[0]
+        values = self.params.eval(**input_values)
+        varied = [name for name, value in values.items() if np.ndim(value)]
+        if not varied:
+            return None
+        calculators, batch_calculators = [], []
+        for calculator in self.calculators:
+            runtime_info = calculator.runtime_info
+            runtime_info.update_params()  # set input names and values from calculator's parameters, if updated
+            if any(name in runtime_info.input_names for name in varied) or any(require in batch_calculators for require in runtime_info.requires):
+                if not runtime_info.batch:
+                    return None
+                batch_calculators.append(calculator)
+            calculators.append(calculator)
+        self.input_values.update(input_values)
+        self.error = None
+
+        def calculate(values, names=None):
+            # Calculate all points for input values; if ``names`` is provided, only update calculators that depend on these parameters
+            batch_values = {name: np.broadcast_to(value, (size,) + np.shape(value)) if name not in varied else value for name, value in values.items()}
+            derived, updated = Samples(), []
+            for param in self._params:
+                if param.depends: derived.set(ParameterArray(batch_values[param.name], param=param))
+            for calculator in calculators:
+                runtime_info = calculator.runtime_info
+                if names is not None:
+                    if not (any(name in runtime_info.input_names for name in names) or any(require in updated for require in runtime_info.requires)):
+                        continue
+                    updated.append(calculator)
+                if calculator in batch_calculators:
+                    runtime_info.batch_size = size
+                    runtime_info.set_input_values(batch_values, full=True, force=True)
+                    runtime_info.calculate()
+                    derived.update(runtime_info.derived)
+                else:
+                    runtime_info.set_input_values(values, full=True)
+                    runtime_info.calculate()
+                    derived.update(Samples.concatenate([runtime_info.derived] * size))
+            return derived
+
+        try:
+            derived = calculate(values)
+            if self.more_calculate is not None:
+                # Batch version of more_calculate, e.g. analytic marginalization
+                tmp = self.more_batch_calculate(size, values, calculate)
+                if tmp is None: derived = None
+                else: derived.update(tmp)
+        except Exception as exc:
+            # E.g. a calculator does not actually support the batch axis, or fails for some of the points:
+            # fall back to point-by-point calculation, which records errors for each point
+            self.log_debug('Batch calculation failed, falling back to point-by-point calculation: {!r}'.format(exc))
+            derived = None
+        finally:
+            for calculator in batch_calculators:
+                # Calculator state holds all points: next call must trigger calculation
+                runtime_info = calculator.runtime_info
+                runtime_info.batch_size = None
+                runtime_info.input_values = {basename: value[-1] if np.ndim(value) else value for basename, value in runtime_info.input_values.items()}
+                runtime_info.tocalculate = True
+            for name, value in params.items():
+                self.input_values[name] = value[-1]
+        return derived
+
+    def get_jit(self, params=None, grad=None):
+        """
+        Return jitted function, taking as positional arguments values (of same shape) for parameters ``params``,
+        and returning a dictionary mapping derived parameter names (including ``loglikelihood`` and ``logprior`` for a likelihood)
+        to their values, with the same leading shape.
+        The function is traced once (for each input shape), and cached for the current calculators, parameters ``params``
+        and values of other parameters.
+        ``None`` is returned if the pipeline cannot be traced by jax.
+
+        Parameters
+        ----------
+        params : list, ParameterCollection, default=None
+            Input parameters. Defaults to :attr:`varied_params`.
+
+        grad : str, Parameter, list, default=None
+            If not ``None``, (scalar) derived parameter(s), e.g. ``['loglikelihood', 'logprior']``, whose sum is differentiated
+            w.r.t. ``params`` (with jax). The function then returns a tuple of the above dictionary
+            and the gradient, of same leading shape as input values, and last dimension ``len(params)``.
+
+        Returns
+        -------
+        func : callable, None
+        """
+        if params is None:
+            params = self.varied_params
+        names = [str(param) for param in params]
+        if grad is not None:
+            grad = tuple(str(name) for name in (grad if is_sequence(grad) else [grad]))
+        if jax is None or self.more_calculate is not None or self.calculate_overridden:
+            return None
+        if any(name not in self.params for name in names):
+            raise PipelineError('Input parameters {} are not all in parameters: {}'.format(names, self.params))
+        key = (tuple(id(calculator) for calculator in self.calculators), tuple(names),
+               tuple((name, value) for name, value in self.input_values.items() if name not in names), grad)
+        try:
+            hash(key)
+        except TypeError:  # fixed values are not hashable
+            return None
+        if key in self._jit_cache:
+            return self._jit_cache[key]
+        traced = names + [param.name for param in self._params if param.depends]
+        derived_params = {param.name: param for param in self._params if param.depends}
+        for calculator in self.calculators:
+            for param in calculator.runtime_info.derived_params:
+                derived_params[param.name] = param
+
+        def calculate(*values):
+            input_values_bak = dict(self.input_values)
+            runtime_input_values_bak = [dict(calculator.runtime_info.input_values) for calculator in self.calculators]
+            try:
+                self.input_values.update(dict(zip(names, values)))
+                params = self.params.eval(**self.input_values)
+                toret = {param.name: jnp.asarray(params[param.name]) for param in self._params if param.depends}
+                for calculator in self.calculators:
+                    runtime_info = calculator.runtime_info
+                    force = True if any(name in runtime_info.input_names for name in traced) else None
+                    runtime_info.set_input_values(params, full=True, force=force)
+                    runtime_info.calculate()
+                    if runtime_info.derived_params:
+                        state = calculator.__getstate__()
+                        for param in runtime_info.derived_params:
+                            name = param.basename
+                            if name in state: value = state[name]
+                            else: value = getattr(calculator, name)
+                            toret[param.name] = jnp.asarray(value)
+                if self.more_calculate is not None:
+                    raise PipelineError('Cannot jit pipeline with more_calculate')
+                return toret
+            finally:
+                # Calculators hold traced values: next call must trigger calculation
+                self.input_values.clear()
+                self.input_values.update(input_values_bak)
+                for calculator, input_values in zip(self.calculators, runtime_input_values_bak):
+                    calculator.runtime_info.input_values = input_values
+                    calculator.runtime_info.tocalculate = True
+
+        if grad is None:
+            func = jax.jit(jax.vmap(calculate))
+        else:
+
+            def value_and_grad(*values):
+
+                def fun(*values):
+                    toret = calculate(*values)
+                    return sum(toret[name] for name in grad), toret
+
+                (_, toret), gradient = jax.value_and_grad(fun, argnums=tuple(range(len(values))), has_aux=True)(*values)
+                return toret, jnp.stack(gradient, axis=-1)
+
+            func = jax.jit(jax.vmap(value_and_grad))
+
+        def wrapper(*values):
+            values = [jnp.asarray(value) for value in values]
+            shape = values[0].shape
+            toret = func(*[value.ravel() for value in values])
+            if grad is not None:
+                toret, gradient = toret
+            toret = {name: value.reshape(shape + value.shape[1:]) for name, value in toret.items()}
+            if grad is not None:
+                return toret, gradient.reshape(shape + gradient.shape[1:])
+            return toret
+
+        wrapper.derived_params = derived_params
+        try:
+            wrapper(*[jnp.full(1, self.input_values[name], dtype=None if grad is None else 'f8') for name in names])  # trace
+        except Exception as exc:
+            self.log_debug('Pipeline cannot be traced by jax: {}'.format(exc))
+            wrapper = None
+        self._jit_cache[key] = wrapper
+        return wrapper
+
+    def _jit_calculate(self, size, **params):
+        # Internal method to calculate all ``size`` input points at once with the jitted pipeline.
+        # Returns derived parameters (:class:`Samples` of shape ``(size,)``), or ``None`` if this is not possible
+        if any(name not in self.params for name in params):
+            return None
+        values = {name: np.asarray(value) for name, value in params.items()}
+        for name, value in values.items():
+            self.input_values[name] = value[-1]  # as after calculate() of the last point
+        func = self.get_jit(list(values))
+        if func is None:
+            return None
+        # Pad to the next power of 2, to limit the number of compilations
+        nsize = 2**int(np.ceil(np.log2(size)))
+        try:
+            toret = func(*[np.pad(value, (0, nsize - size), mode='edge') for value in values.values()])
+        except Exception as exc:
+            self.log_debug('Jitted pipeline failed: {}'.format(exc))
+            return None
+        derived = Samples()
+        for name, value in toret.items():
+            param = func.derived_params[name]
+            value = np.asarray(value[:size])
+            param._shape = value.shape[1:]  # a bit hacky, but no need to update parameters for this...
+            derived.set(ParameterArray(value, param=param))
+        return derived
+
     def get_cosmo_requires(self):
         """Return a dictionary mapping section to method's name and arguments,
         e.g. 'background': {'comoving_radial_distance': {'z': z}}."""
@@ -325,6 +777,7 @@ class BasePipeline(BaseClass):
                     for basename, name in calculator.runtime_info.base_names.items():
                         if basename in cosmo_params:
                             self.input_values[name] = calculator.runtime_info.input_values[basename] = cosmo[conversions.get(basename, basename)]
+                    calculator.runtime_info.invalidate_input_values()
                 if set(cosmo_requires.keys()) != {'params'}:  # requires a :class:`cosmoprimo.Cosmology` instance as ``cosmo`` attribute
                     calculator.cosmo = cosmo
                 calculator.runtime_info.tocalculate = True
@@ -514,6 +967,8 @@ class BasePipeline(BaseClass):
 
             for calculator in self.calculators:
                 if param in calculator.runtime_info.params:
+                    # The calculator itself must be recalculated, e.g. if it is the only one (parallel SumLikelihood)
+                    calculators_to_calculate.append(calculator)
                     callback(calculator)
 
             footprints.append(tuple(calculator in calculators_to_calculate for calculator in self.calculators))
@@ -591,6 +1046,15 @@ class RuntimeInfo(BaseClass):
 
     speed : float
         Inverse of number of iterations per second.
+
+    cache : LRUCache
+        If not ``None``, cache of calculator states, see :meth:`set_cache`.
+
+    initialize_profile : CallProfile
+        Record of calls to calculator's :meth:`BaseCalculator.initialize`.
+
+    calculate_profile : CallProfile
+        If not ``None``, record of calls to calculator's :meth:`BaseCalculator.calculate`, see :meth:`BasePipeline.set_profile`.
     """
     installer = None
 
@@ -618,7 +1082,12 @@ class RuntimeInfo(BaseClass):
         self.init.runtime_info = self
         self._initialized = False
         self._tocalculate = True
+        self._input_version = 0
         self.calculated = False
+        self.batch_size = None
+        self.cache = None
+        self.initialize_profile = CallProfile()
+        self.calculate_profile = None
         self._with_namespace = False
         self.params = ParameterCollection(init.params)
         self.name = self.calculator.__class__.__name__
@@ -672,9 +1141,13 @@ class RuntimeInfo(BaseClass):
     @property
     def params(self):
         """Return parameters specific to this calculator."""
-        if self._params.updated: self.params = self._params
+        self.update_params()
         return self._params
 
+    def update_params(self):
+        """If :attr:`params` have been updated in place, set again :attr:`input_names`, :attr:`input_values` and :attr:`derived_params`."""
+        if self._params.updated: self.params = self._params
+
     @params.setter
     def params(self, params):
         """Set parameters specific to this calculator."""
@@ -686,6 +1159,21 @@ class RuntimeInfo(BaseClass):
         self.derived_params = self.params.select(derived=True)
         self._tocalculate = True
 
+    @property
+    def input_values(self):
+        """Input parameter values, passed to calculator's :meth:`BaseCalculator.calculate`."""
+        return self._input_values
+
+    @input_values.setter
+    def input_values(self, input_values):
+        """Set input parameter values."""
+        self._input_values = input_values
+        self._input_version += 1
+
+    def invalidate_input_values(self):
+        """Signal that :attr:`input_values` have been modified in place, such that pipelines set their input values again at next calculation."""
+        self._input_version += 1
+
     @property
     def derived(self):
         """Return derived parameter values."""
@@ -698,7 +1186,7 @@ class RuntimeInfo(BaseClass):
                     if name in state: value = state[name]
                     else: value = getattr(self.calculator, name)
                     value = np.asarray(value)
-                    param._shape = value.shape  # a bit hacky, but no need to update parameters for this...
+                    param._shape = value.shape[1:] if self.batch_size is not None else value.shape  # a bit hacky, but no need to update parameters for this...
                     self._derived.set(ParameterArray(value, param=param))
         return self._derived
 
@@ -722,7 +1210,10 @@ class RuntimeInfo(BaseClass):
     def initialize(self):
         """Initialize calculator (if not already initialized), calling :meth:`BaseCalculator.initialize` with :attr:`init` configuration."""
         if not self.initialized:
+            profiles = (self.initialize_profile, self.calculate_profile)
             self.clear()
+            self.initialize_profile, self.calculate_profile = profiles  # keep record of previous calls
+            self.initialize_profile.start()
             self._initialization = True   # to avoid infinite loops
             self.calculator.__dict__ = {name: self.calculator.__dict__[name] for name in ['info', 'runtime_info', '_mpicomm']}
             self.install()
@@ -753,6 +1244,7 @@ class RuntimeInfo(BaseClass):
                 for name, value in self.calculator.__dict__.items():
                     if isinstance(value, BaseCalculator):
                         self._requires.append(value)
+            self.initialize_profile.stop()
         return self.calculator
 
     @property
@@ -769,13 +1261,27 @@ class RuntimeInfo(BaseClass):
         If calculator's :class:`BaseCalculator.calculate` has not be called with input parameter values, call it,
         keeping track of running time with :attr:`monitor`.
         """
+        profile = self.calculate_profile
         if self.tocalculate:
-            self.monitor.start()
-            self.calculator.calculate(**self.input_values)
-            self.monitor.stop()
+            key = state = None
+            if self.cache is not None:
+                key = self._get_cache_key()
+                if key is not None: state = self.cache.get(key)
+            if state is not None:
+                self.calculator.__dict__.update(state)
+                if profile is not None: profile.skip()
+            else:
+                self.monitor.start()
+                if profile is not None: profile.start()
+                self.calculator.calculate(**self.input_values)
+                if profile is not None: profile.stop()
+                self.monitor.stop()
+                if key is not None:
+                    self.cache.set(key, {name: value for name, value in self.calculator.__dict__.items() if name not in self._cache_exclude})
             self._derived = None
             self.calculated = True
         else:
+            if profile is not None: profile.skip()
             self.calculated = False
         self._tocalculate = False
         return self.calculator.get()
@@ -783,6 +1289,7 @@ class RuntimeInfo(BaseClass):
     def set_input_values(self, input_values, full=False, force=None):
         """Update parameter values; if new, next :meth:`calculate` call will call calculator's :class:`BaseCalculator.calculate`."""
         self.params
+        self._input_version += 1
         if full:
             for name, value in input_values.items():
                 name = str(name)
@@ -803,14 +1310,62 @@ class RuntimeInfo(BaseClass):
                         self._tocalculate = True
                     self.input_values[basename] = value
 
+    _cache_exclude = ['info', 'runtime_info', '_mpicomm']
+
+    def set_cache(self, size=100, max_memory=None):
+        """
+        Set up cache of calculator states, such that :meth:`calculate` restores the calculator's state
+        instead of calling :class:`BaseCalculator.calculate` for input parameter values (and upstream calculators' states)
+        already seen. States are keyed on a hash of input parameter values of this calculator and of all calculators it depends upon.
+        Calculator's :meth:`BaseCalculator.calculate` is assumed to only depend on these, and to set new attributes
+        rather than modifying existing ones in-place.
+
+        Parameters
+        ----------
+        size : int, default=100
+            Maximum number of cached states. If 0 or ``None``, disable the cache.
+
+        max_memory : float, default=None
+            Maximum memory, in MB, taken by (array) attributes of cached states. If ``None``, no limit.
+        """
+        if size:
+            self.cache = LRUCache(size=size, max_memory=max_memory)
+        else:
+            self.cache = None
+
+    def _get_cache_key(self):
+        # Hash of input values of this calculator and all its requirements; None if they cannot be hashed (e.g. jax tracers)
+        import hashlib
+        hasher = hashlib.sha1()
+        for name, value in self.input_values.items():
+            try:
+                value = np.asarray(value)
+            except Exception:
+                return None
+            if value.dtype.hasobject: return None
+            hasher.update('{}{}{}'.format(name, value.dtype.str, value.shape).encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+        for require in self.requires:
+            key = require.runtime_info._get_cache_key()
+            if key is None: return None
+            hasher.update(key)
+        return hasher.digest()
+
+    @property
+    def batch(self):
+        """Does calculator's :meth:`BaseCalculator.calculate` accept input parameter values with a leading batch axis?"""
+        return bool(getattr(self.calculator, '_batch', False))
+
     def __getstate__(self):
         """Return this class state dictionary."""
         return self.__dict__.copy()
 
     def clear(self, **kwargs):
-        calculator, init = self.calculator, self.init
+        calculator, init, cache = self.calculator, self.init, getattr(self, 'cache', None)
         self.__dict__.clear()
         self.__init__(calculator, init=init)
+        if cache is not None:  # cached states are invalidated, but keep cache settings
+            self.set_cache(size=cache.size, max_memory=cache.max_memory)
         self.update(**kwargs)
 
     def update(self, *args, **kwargs):
@@ -839,7 +1394,14 @@ class BaseCalculator(BaseClass):
     - :meth:`calculate`: takes in parameter values, and do some calculation
     - :meth:`get`: returns the quantity of interest
 
+    Calculators whose :meth:`calculate` can process several points at once should set ``_batch = True``:
+    in :meth:`BasePipeline.mpicalculate`, input parameter values are then arrays with a leading batch axis,
+    and attributes (including derived parameters) are expected to carry the same leading axis.
+    Quantities of required calculators may or may not have this leading axis (if they do not depend on the varied parameters),
+    so operations should broadcast along it.
     """
+    _batch = False
+
     def __new__(cls, *args, **kwargs):
         cls_info = Info(getattr(cls, '_info', {}))
         cls_init = InitConfig(data=getattr(cls, '_init', {}))
@@ -1,3 +1,4 @@
 from .base import Emulator, PointEmulatorEngine, EmulatedCalculator
 from .taylor import TaylorEmulatorEngine
 from .mlp import MLPEmulatorEngine
+from .chebyshev import ChebyshevEmulatorEngine
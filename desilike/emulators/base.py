@@ -39,6 +39,8 @@ def _setstate(self, state):
 
 class EmulatedCalculator(BaseCalculator):
 
+    _batch = True
+
     def initialize(self, emulator=None, **kwargs):
         self.emulator = emulator
         self.calculate(**{name: self.params[name].value for name in self.emulator.varied_params})
@@ -79,7 +81,7 @@ class Emulator(BaseClass):
 
         engine : str, dict, BaseEmulatorEngine, default='taylor'
             A dictionary mapping calculator's derived attribute names (including wildcard) to emulator engine,
-            which can be a :class:`BaseEmulatorEngine` (type or instance) or one of ['taylor', 'mlp'].
+            which can be a :class:`BaseEmulatorEngine` (type or instance) or one of ['taylor', 'mlp', 'chebyshev'].
             A single emulator engine can be provided, and used for all calculator's derived attributes.
 
         mpicomm : mpi.COMM_WORLD, default=None
@@ -231,6 +233,26 @@ class Emulator(BaseClass):
             if eng is engine:
                 self.samples[name] = tmp
 
+    def _get_X_Y(self, samples, yname, with_deriv=False):
+        X, Y = None, None
+        if self.mpicomm.rank == 0:
+            nsamples = samples.size
+            X = np.concatenate([samples[name].reshape(nsamples, 1) for name in self._get_varied_params(yname)], axis=-1)
+            Y = samples[yname]
+            yshape = Y.shape[Y.andim:]
+            if Y.derivs is not None:
+                yshape = yshape[1:]
+                if with_deriv:
+                    Y = Y.reshape((nsamples, Y.shape[Y.andim], -1))
+                else:
+                    Y = Y.zero.reshape(nsamples, -1)
+            else:
+                Y = Y.reshape(nsamples, -1)
+            Y.param = Y.param.clone(shape=np.prod(yshape))
+            self.varied_shape[yname] = yshape
+        self.varied_shape[yname] = self.mpicomm.bcast(self.varied_shape[yname], root=0)
+        return X, Y
+
     def fit(self, name=None, **kwargs):
         """
         Fit :class:`BaseEmulatorEngine` to samples.
@@ -244,26 +266,6 @@ class Emulator(BaseClass):
         **kwargs : dict
             Optional arguments for :meth:`BaseEmulatorEngine.fit`.
         """
-        def _get_X_Y(samples, yname, with_deriv=False):
-            X, Y = None, None
-            if self.mpicomm.rank == 0:
-                nsamples = samples.size
-                X = np.concatenate([samples[name].reshape(nsamples, 1) for name in self._get_varied_params(yname)], axis=-1)
-                Y = samples[yname]
-                yshape = Y.shape[Y.andim:]
-                if Y.derivs is not None:
-                    yshape = yshape[1:]
-                    if with_deriv:
-                        Y = Y.reshape((nsamples, Y.shape[Y.andim], -1))
-                    else:
-                        Y = Y.zero.reshape(nsamples, -1)
-                else:
-                    Y = Y.reshape(nsamples, -1)
-                Y.param = Y.param.clone(shape=np.prod(yshape))
-                self.varied_shape[yname] = yshape
-            self.varied_shape[yname] = self.mpicomm.bcast(self.varied_shape[yname], root=0)
-            return X, Y
-
         if name is None:
             name = list(self.engines.keys())
         if not utils.is_sequence(name):
@@ -272,10 +274,160 @@ class Emulator(BaseClass):
 
         for name in names:
             self.engines[name] = engine = self.engines[name].copy()
-            engine.fit(*_get_X_Y(self.samples[name], name, getattr(engine, '_samples_with_derivs', False)), **kwargs)
+            engine.fit(*self._get_X_Y(self.samples[name], name, getattr(engine, '_samples_with_derivs', False)), **kwargs)
+
+    def fit_adaptive(self, name=None, precision=None, max_chi2=1., max_iterations=10, nsamples=None, ncandidates=None, nfolds=5, seed=None, **kwargs):
+        r"""
+        Fit :class:`BaseEmulatorEngine` to samples, then iteratively add samples where the emulator error is expected to be largest, and fit again.
+        At each iteration:
+
+        - an ensemble of ``nfolds`` emulators is fitted (cross-validation: each emulator leaves out one fold of the samples)
+        - ``nsamples`` points, among ``ncandidates`` random candidates in the box of current samples, with the largest
+          ensemble spread in terms of :math:`\chi^{2}` (w.r.t. ``precision``), are evaluated with the calculator (in parallel)
+        - the :math:`\chi^{2}` of the emulator error at these new points is compared to ``max_chi2``
+        - new points are added to samples, and the emulator is fitted again
+
+        Samples must have been set with :meth:`set_samples` first.
+
+        Parameters
+        ----------
+        name : str, default=None
+            Name of calculator's derived attribute(s) (of :attr:`varied`) to fit.
+            If ``None``, all calculator's derived attributes are fitted.
+
+        precision : array, dict, default=None
+            Precision matrix (or its diagonal) of the (flattened) emulated attribute(s), to compute the :math:`\chi^{2}` of the emulator error,
+            e.g. the observable's precision matrix if the calculator directly returns the observable's theory.
+            Can be a dictionary mapping attribute names to precision matrices.
+            If ``None``, the identity is used.
+
+        max_chi2 : float, default=1.
+            Training stops when the maximum :math:`\chi^{2}` of the emulator error on new points (summed over attributes) is below ``max_chi2``.
+
+        max_iterations : int, default=10
+            Maximum number of iterations.
+
+        nsamples : int, default=None
+            Number of new points per iteration. Defaults to 10% of the current number of samples (at least 1).
+
+        ncandidates : int, default=None
+            Number of random candidates per iteration. Defaults to 20 times ``nsamples``.
+
+        nfolds : int, default=5
+            Number of folds for the cross-validation ensemble.
+
+        seed : int, default=None
+            Random seed.
+
+        **kwargs : dict
+            Optional arguments for :meth:`BaseEmulatorEngine.fit`.
+
+        Returns
+        -------
+        converged : bool
+            ``True`` if the :math:`\chi^{2}` target has been reached.
+        """
+        if name is None:
+            name = list(self.engines.keys())
+        if not utils.is_sequence(name):
+            name = [name]
+        names = list(name)
+        if any(getattr(self.engines[name], '_samples_with_derivs', False) for name in names):
+            raise ValueError('Adaptive fit is not available for engines fitting derivatives')
+        if len(find_uniques([self.samples[name] for name in names])) > 1:
+            raise ValueError('Attributes fitted together must share the same samples; fit them separately')
+        if not isinstance(precision, dict):
+            precision = {name: precision for name in names}
+        rng = np.random.RandomState(seed=seed)
+        nfolds = int(nfolds)
+        if nfolds < 2:
+            raise ValueError('nfolds must be >= 2')
+
+        def get_chi2(name, diff):
+            # chi2 of (flattened) differences, w.r.t. precision
+            diff = np.asarray(diff).reshape(len(diff), -1)
+            prec = precision.get(name, None)
+            if prec is None:
+                return np.sum(diff**2, axis=-1)
+            prec = np.asarray(prec)
+            if prec.ndim <= 1:
+                return np.sum(diff**2 * prec, axis=-1)
+            return np.sum(diff.dot(prec) * diff, axis=-1)
+
+        def predict(engine, X):
+            return np.asarray(engine.predict(X)).reshape(len(X), -1)
+
+        def calculate(X):
+            # Run the calculator at X (in parallel), return samples of varied parameters and emulated attributes
+            samples = None
+            if self.mpicomm.rank == 0:
+                samples = Samples(list(X.T), params=self.pipeline.varied_params)
+            self.pipeline.mpicalculate(**(samples.to_dict() if self.mpicomm.rank == 0 else {}))
+            if self.mpicomm.rank == 0:
+                tmp = Samples(attrs=self.samples[names[0]].attrs)
+                for param in self.pipeline.varied_params:
+                    tmp[param] = samples[param]
+                for param in self.pipeline.params.select(name=list(self.engines.keys()), derived=True):
+                    tmp[param] = self.pipeline.derived[param.name]
+                samples = tmp
+            return samples
+
+        converged = False
+        self.fit(name=names, **kwargs)
+        for iteration in range(int(max_iterations)):
+            samples = self.samples[names[0]]
+            X, select = self._get_X_Y(samples, names[0])[0], None
+            if self.mpicomm.rank == 0:
+                size = len(X)
+                nnew = max(int(0.1 * size + 0.5), 1) if nsamples is None else int(nsamples)
+                ncand = 20 * nnew if ncandidates is None else max(int(ncandidates), nnew)
+                folds = rng.permutation(size) % nfolds
+                candidates = rng.uniform(np.min(X, axis=0), np.max(X, axis=0), size=(ncand, X.shape[-1]))
+            folds = self.mpicomm.bcast(folds if self.mpicomm.rank == 0 else None, root=0)
+            spread = 0.
+            for name in names:
+                X, Y = self._get_X_Y(samples, name)
+                predictions = []
+                for ifold in range(nfolds):
+                    mask = folds != ifold
+                    engine = self.engines[name].copy()
+                    engine.fit(*((X[mask], Y[mask]) if self.mpicomm.rank == 0 else (None, None)), **kwargs)
+                    if self.mpicomm.rank == 0:
+                        predictions.append(predict(engine, candidates))
+                if self.mpicomm.rank == 0:
+                    predictions = np.array(predictions)
+                    spread += np.mean([get_chi2(name, prediction - np.mean(predictions, axis=0)) for prediction in predictions], axis=0)
+            if self.mpicomm.rank == 0:
+                select = candidates[np.argsort(spread)[::-1][:nnew]]
+                self.log_info('Iteration {:d}: evaluating calculator at {:d} new points (maximum ensemble chi2 spread = {:.3g}).'.format(iteration, len(select), np.max(spread)))
+            new_samples = calculate(select)
+            chi2 = 0.
+            for name in names:
+                X, Y = self._get_X_Y(new_samples, name)
+                if self.mpicomm.rank == 0:
+                    chi2 += get_chi2(name, predict(self.engines[name], X) - Y)
+            if self.mpicomm.rank == 0:
+                chi2 = np.max(chi2)
+                if 'chi2' not in self.diagnostics:
+                    self.diagnostics['chi2'] = []
+                self.diagnostics['chi2'].append(chi2)
+                converged = chi2 < max_chi2
+                self.log_info('Maximum chi2 of emulator error at new points is {:.3g} {} {:.3g}.'.format(chi2, '<' if converged else '>', max_chi2))
+                samples = Samples.concatenate(samples, new_samples)
+            for name in names:
+                self.samples[name] = samples
+            converged = self.mpicomm.bcast(converged, root=0)
+            self.fit(name=names, **kwargs)
+            if converged:
+                break
+        self.diagnostics = self.mpicomm.bcast(self.diagnostics, root=0)
+        return converged
 
     def predict(self, **params):
         X = jnp.array([params[name] for name in self.varied_params])
+        if X.ndim > 1:  # leading batch axis
+            X = X.T
+            return {name: engine.predict(X).reshape(X.shape[:1] + tuple(self.varied_shape[name])) for name, engine in self.engines.items()}
         return {name: engine.predict(X).reshape(self.varied_shape[name]) for name, engine in self.engines.items()}
 
     def to_calculator(self, derived=None):
@@ -531,7 +683,7 @@ def get_engine(engine):
     Parameters
     ----------
     engine : type, BaseEmulatorEngine, str
-        Engine (type or instance) or one of ['taylor', 'mlp'].
+        Engine (type or instance) or one of ['taylor', 'mlp', 'chebyshev'].
 
     Returns
     -------
@@ -543,6 +695,8 @@ def get_engine(engine):
             from . import taylor
         elif engine == 'mlp':
             from . import mlp
+        elif engine == 'chebyshev':
+            from . import chebyshev
 
         try:
             engine = BaseEmulatorEngine._registry[engine]()
@@ -561,6 +715,15 @@ class BaseEmulatorEngine(BaseClass, metaclass=RegisteredEmulatorEngine):
     def __init__(self, *args, **kwargs):
         self.init = (args, kwargs)
 
+    @property
+    def mpicomm(self):
+        from desilike import mpi
+        return getattr(self, '_mpicomm', mpi.COMM_WORLD)
+
+    @mpicomm.setter
+    def mpicomm(self, mpicomm):
+        self._mpicomm = mpicomm
+
     def initialize(self, varied_params):
         pass
 
@@ -590,7 +753,7 @@ class PointEmulatorEngine(BaseEmulatorEngine):
 
     def predict(self, X):
         # Dumb prediction
-        return self.point
+        return jnp.broadcast_to(self.point, X.shape[:-1] + self.point.shape)
 
     def __getstate__(self):
         state = {}
@@ -0,0 +1,199 @@
+import itertools
+
+import numpy as np
+
+from desilike import mpi
+from desilike.jax import numpy as jnp
+from desilike.parameter import Samples, ParameterPriorError
+from .base import BaseEmulatorEngine
+
+
+def _get_level_nodes(level):
+    # Nested Chebyshev-Gauss-Lobatto nodes: 1 node at level 0, 2^level + 1 nodes at level > 0
+    if level == 0:
+        return np.zeros(1, dtype='f8')
+    size = 2**level + 1
+    return -np.cos(np.pi * np.arange(size) / (size - 1))
+
+
+def _get_level_degree(level):
+    # Maximum polynomial degree at level
+    return 0 if level == 0 else 2**level
+
+
+def _get_levels(ndim, level, grid='smolyak'):
+    # One-dimensional levels of tensor products
+    if grid == 'smolyak':
+        return [levels for levels in itertools.product(range(level + 1), repeat=ndim) if sum(levels) <= level]
+    if grid == 'tensor':
+        return [(level,) * ndim]
+    raise ValueError('Unknown grid {}; choose from ["smolyak", "tensor"]'.format(grid))
+
+
+def get_sparse_grid(ndim, level=3, grid='smolyak'):
+    r"""
+    Return Smolyak sparse grid (or tensor grid) of nested Chebyshev-Gauss-Lobatto nodes in :math:`[-1, 1]^{\mathrm{ndim}}`.
+
+    Parameters
+    ----------
+    ndim : int
+        Number of dimensions.
+
+    level : int, default=3
+        Grid level. With 'smolyak', tensor products of one-dimensional levels :math:`l_{i}` with :math:`\sum_{i} l_{i} \leq \mathrm{level}` are kept.
+        One-dimensional level :math:`l` has :math:`2^{l} + 1` nodes (1 for :math:`l = 0`).
+
+    grid : str, default='smolyak'
+        'smolyak' for a sparse grid, 'tensor' for a tensor grid of level ``level`` in each dimension.
+
+    Returns
+    -------
+    nodes : array of shape (number of nodes, ndim)
+    """
+    if level == 0:
+        return np.zeros((1, ndim), dtype='f8')
+
+    def get_indices(lev):
+        # Nodes are nested: node j at level lev is node j * 2^(level - lev) at level ``level``
+        if lev == 0:
+            return [2**(level - 1)]
+        return list(range(0, 2**level + 1, 2**(level - lev)))
+
+    nodes = set()
+    for levels in _get_levels(ndim, level, grid=grid):
+        nodes.update(itertools.product(*[get_indices(lev) for lev in levels]))
+    nodes = np.array(sorted(nodes), dtype='f8').reshape(-1, ndim)
+    return _get_level_nodes(level)[nodes.astype('i8')]
+
+
+def get_chebyshev_degrees(ndim, level=3, grid='smolyak'):
+    """
+    Return degrees of Chebyshev polynomials (array of shape (number of polynomials, ndim))
+    spanning the space interpolated on the grid returned by :func:`get_sparse_grid`.
+    """
+    degrees = set()
+    for levels in _get_levels(ndim, level, grid=grid):
+        degrees.update(itertools.product(*[range(_get_level_degree(lev) + 1) for lev in levels]))
+    return np.array(sorted(degrees, key=lambda degree: (sum(degree), degree)), dtype='i4').reshape(-1, ndim)
+
+
+def chebyshev_basis(x, degrees):
+    """
+    Evaluate products of Chebyshev polynomials of the first kind.
+
+    Parameters
+    ----------
+    x : array
+        Array of shape (..., ndim), of coordinates in :math:`[-1, 1]`.
+
+    degrees : array
+        Array of shape (number of polynomials, ndim) of degrees.
+
+    Returns
+    -------
+    basis : array of shape (..., number of polynomials)
+    """
+    ndim = degrees.shape[-1]
+    # Recurrence T_{n + 1} = 2 x T_{n} - T_{n - 1}
+    polys = [jnp.ones_like(x), x]
+    for degree in range(2, int(np.max(degrees, initial=1)) + 1):
+        polys.append(2. * x * polys[-1] - polys[-2])
+    polys = jnp.stack(polys, axis=-1)  # (..., ndim, max degree + 1)
+    return jnp.prod(polys[..., np.arange(ndim), degrees], axis=-1)
+
+
+class ChebyshevEmulatorEngine(BaseEmulatorEngine):
+    r"""
+    Global polynomial emulator: expansion in Chebyshev polynomials over the box of varied parameters,
+    fitted on a Smolyak sparse grid (or tensor grid) of Chebyshev-Gauss-Lobatto nodes.
+    Contrary to :class:`~desilike.emulators.TaylorEmulatorEngine`, the expansion is accurate over the whole box,
+    and contrary to :class:`~desilike.emulators.MLPEmulatorEngine`, the number of calculator evaluations is small and the fit is a linear solve.
+
+    Parameters
+    ----------
+    level : int, default=3
+        Grid level, see :func:`get_sparse_grid`.
+        One-dimensional level :math:`l` has :math:`2^{l} + 1` nodes, i.e. polynomials up to degree :math:`2^{l}` are used.
+
+    grid : str, default='smolyak'
+        'smolyak' for a sparse grid, 'tensor' for a tensor grid (typically for :math:`\leq 3` parameters).
+
+    ref_scale : float, default=1.
+        Box is given by parameter prior limits if finite, else reference distribution limits;
+        these are then scaled by ``ref_scale`` around :attr:`Parameter.value` (< 1. means smaller box).
+    """
+    name = 'chebyshev'
+
+    def initialize(self, varied_params, level=3, grid='smolyak', ref_scale=1.):
+        self.varied_params = varied_params
+        self.sampler_options = dict(level=int(level), grid=str(grid), ref_scale=float(ref_scale))
+
+    def get_default_samples(self, calculator, **kwargs):
+        """
+        Returns samples, evaluated on a Smolyak sparse grid (or tensor grid) of Chebyshev-Gauss-Lobatto nodes.
+
+        Parameters
+        ----------
+        level : int, default=3
+            Grid level, see :func:`get_sparse_grid`.
+
+        grid : str, default='smolyak'
+            'smolyak' for a sparse grid, 'tensor' for a tensor grid.
+
+        ref_scale : float, default=1.
+            Parameter box is scaled by this factor.
+        """
+        options = {**self.sampler_options, **kwargs}
+        pipeline = calculator.runtime_info.pipeline
+        limits = []
+        for param in pipeline.varied_params:
+            if np.isfinite(param.prior.limits).all():
+                lim = param.prior.limits
+            elif np.isfinite(param.ref.limits).all():
+                lim = param.ref.limits
+            else:
+                raise ParameterPriorError('Provide finite prior or reference limits for parameter {}'.format(param))
+            limits.append(options['ref_scale'] * (np.array(lim) - param.value) + param.value)
+        limits = np.array(limits).T
+        samples = None
+        if self.mpicomm.rank == 0:
+            nodes = get_sparse_grid(len(limits[0]), level=options['level'], grid=options['grid'])
+            self.log_info('Evaluating calculator on {:d} nodes.'.format(len(nodes)))
+            samples = Samples(list((limits[0] + (nodes + 1.) / 2. * (limits[1] - limits[0])).T), params=pipeline.varied_params)
+        pipeline.mpicalculate(**(samples.to_dict() if self.mpicomm.rank == 0 else {}))
+        if self.mpicomm.rank == 0:
+            for param in pipeline.params.select(fixed=True, derived=False):
+                samples[param] = np.full(samples.shape, param.value, dtype='f8')
+            samples.update(pipeline.derived)
+        return samples
+
+    def fit(self, X, Y):
+        """Fit Chebyshev coefficients to samples, by least squares."""
+        self.limits, self.degrees, self.coefficients = None, None, None
+        if self.mpicomm.rank == 0:
+            self.limits = np.array([np.min(X, axis=0), np.max(X, axis=0)])
+            degrees = get_chebyshev_degrees(X.shape[-1], level=self.sampler_options['level'], grid=self.sampler_options['grid'])
+            nsamples = len(X)
+            if len(degrees) > nsamples:
+                self.log_warning('Number of polynomials is {:d} > number of samples {:d}; keeping the {:d} lowest-degree polynomials.'.format(len(degrees), nsamples, nsamples))
+                degrees = degrees[:nsamples]
+            self.degrees = degrees
+            design = np.asarray(chebyshev_basis(self._scale(np.asarray(X)), self.degrees))
+            self.coefficients = np.linalg.lstsq(design, np.asarray(Y), rcond=None)[0]
+        self.limits = self.mpicomm.bcast(self.limits, root=0)
+        self.degrees = self.mpicomm.bcast(self.degrees, root=0)
+        self.coefficients = mpi.bcast(self.coefficients if self.mpicomm.rank == 0 else None, mpicomm=self.mpicomm, mpiroot=0)
+
+    def _scale(self, X):
+        # Map box to [-1, 1]
+        width = np.where(self.limits[1] > self.limits[0], self.limits[1] - self.limits[0], 1.)
+        return 2. * (X - self.limits[0]) / width - 1.
+
+    def predict(self, X):
+        return jnp.tensordot(chebyshev_basis(self._scale(X), self.degrees), self.coefficients, axes=(-1, 0))
+
+    def __getstate__(self):
+        state = {}
+        for name in ['limits', 'degrees', 'coefficients']:
+            state[name] = getattr(self, name)
+        return state
@@ -1,3 +1,6 @@
+import os
+import glob
+
 import numpy as np
 
 from desilike import utils
@@ -47,6 +50,11 @@ class MLPEmulatorEngine(BaseEmulatorEngine):
     npcs : int, default=None
         Number of principal components (eigenvalues) in PCA.
         By default, all components are kept.
+
+    Note
+    ----
+    Tensorflow is only required for :meth:`fit`; prediction is a numpy (or jax) pass through the network weights,
+    which can be saved to / memory-mapped from plain .npy files with :meth:`save_weights` / :meth:`load_weights`.
     """
     name = 'mlp'
 
@@ -109,7 +117,7 @@ class MLPEmulatorEngine(BaseEmulatorEngine):
         learning_rates = _make_tuple(learning_rates, length=len(batch_sizes))
         rng = np.random.RandomState(seed=seed)
 
-        self.operations = None
+        self.weights = None
 
         import tensorflow as tf
         from tensorflow.keras.callbacks import EarlyStopping
@@ -145,18 +153,15 @@ class MLPEmulatorEngine(BaseEmulatorEngine):
                     x = tf.matmul(tf.add(tf.multiply(x, self.sigma), self.mean), self.eigenvectors)
                 return x
 
-            def operations(self):
-                operations = []
+            def numpy_weights(self):
+                weights = {}
                 for i in range(self.nlayers):
-                    # linear network operation
-                    operations.append({'eval': 'x @ W + b', 'locals': {'W': self.W[i].numpy(), 'b': self.b[i].numpy()}})
-                    # non-linear activation function
+                    weights['W_{:d}'.format(i)], weights['b_{:d}'.format(i)] = self.W[i].numpy(), self.b[i].numpy()
                     if i < self.nlayers - 1:
-                        operations.append({'eval': '(beta + (1 - beta) / (1 + np.exp(-alpha * x))) * x', 'locals': {'alpha': self.alpha[i].numpy(), 'beta': self.beta[i].numpy()}})
-                # linear output layer
+                        weights['alpha_{:d}'.format(i)], weights['beta_{:d}'.format(i)] = self.alpha[i].numpy(), self.beta[i].numpy()
                 if self.eigenvectors is not None:
-                    operations.append({'eval': '(x * sigma + mean) @ eigenvectors', 'locals': {'eigenvectors': eigenvectors, 'mean': mean, 'sigma': sigma}})
-                return operations
+                    weights.update(eigenvectors=self.eigenvectors, pc_mean=self.mean, pc_sigma=self.sigma)
+                return weights
 
             def __getstate__(self):
                 state = {}
@@ -176,17 +181,16 @@ class MLPEmulatorEngine(BaseEmulatorEngine):
 
         if self.mpicomm.rank == 0:
             samples = {'X': X, 'Y': Y}
-            self.operations = {}
+            self.weights = {}
             for name, value in samples.items():
                 mean, sigma = np.mean(value, axis=0), np.std(value, ddof=1, axis=0)
-                self.operations[name] = [{'eval': 'x * sigma + mean' if name == 'Y' else '(x - mean) / sigma',
-                                          'locals': {'mean': mean, 'sigma': sigma}}]
+                self.weights['{}_mean'.format(name.lower())], self.weights['{}_sigma'.format(name.lower())] = mean, sigma
                 samples[name] = (value - mean) / sigma
             if 'arcsinh' in self.ytransform:
                 Y = np.arcsinh(samples['Y'])
                 mean, sigma = np.mean(Y, axis=0), np.std(Y, ddof=1, axis=0)
                 samples['Y'] = (Y - mean) / sigma
-                self.operations['Y'].insert(0, {'eval': 'np.sinh(x) * sigma + mean', 'locals': {'mean': mean, 'sigma': sigma}})
+                self.weights['arcsinh_mean'], self.weights['arcsinh_sigma'] = mean, sigma
             mask = np.zeros(nsamples, dtype='?')
             mask[rng.choice(nsamples, size=nvalidation, replace=False)] = True
             for name, value in list(samples.items()):
@@ -225,28 +229,73 @@ class MLPEmulatorEngine(BaseEmulatorEngine):
                 self.log_info('Using (batch size, epochs, learning rate) = ({:d}, {:d}, {:.2e})'.format(batch_size, epoch, lr))
                 self.tfmodel.fit(samples['X_training'], samples['Y_training'], batch_size=batch_size, epochs=epoch,
                                  validation_data=(samples['X_validation'], samples['Y_validation']), callbacks=[es], verbose=2)
-                self.operations['M'] = self.tfmodel.operations()
-            self.operations = self.operations['X'] + self.operations['M'] + self.operations['Y']
+            self.weights.update(self.tfmodel.numpy_weights())
 
         mpi.barrier_idle(self.mpicomm)  # we rely on keras parallelisation; here we make MPI processes idle
 
-        self.operations = self.mpicomm.bcast(self.operations, root=0)
+        self.weights = self.mpicomm.bcast(self.weights, root=0)
+        self.weights_dir = None
 
     def predict(self, X):
-        x = X
-        for operation in self.operations:
-            x = eval(operation['eval'], {'np': jnp}, {'x': x, **operation['locals']})
-        return x
+        if getattr(self, 'weights', None) is None:  # emulators saved with previous versions
+            x = X
+            for operation in self.operations:
+                x = eval(operation['eval'], {'np': jnp}, {'x': x, **operation['locals']})
+            return x
+        weights = self.weights
+        x = (X - weights['x_mean']) / weights['x_sigma']
+        nlayers = sum(name.startswith('W_') for name in weights)
+        for i in range(nlayers):
+            x = jnp.dot(x, weights['W_{:d}'.format(i)]) + weights['b_{:d}'.format(i)]
+            if i < nlayers - 1:
+                alpha, beta = weights['alpha_{:d}'.format(i)], weights['beta_{:d}'.format(i)]
+                x = (beta + (1. - beta) / (1. + jnp.exp(-alpha * x))) * x
+        if 'eigenvectors' in weights:
+            x = jnp.dot(x * weights['pc_sigma'] + weights['pc_mean'], weights['eigenvectors'])
+        if 'arcsinh_mean' in weights:
+            x = jnp.sinh(x * weights['arcsinh_sigma'] + weights['arcsinh_mean'])
+        return x * weights['y_sigma'] + weights['y_mean']
+
+    def save_weights(self, dirname):
+        """
+        Save network weights in directory ``dirname``, as one .npy file per array.
+        The emulator state then only refers to ``dirname``; weights can be loaded back with :meth:`load_weights`.
+        """
+        if self.mpicomm.rank == 0:
+            utils.mkdir(dirname)
+            for name, value in self.weights.items():
+                np.save(os.path.join(dirname, '{}.npy'.format(name)), value)
+        self.weights_dir = str(dirname)
+
+    def load_weights(self, dirname, mmap_mode='r'):
+        """
+        Load network weights saved with :meth:`save_weights` in directory ``dirname``.
+        By default, arrays are memory-mapped (see :func:`numpy.load`).
+        """
+        self.weights = {}
+        for fn in glob.glob(os.path.join(dirname, '*.npy')):
+            self.weights[os.path.splitext(os.path.basename(fn))[0]] = np.load(fn, mmap_mode=mmap_mode)
+        self.weights_dir = str(dirname)
 
     def __getstate__(self):
         state = {}
-        for name in ['operations', 'tfmodel']:
-            if hasattr(self, name):
-                tmp = getattr(self, name)
-                if hasattr(tmp, '__getstate__'): tmp = tmp.__getstate__()
-                state[name] = tmp
+        if getattr(self, 'weights_dir', None) is not None:
+            state['weights_dir'] = self.weights_dir
+        else:
+            for name in ['weights', 'operations']:
+                if getattr(self, name, None) is not None:
+                    state[name] = getattr(self, name)
+        if hasattr(self, 'tfmodel'):
+            tmp = self.tfmodel
+            if hasattr(tmp, '__getstate__'): tmp = tmp.__getstate__()
+            state['tfmodel'] = tmp
         return state
 
+    def __setstate__(self, state):
+        super(MLPEmulatorEngine, self).__setstate__(state)
+        if getattr(self, 'weights_dir', None) is not None:
+            self.load_weights(self.weights_dir)
+
     @classmethod
     def install(cls, config):
         config.pip('tensorflow')
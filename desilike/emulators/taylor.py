@@ -82,16 +82,93 @@ class TaylorEmulatorEngine(BaseEmulatorEngine):
         self.derivatives = mpi.bcast(self.derivatives if self.mpicomm.rank == 0 else None, mpicomm=self.mpicomm, mpiroot=0)
         self.powers = self.mpicomm.bcast(self.powers, root=0)
         self.center = self.mpicomm.bcast(self.center, root=0)
+        self.plan = get_monomial_plan(self.powers)
+
+    @property
+    def plan(self):
+        return self._plan
+
+    @plan.setter
+    def plan(self, plan):
+        self._plan = plan
+        # Split plan by degree once for all
+        self._plan_levels, start = [], 0
+        for size in plan['sizes']:
+            self._plan_levels.append((plan['parents'][start:start + size], plan['variables'][start:start + size]))
+            start += size
 
     def predict(self, X):
         diffs = jnp.array(X - self.center)
-        #diffs = jnp.where(self.powers > 0, diffs, 0.)  # a trick to avoid NaNs in the derivation
-        #powers = jnp.prod(jnp.power(diffs, self.powers), axis=-1)
-        powers = jnp.prod(jnp.where(self.powers > 0, diffs ** self.powers, 1.), axis=-1)
-        return jnp.tensordot(self.derivatives, powers, axes=(0, 0))
+        # Monomials are built degree by degree, each as the product of a lower-degree monomial with one variable
+        monomials = jnp.ones_like(diffs[..., :1])
+        for parents, variables in self._plan_levels:
+            monomials = jnp.concatenate([monomials, jnp.take(monomials, parents, axis=-1) * jnp.take(diffs, variables, axis=-1)], axis=-1)
+        return jnp.tensordot(jnp.take(monomials, self._plan['index'], axis=-1), self.derivatives, axes=(-1, 0))
 
     def __getstate__(self):
         state = {}
-        for name in ['center', 'derivatives', 'powers']:
+        for name in ['center', 'derivatives', 'powers', 'plan']:
             state[name] = getattr(self, name)
         return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        plan = state.pop('plan', None)
+        super(TaylorEmulatorEngine, self).__setstate__(state)
+        if plan is None:  # emulators saved with previous versions
+            plan = get_monomial_plan(self.powers)
+        self.plan = plan
+
+
+def get_monomial_plan(powers):
+    """
+    Return evaluation plan for monomials of exponents ``powers``.
+    Each monomial is the product of a monomial of lower degree (its parent) with one variable,
+    such that all monomials are obtained with one multiplication each, degree by degree.
+    Parents which are not in ``powers`` are added to the plan.
+
+    Parameters
+    ----------
+    powers : array
+        Array of shape (number of monomials, number of variables) of monomial exponents.
+
+    Returns
+    -------
+    plan : dict
+        Dictionary of integer arrays:
+
+        - 'sizes': number of monomials of each degree (starting from 1) in the plan
+        - 'parents': for each monomial (sorted by degree) of the plan, index of its parent
+          (0 being the constant monomial, 1 the first monomial of the plan, etc.)
+        - 'variables': for each monomial of the plan, index of the variable to multiply its parent with
+        - 'index': index in the plan of each monomial of ``powers``
+    """
+    powers = np.asarray(powers, dtype='i4')
+    ndim = powers.shape[-1]
+    monomials = {tuple(power) for power in powers if power.sum()}
+    max_degree = max([sum(power) for power in monomials], default=0)
+    variables = {}
+    for degree in range(max_degree, 0, -1):
+        for power in sorted(power for power in monomials if sum(power) == degree):
+            candidates = [ivar for ivar in range(ndim) if power[ivar]]
+            # Prefer a parent that is already in the plan
+            for ivar in candidates:
+                if power[:ivar] + (power[ivar] - 1,) + power[ivar + 1:] in monomials: break
+            else:
+                ivar = candidates[0]
+            variables[power] = ivar
+            parent = power[:ivar] + (power[ivar] - 1,) + power[ivar + 1:]
+            if sum(parent): monomials.add(parent)
+    indices = {(0,) * ndim: 0}
+    plan = {'sizes': [], 'parents': [], 'variables': []}
+    for degree in range(1, max_degree + 1):
+        level = sorted(power for power in monomials if sum(power) == degree)
+        for power in level:
+            ivar = variables[power]
+            plan['parents'].append(indices[power[:ivar] + (power[ivar] - 1,) + power[ivar + 1:]])
+            plan['variables'].append(ivar)
+        for power in level:
+            indices[power] = len(indices)
+        plan['sizes'].append(len(level))
+    plan['index'] = [indices[tuple(power)] for power in powers]
+    return {name: np.array(value, dtype='i4') for name, value in plan.items()}
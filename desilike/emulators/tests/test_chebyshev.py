@@ -0,0 +1,93 @@
+import numpy as np
+
+from desilike.jax import numpy as jnp
+from desilike.parameter import Parameter
+from desilike.emulators import Emulator, ChebyshevEmulatorEngine
+from desilike.base import BaseCalculator
+from desilike import setup_logging
+
+
+class PowerModel(BaseCalculator):
+
+    def initialize(self, order=2):
+        self.x = np.linspace(0.1, 1.1, 11)
+        self.order = order
+        for i in range(self.order):
+            self.params.set(Parameter('a{:d}'.format(i), value=1.5, prior={'limits': [1., 3.]}))
+
+    def calculate(self, **kwargs):
+        self.model = jnp.exp(-sum(kwargs['a{:d}'.format(i)] * self.x**i for i in range(self.order)))
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in ['x', 'model']}
+
+
+def test_sparse_grid():
+    from desilike.emulators.chebyshev import get_sparse_grid, get_chebyshev_degrees, chebyshev_basis
+    for ndim in [1, 2, 4]:
+        for level in [0, 1, 3]:
+            for grid in ['smolyak', 'tensor']:
+                if grid == 'tensor' and ndim * level > 6: continue
+                nodes = get_sparse_grid(ndim, level=level, grid=grid)
+                degrees = get_chebyshev_degrees(ndim, level=level, grid=grid)
+                assert len(nodes) == len(degrees)
+                assert len(np.unique(nodes, axis=0)) == len(nodes)
+                assert np.all(np.abs(nodes) <= 1.)
+                # Interpolation is exact
+                coefficients = np.random.RandomState(seed=42).normal(size=len(degrees))
+                x = np.random.RandomState(seed=42).uniform(-1., 1., size=(10, ndim))
+                design = chebyshev_basis(nodes, degrees)
+                assert np.allclose(np.linalg.solve(design, design.dot(coefficients)), coefficients)
+                assert np.allclose(chebyshev_basis(x[0], degrees), chebyshev_basis(x, degrees)[0])
+    assert np.allclose(chebyshev_basis(np.array([[0.3]]), np.array([[0], [1], [2], [3]])), [1., 0.3, 2 * 0.3**2 - 1, 4 * 0.3**3 - 3 * 0.3])
+
+
+def test_chebyshev(plot=False):
+    calculator = PowerModel()
+    emulator = Emulator(calculator, engine=ChebyshevEmulatorEngine(level=4))
+    emulator.set_samples()
+    emulator.fit()
+    emulator.check()
+
+    emulated_calculator = emulator.to_calculator()
+    rng = np.random.RandomState(seed=42)
+    for i in range(5):
+        params = {str(param): rng.uniform(*param.prior.limits) for param in calculator.varied_params}
+        calculator(**params)
+        emulated_calculator(**params)
+        assert np.allclose(emulated_calculator.model, calculator.model, rtol=1e-3, atol=1e-6)
+
+    state = emulator.engines['model'].__getstate__()
+    engine = ChebyshevEmulatorEngine.from_state(state)
+    X = np.array([[param.value for param in calculator.varied_params]] * 3)
+    assert np.allclose(engine.predict(X), emulator.engines['model'].predict(X))
+
+    if plot:
+        from matplotlib import pyplot as plt
+        ax = plt.gca()
+        for i, dx in enumerate(np.linspace(-0.5, 0.5, 5)):
+            calculator(**{str(param): param.value + dx for param in calculator.varied_params})
+            emulated_calculator(**{str(param): param.value + dx for param in emulated_calculator.varied_params})
+            color = 'C{:d}'.format(i)
+            ax.plot(calculator.x, calculator.model, color=color, linestyle='--')
+            ax.plot(emulated_calculator.x, emulated_calculator.model, color=color, linestyle='-')
+        plt.show()
+
+
+def test_fit_adaptive():
+    calculator = PowerModel()
+    emulator = Emulator(calculator, engine=ChebyshevEmulatorEngine(level=3))
+    emulator.set_samples()
+    size = emulator.samples['model'].size
+    precision = np.full(calculator.x.size, 1e4)
+    converged = emulator.fit_adaptive(precision=precision, max_chi2=1e-3, max_iterations=2, nsamples=2, seed=42)
+    assert emulator.samples['model'].size == size + 2 * len(emulator.diagnostics['chi2'])
+    assert converged == (emulator.diagnostics['chi2'][-1] < 1e-3)
+
+
+if __name__ == '__main__':
+
+    setup_logging()
+    test_sparse_grid()
+    test_chebyshev(plot=True)
+    test_fit_adaptive()
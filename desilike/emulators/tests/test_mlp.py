@@ -65,8 +65,38 @@ def test_mlp(plot=False):
         plt.show()
 
 
+def test_mlp_weights():
+    from desilike.emulators.mlp import MLPEmulatorEngine
+    rng = np.random.RandomState(seed=42)
+    nx, nhidden, npcs, ny = 2, 5, 3, 11
+    weights = {'x_mean': rng.normal(size=nx), 'x_sigma': rng.uniform(1., 2., size=nx),
+               'W_0': rng.normal(size=(nx, nhidden)), 'b_0': rng.normal(size=nhidden), 'alpha_0': rng.normal(size=nhidden), 'beta_0': rng.normal(size=nhidden),
+               'W_1': rng.normal(size=(nhidden, npcs)), 'b_1': rng.normal(size=npcs),
+               'eigenvectors': rng.normal(size=(npcs, ny)), 'pc_mean': rng.normal(size=npcs), 'pc_sigma': rng.uniform(1., 2., size=npcs),
+               'y_mean': rng.normal(size=ny), 'y_sigma': rng.uniform(1., 2., size=ny)}
+    # Operations, as stored by previous versions
+    operations = [{'eval': '(x - mean) / sigma', 'locals': {'mean': weights['x_mean'], 'sigma': weights['x_sigma']}},
+                  {'eval': 'x @ W + b', 'locals': {'W': weights['W_0'], 'b': weights['b_0']}},
+                  {'eval': '(beta + (1 - beta) / (1 + np.exp(-alpha * x))) * x', 'locals': {'alpha': weights['alpha_0'], 'beta': weights['beta_0']}},
+                  {'eval': 'x @ W + b', 'locals': {'W': weights['W_1'], 'b': weights['b_1']}},
+                  {'eval': '(x * sigma + mean) @ eigenvectors', 'locals': {'eigenvectors': weights['eigenvectors'], 'mean': weights['pc_mean'], 'sigma': weights['pc_sigma']}},
+                  {'eval': 'x * sigma + mean', 'locals': {'mean': weights['y_mean'], 'sigma': weights['y_sigma']}}]
+    X = rng.normal(size=(10, nx))
+    ref = MLPEmulatorEngine.from_state({'operations': operations}).predict(X)
+    engine = MLPEmulatorEngine.from_state({'weights': weights})
+    assert np.allclose(engine.predict(X), ref)
+    assert np.allclose(engine.predict(X[0]), ref[0])
+
+    fn = '_tests/mlp_weights'
+    engine.save_weights(fn)
+    engine = MLPEmulatorEngine.from_state(engine.__getstate__())
+    assert isinstance(engine.weights['W_0'], np.memmap)
+    assert np.allclose(engine.predict(X), ref)
+
+
 if __name__ == '__main__':
 
     setup_logging()
+    test_mlp_weights()
     test_mlp_linear(plot=True)
     test_mlp(plot=True)
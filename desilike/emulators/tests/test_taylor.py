@@ -83,6 +83,25 @@ def test_taylor_power(plot=False):
             plt.show()
 
 
+def test_monomial_plan():
+    import itertools
+    from desilike.emulators.taylor import get_monomial_plan
+    rng = np.random.RandomState(seed=42)
+    ndim = 5
+    powers = np.array([power for power in itertools.product(range(4), repeat=ndim) if sum(power) <= 4])
+    for powers in [powers, powers[rng.permutation(len(powers))[:len(powers) // 3]]]:  # full and sparse, shuffled
+        plan = get_monomial_plan(powers)
+        assert plan['sizes'].sum() >= np.sum(powers.sum(axis=-1) > 0)
+        engine = TaylorEmulatorEngine.from_state({'center': rng.normal(size=ndim), 'derivatives': rng.normal(size=(len(powers), 3)), 'powers': powers})
+        X = rng.normal(size=(10, ndim))
+        diffs = X - engine.center
+        ref = np.tensordot(np.prod(diffs[..., None, :]**powers, axis=-1), engine.derivatives, axes=(-1, 0))
+        assert np.allclose(engine.predict(X), ref)
+        assert np.allclose(engine.predict(X[0]), ref[0])
+        engine = TaylorEmulatorEngine.from_state(engine.__getstate__())
+        assert np.allclose(engine.predict(X), ref)
+
+
 def test_taylor(plot=False):
     from desilike.theories.galaxy_clustering import KaiserTracerPowerSpectrumMultipoles, ShapeFitPowerSpectrumTemplate
     calculator = KaiserTracerPowerSpectrumMultipoles(template=ShapeFitPowerSpectrumTemplate())
@@ -138,6 +157,7 @@ def test_likelihood():
 if __name__ == '__main__':
 
     setup_logging()
+    test_monomial_plan()
     test_taylor_power(plot=True)
     #test_taylor(plot=True)
     #test_likelihood()
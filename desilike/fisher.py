@@ -765,9 +765,13 @@ class Fisher(BaseClass):
         except AttributeError:
             pass
 
-    def run(self, **params):
+    def run_prior(self, **params):
+        """Compute :attr:`prior_fisher` for input parameter values."""
         diff = self.mpicomm.bcast(self.prior_differentiation(**params), root=0)
         self.prior_fisher = LikelihoodFisher(center=[self.prior_differentiation.center[str(param)] for param in self.varied_params], params=self.varied_params, **self._prior_finalize(diff))
+
+    def run(self, **params):
+        self.run_prior(**params)
         diff = self.mpicomm.bcast(self.likelihood_differentiation(**self.prior_differentiation.center), root=0)
         self.likelihood_fishers = [LikelihoodFisher(center=self.prior_fisher._center, params=self.varied_params, **kwargs) for kwargs in self._likelihood_finalize(diff)]
 
@@ -1,16 +1,74 @@
+import os
+import weakref
+
 import numpy as np
 
-from desilike.base import BaseCalculator, Parameter, ParameterCollection, ParameterArray
+from desilike.base import BaseCalculator, Parameter, ParameterCollection, ParameterArray, Samples
 from desilike.jax import numpy as jnp
-from desilike import plotting, utils
+from desilike import plotting, utils, mpi
+
 
+def get_whitening(covariance=None, precision=None):
+    r"""
+    Return triangular matrix :math:`W` such that the precision matrix is :math:`W W^{T}`,
+    from the Cholesky decomposition of ``covariance`` if provided, else of ``precision``.
+    The :math:`\chi^{2}` of :math:`d` is then :math:`\vert d W \vert^{2}`.
 
-def chi2(flatdiff, precision):
+    Parameters
+    ----------
+    covariance : array, default=None
+        Covariance matrix.
+
+    precision : array, default=None
+        If ``covariance`` is not provided, precision matrix.
+
+    Returns
+    -------
+    whitening : array, None
+        ``None`` if input matrix is diagonal (1D) or not positive definite.
+    """
+    from scipy import linalg
+    matrix = np.asarray(covariance if covariance is not None else precision, dtype='f8')
+    if matrix.ndim < 2:
+        return None
+    try:
+        cholesky = linalg.cholesky(matrix, lower=True)
+    except linalg.LinAlgError:
+        return None
+    if covariance is None:
+        return cholesky
+    # covariance = L L^T => precision = L^{-T} L^{-1}
+    return linalg.solve_triangular(cholesky, np.eye(cholesky.shape[0], dtype=cholesky.dtype), lower=True).T
+
+
+def chi2(flatdiff, precision, whitening=None):
+    r"""
+    Return :math:`\chi^{2}` of ``flatdiff`` (which may have leading batch axes).
+    If ``whitening`` (see :func:`get_whitening`) is provided, :math:`\chi^{2}` is computed as :math:`\vert d W \vert^{2}`,
+    i.e. with one matrix product for the whole batch; else with ``precision`` (matrix or its diagonal).
+    """
+    if whitening is not None:
+        flatdiff = flatdiff.dot(whitening)
+        return jnp.sum(flatdiff * flatdiff, axis=-1)
+    if flatdiff.ndim > 1:  # leading batch axis
+        if precision.ndim == 1:
+            return jnp.sum(flatdiff * precision * flatdiff, axis=-1)
+        return jnp.sum(flatdiff.dot(precision) * flatdiff, axis=-1)
     if precision.ndim == 1:
         return (flatdiff * precision).dot(flatdiff.T)
     return flatdiff.dot(precision).dot(flatdiff.T)
 
 
+def _get_solved_delta(param):
+    # Step for solved parameter ``param``, to check linearity / compute derivatives
+    try:
+        delta = float(param.proposal)
+    except AttributeError:
+        delta = 0.
+    if not (np.isfinite(delta) and delta > 0.): delta = 1.
+    return delta
+
+
 class BaseLikelihood(BaseCalculator):
 
     """Base class for likelihood."""
@@ -37,7 +95,7 @@ class BaseLikelihood(BaseCalculator):
     def get(self):
         pipeline = self.runtime_info.pipeline
         self.logprior = pipeline.params.prior(**pipeline.input_values)  # does not include solved params
-        if pipeline.more_calculate is None:
+        if pipeline.more_calculate is None and any(param.solved for param in pipeline.params):
             pipeline.more_calculate = self._solve
         return self.loglikelihood + self.logprior
 
@@ -86,18 +144,25 @@ class BaseLikelihood(BaseCalculator):
                 pipeline._varied_params = solved_params  # to set varied_params
                 pipeline._params = ParameterCollection([param.clone(derived=False) if param in pipeline._varied_params else param.clone(fixed=True) for param in params_bak])
                 pipeline._varied_params.updated, pipeline._params.updated = False, False
+                logprior = self.logprior
                 self.fisher = Fisher(self, method='auto')
                 pipeline._params, pipeline._varied_params = params_bak, varied_params_bak
+                self.logprior = logprior  # may have been computed with solved parameters varied
+                self._solve_cache = {}
 
             values = dict(pipeline.input_values)
+            updated = False
             for param in solved_params:
-                if not np.isfinite(values[param.name]): values[param.name] = param.value
-            posterior_fisher = self.fisher(**values)
+                if not np.isfinite(values[param.name]):
+                    values[param.name] = param.value
+                    updated = True
+            posterior_fisher = self._solve_fisher(values, updated=updated)
             #pipeline.derived = derived
             pipeline.more_calculate = self._solve
+            pipeline.more_batch_calculate = self._solve_batch if self._solve_cache['linear'] else None
             # flatdiff is theory - data
-            x = posterior_fisher.mean()
-            dx = x - posterior_fisher._center
+            dx, logdet = self._solve_factor(posterior_fisher, indices_marg)
+            x = posterior_fisher._center + dx
 
             derivs = [()] + [(param1.name, param2.name) for iparam1, param1 in enumerate(solved_params) for param2 in solved_params[iparam1:]]
             indices_derivs = posterior_fisher._index([deriv[0] for deriv in derivs[1:]]), posterior_fisher._index([deriv[1] for deriv in derivs[1:]])
@@ -128,7 +193,7 @@ class BaseLikelihood(BaseCalculator):
                 derived.set(ParameterArray(loglikelihood, param=likelihood._param_loglikelihood, derivs=derivs))
             sum_loglikelihood += loglikelihood
         if indices_marg:
-            sum_loglikelihood.flat[0] -= 1. / 2. * np.linalg.slogdet(- posterior_fisher._hessian[np.ix_(indices_marg, indices_marg)])[1]
+            sum_loglikelihood.flat[0] -= 1. / 2. * logdet
             # sum_loglikelihood += 1. / 2. * len(indices_marg) * np.log(2. * np.pi)
             # Convention: in the limit of no likelihood constraint on dx, no change to the loglikelihood
             # This allows to ~ keep the interpretation in terms of -1. / 2. chi2
@@ -145,6 +210,175 @@ class BaseLikelihood(BaseCalculator):
             derived.set(ParameterArray(self.logprior, param=self._param_logprior, derivs=derivs))
         return self.loglikelihood.flat[0] + self.logprior.flat[0]
 
+    def _solve_fisher(self, values, updated=False):
+        # Return posterior Fisher for solved parameters at input values.
+        # If solved parameters enter (Gaussian) likelihoods linearly, derivatives of flatdiff w.r.t. solved parameters (the design matrix)
+        # only depend on the other parameters; they are cached, such that as long as the other parameters are not updated,
+        # likelihood gradients and Hessians are obtained with matrix products, without running the Fisher differentiation.
+        # If ``updated``, calculators have not been run with input values of solved parameters.
+        from desilike.fisher import LikelihoodFisher
+        fisher, cache = self.fisher, self._solve_cache
+        likelihoods = getattr(self, 'likelihoods', [self])
+        solved_names = [param.name for param in fisher.varied_params]
+
+        def get_flatderivs(values):
+            diff = fisher.mpicomm.bcast(fisher.likelihood_differentiation(**values), root=0)
+            return [np.array([derivs[param] for param in fisher.varied_params]) for derivs in diff]
+
+        flatderivs = None
+        linear = cache.get('linear', None)
+        if linear is None:
+            cache['closed'] = False
+            linear = all(isinstance(likelihood, BaseGaussianLikelihood) and likelihood._whiten(likelihood.flatdata) is not None for likelihood in likelihoods)
+            if linear:
+                # Closed-form derivatives, independent of all parameters, if provided by all likelihoods
+                flatderivs = [likelihood._get_solved_flatderivs(fisher.varied_params) for likelihood in likelihoods]
+                cache['closed'] = all(flatderiv is not None for flatderiv in flatderivs)
+                if not cache['closed']: flatderivs = None
+            if linear and not cache['closed']:
+                # Check derivatives do not depend on solved parameters
+                shifted = {**values, **{param.name: values[param.name] + _get_solved_delta(param) for param in fisher.varied_params}}
+                shifted_flatderivs = get_flatderivs(shifted)
+                flatderivs = get_flatderivs(values)  # last, such that calculators are left in the state corresponding to values
+                linear = all(np.allclose(flatderiv, shifted_flatderiv, rtol=1e-6, atol=1e-8 * np.max(np.abs(flatderiv), initial=0.))
+                             for flatderiv, shifted_flatderiv in zip(flatderivs, shifted_flatderivs))
+            cache['linear'] = linear
+            if self.mpicomm.rank == 0:
+                self.log_debug('Solved parameters {} enter the likelihood {}.'.format(solved_names, 'linearly' if linear else 'non-linearly'))
+        if not linear:
+            return fisher(**values)
+
+        key = np.array([value for name, value in values.items() if name not in solved_names], dtype='f8')
+        if flatderivs is None and not cache['closed'] and (updated or 'key' not in cache or not np.array_equal(key, cache['key'], equal_nan=True)):
+            flatderivs = get_flatderivs(values)
+        if flatderivs is not None:
+            cache['key'] = key
+            cache['whitened'] = [likelihood._whiten(flatderiv) for likelihood, flatderiv in zip(likelihoods, flatderivs)]
+            cache['hessians'] = [- whitened.dot(whitened.T) for whitened in cache['whitened']]
+        center = [values[name] for name in solved_names]
+        fisher.likelihood_fishers = []
+        for likelihood, whitened, hessian in zip(likelihoods, cache['whitened'], cache['hessians']):
+            flatdiff = likelihood._whiten(np.asarray(likelihood.flatdiff))
+            fisher.likelihood_fishers.append(LikelihoodFisher(center=center, params=fisher.varied_params, offset=- flatdiff.dot(flatdiff), gradient=- whitened.dot(flatdiff), hessian=hessian))
+        fisher.run_prior(**values)
+        posterior_fisher = sum(fisher.likelihood_fishers) + fisher.prior_fisher
+        posterior_fisher.with_prior = True
+        return posterior_fisher
+
+    def _solve_batch(self, size, values, calculate):
+        # Batch version of :meth:`_solve`, for ``size`` points of input ``values`` (arrays for parameters that vary from one point to the other),
+        # if solved parameters enter Gaussian likelihoods linearly.
+        # ``calculate(values, names)`` updates calculators that depend on parameters ``names``.
+        # Gradients and Hessians are stacked into (size, nsolved) and (size, nsolved, nsolved) arrays, for batched linear algebra.
+        # Returns derived parameters, or ``None`` if not possible (calculation then falls back to point-by-point).
+        pipeline = self.runtime_info.pipeline
+        all_params = pipeline.params
+        fisher, cache = getattr(self, 'fisher', None), getattr(self, '_solve_cache', {})
+        solved_params = ParameterCollection([param for param in all_params if param.solved])
+        if fisher is None or not cache.get('linear', False) or fisher.varied_params.names() != solved_params.names():
+            return None
+        likelihoods = getattr(self, 'likelihoods', [self])
+        solve_likelihoods = [likelihood for likelihood in likelihoods if any(param.solved for param in likelihood.all_params)]
+        indices_marg = []
+        for iparam, param in enumerate(solved_params):
+            solved = param.derived
+            if solved == '.auto': solved = self.solved_default
+            if solved == '.marg': indices_marg.append(iparam)
+        values, updated = dict(values), []
+        for param in solved_params:
+            if np.ndim(values[param.name]): return None
+            if not np.isfinite(values[param.name]):
+                values[param.name] = param.value
+                updated.append(param.name)
+        if updated: calculate(values, names=updated)
+        center = np.array([values[param.name] for param in solved_params], dtype='f8')
+        loglikelihoods = [np.broadcast_to(np.asarray(likelihood.loglikelihood, dtype='f8'), (size,)) for likelihood in likelihoods]
+        logprior = np.broadcast_to(np.asarray(self.logprior, dtype='f8'), (size,))
+        flatdiffs = [np.asarray(likelihood.flatdiff) for likelihood in solve_likelihoods]
+        if cache.get('closed', False):
+            # Closed-form derivatives, already whitened
+            flatderivs = [cache['whitened'][likelihoods.index(likelihood)] for likelihood in solve_likelihoods]
+        else:
+            # Solved parameters enter linearly: finite differences are exact
+            flatderivs, names = [[] for likelihood in solve_likelihoods], []
+            for param, value in zip(solved_params, center):
+                delta = _get_solved_delta(param)
+                names = names[-1:] + [param.name]  # also update calculators with the previous shift
+                calculate({**values, param.name: value + delta}, names=names)
+                for flatderiv, flatdiff, likelihood in zip(flatderivs, flatdiffs, solve_likelihoods):
+                    flatderiv.append((np.asarray(likelihood.flatdiff) - flatdiff) / delta)
+            flatderivs = [likelihood._whiten(np.stack(flatderiv, axis=-2)) for flatderiv, likelihood in zip(flatderivs, solve_likelihoods)]
+        likelihood_gradients, likelihood_hessians = [], []
+        for flatderiv, flatdiff, likelihood in zip(flatderivs, flatdiffs, solve_likelihoods):
+            flatderiv = np.broadcast_to(flatderiv, (size, len(solved_params), flatderiv.shape[-1]))
+            flatdiff = likelihood._whiten(np.broadcast_to(flatdiff, (size, flatdiff.shape[-1])))
+            likelihood_gradients.append(- np.matmul(flatderiv, flatdiff[..., None])[..., 0])
+            likelihood_hessians.append(- np.matmul(flatderiv, np.swapaxes(flatderiv, -2, -1)))
+
+        if all(param.prior.dist in ['norm', 'uniform'] and not param.depends for param in solved_params):
+            precisions = np.array([1. / getattr(param.prior, 'scale', np.inf)**2 for param in solved_params])
+            prior_gradient = - (center - np.array([getattr(param.prior, 'loc', 0.) for param in solved_params])) * precisions
+            prior_hessian = - np.diag(precisions)
+        elif fisher.mpicomm is self.mpicomm:
+            fisher.run_prior(**{param.name: value for param, value in zip(solved_params, center)})
+            prior_gradient, prior_hessian = fisher.prior_fisher._gradient, fisher.prior_fisher._hessian
+        else:
+            return None
+        posterior_gradient = sum(likelihood_gradients) + prior_gradient
+        posterior_hessian = sum(likelihood_hessians) + prior_hessian
+        dx = np.linalg.solve(- posterior_hessian, posterior_gradient[..., None])[..., 0]
+        x = center + dx
+
+        derived = Samples()
+        derivs = [()] + [(param1.name, param2.name) for iparam1, param1 in enumerate(solved_params) for param2 in solved_params[iparam1:]]
+        indices_derivs = np.triu_indices(len(solved_params))
+        sum_logprior = np.zeros(size, dtype='f8')
+        for param, xx in zip(solved_params, x.T):
+            sum_logprior += param.prior(xx)
+            derived.set(ParameterArray(xx, param=param))
+        sum_logprior = np.column_stack([sum_logprior, np.broadcast_to(prior_hessian[indices_derivs], (size, len(derivs) - 1))])
+        sum_loglikelihood = np.zeros((size, len(derivs)), dtype='f8')
+        for likelihood, loglikelihood in zip(likelihoods, loglikelihoods):
+            if likelihood in solve_likelihoods:
+                ilikelihood = solve_likelihoods.index(likelihood)
+                gradient, hessian = likelihood_gradients[ilikelihood], likelihood_hessians[ilikelihood]
+                loglikelihood = loglikelihood + 1. / 2. * np.sum(dx * np.matmul(hessian, dx[..., None])[..., 0], axis=-1) + np.sum(gradient * dx, axis=-1)
+                loglikelihood = np.column_stack([loglikelihood, hessian[(Ellipsis,) + indices_derivs]])
+            derived.set(ParameterArray(loglikelihood, param=likelihood._param_loglikelihood, derivs=derivs if loglikelihood.ndim > 1 else None))
+            sum_loglikelihood += loglikelihood if loglikelihood.ndim > 1 else loglikelihood[:, None]
+        if indices_marg:
+            sum_loglikelihood[:, 0] -= 1. / 2. * np.linalg.slogdet(- posterior_hessian[..., indices_marg, :][..., indices_marg])[1]
+            ip = prior_hessian[indices_marg]
+            sum_loglikelihood[:, 0] += 1. / 2. * np.sum(np.log(ip[ip > 0.]))  # logdet
+        sum_logprior[:, 0] += logprior
+        derived.set(ParameterArray(sum_loglikelihood, param=self._param_loglikelihood, derivs=derivs))
+        derived.set(ParameterArray(sum_logprior, param=self._param_logprior, derivs=derivs))
+        for param, xx in zip(solved_params, x[-1]):
+            pipeline.input_values[param.name] = xx
+        return derived
+
+    def _solve_factor(self, posterior_fisher, indices_marg):
+        # Return shift to the posterior mean and log-determinant of the posterior precision of marginalized parameters,
+        # using the Cholesky factorization of the posterior precision, cached as long as the Hessian does not change
+        from scipy import linalg
+        cache = self._solve_cache
+        hessian = posterior_fisher._hessian
+        if 'hessian' not in cache or not np.array_equal(hessian, cache['hessian']):
+            cache['hessian'] = hessian
+            try:
+                cache['cholesky'] = linalg.cho_factor(- hessian, lower=True)
+            except (linalg.LinAlgError, ValueError):  # not positive definite, or not finite
+                cache['cholesky'] = None
+            if cache['cholesky'] is not None and len(indices_marg) == hessian.shape[0]:
+                cache['logdet'] = 2. * np.sum(np.log(np.diag(cache['cholesky'][0])))
+            else:
+                cache['logdet'] = np.linalg.slogdet(- hessian[np.ix_(indices_marg, indices_marg)])[1]
+        if cache['cholesky'] is None:
+            dx = posterior_fisher.mean() - posterior_fisher._center
+        else:
+            dx = linalg.cho_solve(cache['cholesky'], posterior_fisher._gradient)
+        return dx, cache['logdet']
+
     @classmethod
     def sum(cls, *others):
         """Sum likelihoods: return :class:`SumLikelihood` instance."""
@@ -178,7 +412,7 @@ class BaseLikelihood(BaseCalculator):
     @property
     def size(self):
         # Theory vector size
-        return len(self.flattheory)
+        return self.flattheory.shape[-1]
 
     @property
     def nvaried(self):
@@ -203,6 +437,11 @@ class BaseGaussianLikelihood(BaseLikelihood):
 
     precision : array, default=None
         If ``covariance`` is not provided, precision matrix (or its diagonal).
+
+    Note
+    ----
+    The Cholesky factorization of the covariance (or precision) matrix is computed once,
+    and stored as :attr:`whitening` (see :func:`get_whitening`), to compute the chi2.
     """
     _attrs = ['loglikelihood', 'logprior']
 
@@ -211,14 +450,42 @@ class BaseGaussianLikelihood(BaseLikelihood):
         if precision is None:
             if covariance is None:
                 raise ValueError('Provide either precision or covariance matrix to {}'.format(self.__class__))
-            self.precision = utils.inv(np.atleast_2d(np.array(covariance, dtype='f8')))
+            self.set_precision(covariance=np.atleast_2d(np.array(covariance, dtype='f8')))
         else:
-            self.precision = np.atleast_1d(np.array(precision, dtype='f8'))
+            self.set_precision(precision=np.atleast_1d(np.array(precision, dtype='f8')))
         super(BaseGaussianLikelihood, self).initialize(**kwargs)
 
+    def set_precision(self, covariance=None, precision=None):
+        """
+        Set precision matrix :attr:`precision` and :attr:`whitening`, from the Cholesky factorization of ``covariance`` if provided,
+        else of ``precision``. If the factorization fails (matrix not positive definite), :attr:`whitening` is ``None``
+        and :attr:`precision` is obtained by matrix inversion.
+        """
+        self.whitening = get_whitening(covariance=covariance, precision=precision)
+        if precision is None:
+            if self.whitening is None:
+                precision = utils.inv(covariance)
+            else:
+                precision = self.whitening.dot(self.whitening.T)
+        self.precision = precision
+
     def calculate(self):
         self.flatdiff = self.flattheory - self.flatdata
-        self.loglikelihood = -0.5 * chi2(self.flatdiff, self.precision)
+        self.loglikelihood = -0.5 * chi2(self.flatdiff, self.precision, whitening=getattr(self, 'whitening', None))
+
+    def _get_solved_flatderivs(self, params):
+        # Return derivatives of flatdiff w.r.t. solved parameters ``params`` (array of shape (len(params), flatdiff size)),
+        # if known in closed form and independent of all parameters; else None, and derivatives are obtained by differentiation
+        return None
+
+    def _whiten(self, flatdiff):
+        # Return flatdiff (last axis) multiplied by the whitening matrix (or square root of the diagonal precision); None if not available
+        whitening = getattr(self, 'whitening', None)
+        if whitening is not None:
+            return flatdiff.dot(whitening)
+        if self.precision.ndim == 1:
+            return flatdiff * self.precision**0.5
+        return None
 
     def __getstate__(self):
         state = {}
@@ -245,6 +512,8 @@ class ObservablesGaussianLikelihood(BaseGaussianLikelihood):
     scale_covariance : float, default=1.
         Scale covariance by this value.
     """
+    _batch = True
+
     def initialize(self, observables, covariance=None, scale_covariance=1., precision=None, **kwargs):
         if not utils.is_sequence(observables):
             observables = [observables]
@@ -300,10 +569,14 @@ class ObservablesGaussianLikelihood(BaseGaussianLikelihood):
                 obs.covariance = self.covariance[sl, sl]
                 start = stop
             if self.precision is None:
-                # Block-inversion is usually more numerically stable
-                self.precision = utils.blockinv([[self.covariance[sl1, sl2] for sl2 in slices] for sl1 in slices])
+                self.set_precision(covariance=self.covariance)
+                if self.whitening is None:
+                    # Block-inversion is usually more numerically stable
+                    self.precision = utils.blockinv([[self.covariance[sl1, sl2] for sl2 in slices] for sl1 in slices])
+            else:
+                self.set_precision(precision=self.precision)
         else:
-            self.precision /= scale_covariance
+            self.set_precision(precision=self.precision / scale_covariance)
         size = self.precision.shape[0]
         if self.nobs is not None:
             self.hartlap = (self.nobs - size - 2.) / (self.nobs - 1.)
@@ -311,12 +584,14 @@ class ObservablesGaussianLikelihood(BaseGaussianLikelihood):
                 self.log_info('Covariance matrix with {:d} points built from {:d} observations.'.format(size, self.nobs))
                 self.log_info('...resulting in Hartlap factor of {:.4f}.'.format(self.hartlap))
             self.precision *= self.hartlap
+            if self.whitening is not None:
+                self.whitening *= self.hartlap**0.5
         BaseLikelihood.initialize(self, **kwargs)
         self.runtime_info.requires = self.observables
 
     @property
     def flattheory(self):
-        return jnp.concatenate([obs.flattheory for obs in self.observables], axis=0)
+        return jnp.concatenate([obs.flattheory for obs in self.observables], axis=-1)
 
     @plotting.plotter
     def plot_covariance_matrix(self, corrcoef=True, **kwargs):
@@ -357,18 +632,194 @@ class ObservablesGaussianLikelihood(BaseGaussianLikelihood):
         return plot_covariance_matrix(mat, corrcoef=corrcoef, **kwargs)
 
 
+def _get_component_loglikelihood(likelihood, values):
+    # Calculate ``likelihood`` at input ``values`` (dictionary mapping parameter name to value) in its own pipeline,
+    # and return its log-likelihood and the log-prior of solved parameters (that of input parameters is computed by the sum likelihood)
+    pipeline = likelihood.runtime_info.pipeline
+    pipeline.calculate(**{name: value for name, value in values.items() if name in pipeline.params})
+    loglikelihood, logprior = (float(np.ravel(value)[0]) for value in (likelihood.loglikelihood, likelihood.logprior))
+    return np.array([loglikelihood, logprior - float(pipeline.params.prior(**pipeline.input_values))])
+
+
+def _component_worker(likelihood, connection):
+    # Worker process: calculate ``likelihood`` at the parameter values received through ``connection``, send back the log-likelihood,
+    # until ``None`` is received or the connection is closed
+    while True:
+        try:
+            values = connection.recv()
+        except EOFError:
+            break
+        if values is None:
+            break
+        try:
+            toret = _get_component_loglikelihood(likelihood, values)
+        except Exception as exc:
+            toret = exc
+        try:
+            connection.send(toret)
+        except Exception:  # exception cannot be pickled
+            connection.send(ValueError(str(toret)))
+    connection.close()
+
+
+def _stop_workers(workers, pid):
+    # Stop worker processes ``workers`` (list of (process, connection)) started by process ``pid``;
+    # called by :meth:`SumLikelihood.close`, or when the likelihood is garbage-collected, or at exit
+    if os.getpid() != pid: return  # e.g. in a forked worker
+    for process, connection in workers:
+        try:
+            connection.send(None)
+            connection.close()
+        except (OSError, ValueError):  # process already ended, or connection already closed
+            pass
+        process.join(timeout=10)
+        if process.is_alive(): process.terminate()
+
+
 class SumLikelihood(BaseLikelihood):
+    """
+    Sum of likelihoods.
 
+    Parameters
+    ----------
+    likelihoods : list
+        List of likelihoods.
+
+    parallel : int, str, default=None
+        If ``None``, component likelihoods are calculated one after the other, in the same pipeline,
+        such that common calculators (e.g. cosmology) are computed once.
+        Else, each component likelihood is calculated in its own pipeline, concurrently, and only its log-likelihood is communicated.
+        Calculators that are common to several component likelihoods are then computed in each process (or group of ranks);
+        this reduces the latency of a single evaluation (e.g. for sequential MCMC) if component likelihoods have costly independent calculators.
+        If an integer, number of local processes (forked at the first evaluation, such that component likelihoods
+        must not be updated afterwards) over which component likelihoods are distributed.
+        Processes are started with the 'fork' method, such that likelihoods do not need to be pickled;
+        forking is unsafe if threads have already been started in the main process, e.g. by jax or by the MPI library
+        (child processes may then deadlock): in this case, evaluate the likelihood once before any such calculation, or use 'mpi'.
+        Processes are stopped by :meth:`close`, or when the likelihood is deleted, or at exit.
+        If 'mpi', the MPI communicator is split in groups of ranks, each calculating one (or several) component likelihoods;
+        then the likelihood must be called collectively, with the same parameters, on all ranks.
+        In :meth:`BasePipeline.mpicalculate`, where each rank calculates its own points, component likelihoods are calculated one after the other.
+        In both cases, parameters must be solved (analytic marginalization) in component likelihoods, not in the sum.
+    """
     _attrs = ['loglikelihood', 'logprior']
+    _batch = True
+    _with_namespace = True
 
-    def initialize(self, likelihoods, **kwargs):
+    def initialize(self, likelihoods, parallel=None, **kwargs):
         if not utils.is_sequence(likelihoods): likelihoods = [likelihoods]
         self.likelihoods = list(likelihoods)
+        if parallel is not None and not (parallel == 'mpi' or (isinstance(parallel, int) and parallel > 0)):
+            raise ValueError('parallel must be None, "mpi" or a strictly positive integer, found {}'.format(parallel))
+        self.close()  # in case of reinitialization
+        self.parallel = parallel
+        if self.parallel is None:
+            super(SumLikelihood, self).initialize(**kwargs)
+            self.runtime_info.requires = self.likelihoods
+            return
+        # Component likelihoods are calculated in their own pipeline: take their input parameters
+        for likelihood in self.likelihoods:
+            for param in likelihood.all_params:
+                if param.solved or not param.input: continue
+                if param in self.params and param != self.params[param]:
+                    raise ValueError('Parameter {} of {} is different from that of another likelihood'.format(param, likelihood))
+                self.params.set(param.copy())
         super(SumLikelihood, self).initialize(**kwargs)
-        self.runtime_info.requires = self.likelihoods
+        self.runtime_info.requires = []
+        self._batch = False
+
+    def calculate(self, **params):
+        if self.parallel is None:
+            self.loglikelihood = sum(likelihood.loglikelihood for likelihood in self.likelihoods)
+            return
+        solved_params = [param for param in self.runtime_info.params if param.solved]
+        if solved_params:
+            raise ValueError('With parallel = {}, parameters must be solved in component likelihoods, found {}'.format(self.parallel, solved_params))
+        if self.parallel == 'mpi':
+            self.loglikelihood, self._solved_logprior = self._mpi_calculate(params)
+        else:
+            self.loglikelihood, self._solved_logprior = self._process_calculate(params)
 
-    def calculate(self):
-        self.loglikelihood = sum(likelihood.loglikelihood for likelihood in self.likelihoods)
+    def get(self):
+        toret = super(SumLikelihood, self).get()
+        if self.parallel is not None:
+            # Add log-prior of parameters solved in component likelihoods
+            self.logprior += self._solved_logprior
+            toret += self._solved_logprior
+        return toret
+
+    def _get_group_likelihood(self, indices):
+        # Return likelihood calculating component likelihoods of indices ``indices`` in a single pipeline,
+        # such that calculators they have in common are computed once and consistently
+        likelihoods = [self.likelihoods[index] for index in indices]
+        if len(likelihoods) == 1:
+            return likelihoods[0]
+        return SumLikelihood(likelihoods)
+
+    def _mpi_calculate(self, values):
+        # Split MPI communicator in groups of ranks, each calculating its component likelihoods; sum log-likelihoods of group roots
+        mpicomm, nlikelihoods = self.mpicomm, len(self.likelihoods)
+        if id(mpicomm) not in self._mpigroups:
+            if mpicomm.size == 1:
+                groups, color, groupcomm = [list(range(nlikelihoods))], 0, mpi.COMM_SELF
+            else:
+                if mpicomm.size >= nlikelihoods:  # one group of ranks per likelihood
+                    groups, color = [[ilikelihood] for ilikelihood in range(nlikelihoods)], mpicomm.rank * nlikelihoods // mpicomm.size
+                else:  # one rank per group of likelihoods
+                    groups, color = [list(range(rank, nlikelihoods, mpicomm.size)) for rank in range(mpicomm.size)], mpicomm.rank
+                groupcomm = mpicomm.Split(color, mpicomm.rank)
+            self._mpigroups[id(mpicomm)] = (mpicomm, groupcomm, self._get_group_likelihood(groups[color]))
+        mpicomm, groupcomm, likelihood = self._mpigroups[id(mpicomm)]
+        if likelihood.mpicomm is not groupcomm: likelihood.mpicomm = groupcomm
+        toret, error = np.zeros(2, dtype='f8'), None
+        try:
+            toret = _get_component_loglikelihood(likelihood, values)
+        except Exception as exc:
+            error = exc
+        if mpicomm.size == 1:
+            if error is not None: raise error
+            return toret
+        errors = mpicomm.allgather(error)
+        for error in errors:
+            if error is not None: raise error
+        return mpicomm.allreduce(toret if groupcomm.rank == 0 else np.zeros_like(toret))
+
+    def _process_calculate(self, values):
+        # Send input values to worker processes, each calculating its component likelihoods, and sum the log-likelihoods they send back
+        if self._workers is None:
+            import multiprocessing
+            context = multiprocessing.get_context('fork')  # workers inherit initialized likelihoods; see fork safety in class docstring
+            nprocs = min(self.parallel, len(self.likelihoods))
+            self._workers = []
+            for iproc in range(nprocs):
+                likelihood = self._get_group_likelihood(range(iproc, len(self.likelihoods), nprocs))
+                likelihood.runtime_info.pipeline  # initialize before forking
+                connection, worker_connection = context.Pipe()
+                process = context.Process(target=_component_worker, args=(likelihood, worker_connection), daemon=True)
+                process.start()
+                worker_connection.close()
+                self._workers.append((process, connection))
+            self._finalizer = weakref.finalize(self, _stop_workers, self._workers, os.getpid())
+            self.log_debug('Started {:d} processes to calculate {:d} likelihoods.'.format(nprocs, len(self.likelihoods)))
+        values = {name: np.asarray(value) for name, value in values.items()}
+        for process, connection in self._workers:
+            connection.send(values)
+        results = [connection.recv() for process, connection in self._workers]
+        for result in results:
+            if isinstance(result, Exception): raise result
+        return sum(results)
+
+    def close(self):
+        """
+        Stop worker processes and free MPI communicators, if any; they are created again at the next evaluation.
+        With ``parallel = 'mpi'``, must be called collectively, on all ranks.
+        """
+        if getattr(self, '_workers', None) is not None:
+            self._finalizer()
+        self._workers = None
+        for mpicomm, groupcomm, likelihood in (getattr(self, '_mpigroups', None) or {}).values():
+            if groupcomm is not mpi.COMM_SELF: groupcomm.Free()
+        self._mpigroups = {}
 
     @property
     def size(self):
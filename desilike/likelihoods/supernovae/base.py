@@ -4,6 +4,97 @@ from collections import UserDict
 import numpy as np
 
 from desilike.likelihoods.base import BaseLikelihood, BaseGaussianLikelihood
+from desilike.utils import BaseClass
+
+
+class SNCovariance(BaseClass):
+    r"""
+    Covariance matrix :math:`C = C_{0} + \sigma^{2} D + U \mathrm{diag}(s) U^{T}`, with base covariance :math:`C_{0}` (of shape (n, n)),
+    fixed diagonal :math:`D` (e.g. per-supernova weights of the intrinsic scatter :math:`\sigma`), and fixed templates :math:`U` (of shape (n, k), e.g. ones for the absolute magnitude),
+    while :math:`\sigma` and template variances :math:`s` may depend on parameters.
+    The eigendecomposition :math:`D^{-1/2} C_{0} D^{-1/2} = V \mathrm{diag}(\lambda) V^{T}` is computed once, in :math:`O(n^{3})`;
+    then :math:`C_{0} + \sigma^{2} D = D^{1/2} V \mathrm{diag}(\lambda + \sigma^{2}) V^{T} D^{1/2}`, and the template term is included
+    with the Woodbury identity and the matrix determinant lemma, such that :meth:`__call__` costs :math:`O(n^{2})` (a single matrix-vector product).
+
+    Parameters
+    ----------
+    covariance : array
+        Base covariance matrix :math:`C_{0}`, of shape (n, n).
+
+    diagonal : array, default=None
+        Diagonal :math:`D`, of shape (n,). Defaults to ones.
+
+    templates : array, default=None
+        Templates :math:`U`, of shape (n, k).
+    """
+    def __init__(self, covariance, diagonal=None, templates=None):
+        covariance = np.array(covariance, dtype='f8')
+        size = covariance.shape[0]
+        if diagonal is None:
+            diagonal = np.ones(size, dtype='f8')
+        diagonal = np.array(diagonal, dtype='f8')
+        sqrtdiagonal = diagonal**0.5
+        self.eigenvalues, eigenvectors = np.linalg.eigh(covariance / sqrtdiagonal[:, None] / sqrtdiagonal)
+        if self.eigenvalues[0] <= 0.:
+            raise ValueError('Covariance matrix is not positive definite')
+        self.rotation = eigenvectors.T / sqrtdiagonal  # V^T D^{-1/2}
+        self.logdet_diagonal = np.sum(np.log(diagonal))
+        self.templates = None
+        if templates is not None:
+            self.templates = self.rotation.dot(np.array(templates, dtype='f8').reshape(size, -1))
+
+    def rotate(self, flatdiff):
+        """Rotate ``flatdiff`` (last axis) to the eigenbasis, i.e. multiply by :math:`V^{T} D^{-1/2}`; this is the :math:`O(n^{2})` step."""
+        return np.asarray(flatdiff).dot(self.rotation.T)
+
+    def __call__(self, flatdiff, scale=0., variances=None):
+        r"""
+        Return :math:`\chi^{2}` and log-determinant of the covariance matrix.
+
+        Parameters
+        ----------
+        flatdiff : array
+            Difference between theory and data, of shape (..., n).
+
+        scale : float, default=0.
+            Amplitude :math:`\sigma` of the diagonal term.
+
+        variances : array, default=None
+            Variances :math:`s` (strictly positive) of the template amplitudes, of shape (k,).
+            Infinite variances correspond to flat priors: the corresponding (infinite) contribution :math:`\log s` to the log-determinant is dropped.
+            Defaults to infinite variances. Ignored if no templates.
+
+        Returns
+        -------
+        chi2 : array
+            :math:`\chi^{2}`, of shape (...).
+
+        logdet : float, array
+            Log-determinant of the covariance matrix, of shape (...).
+
+        amplitudes : array
+            Only if templates are provided, posterior mean of the template amplitudes :math:`a`,
+            for ``flatdiff`` :math:`= U a + \epsilon`, :math:`\epsilon \sim \mathcal{N}(0, C_{0} + \sigma^{2} D)`, of shape (..., k).
+        """
+        eigenvalues = self.eigenvalues + scale**2
+        flatdiff = self.rotate(flatdiff) / eigenvalues**0.5
+        chi2 = np.sum(flatdiff**2, axis=-1)
+        logdet = np.sum(np.log(eigenvalues)) + self.logdet_diagonal
+        if self.templates is None:
+            return chi2, logdet
+        templates = self.templates / eigenvalues[:, None]**0.5
+        # Woodbury: C^{-1} = C_{1}^{-1} - C_{1}^{-1} U (S^{-1} + U^{T} C_{1}^{-1} U)^{-1} U^{T} C_{1}^{-1}
+        # Determinant lemma: det(C) = det(C_{1}) det(S) det(S^{-1} + U^{T} C_{1}^{-1} U)
+        if variances is None:
+            variances = np.full(templates.shape[-1], np.inf)
+        variances = np.array(variances, dtype='f8')
+        finite = np.isfinite(variances)
+        matrix = templates.T.dot(templates) + np.diag(np.where(finite, 1. / variances, 0.))
+        projection = flatdiff.dot(templates)
+        amplitudes = np.linalg.solve(matrix, projection[..., None])[..., 0]
+        chi2 = chi2 - np.sum(projection * amplitudes, axis=-1)
+        logdet = logdet + np.sum(np.log(variances[finite])) + np.linalg.slogdet(matrix)[1]
+        return chi2, logdet, amplitudes
 
 
 class BaseSNLikelihood(BaseGaussianLikelihood):
@@ -33,8 +124,45 @@ class BaseSNLikelihood(BaseGaussianLikelihood):
             from desilike.theories.primordial_cosmology import Cosmoprimo
             cosmo = Cosmoprimo()
         self.cosmo = cosmo
+        self.varying_covariance = None
         BaseLikelihood.initialize(self)
 
+    def set_covariance(self, covariance, diagonal=None, templates=None, scale=0.):
+        r"""
+        Set covariance matrix :math:`C_{0} + \sigma^{2} D + U \mathrm{diag}(s) U^{T}`, see :class:`SNCovariance`.
+        The base covariance :math:`C_{0}` is factorized once; if ``diagonal`` or ``templates`` are provided,
+        :math:`\sigma` and :math:`s` can be passed to :meth:`calculate` at each evaluation, at a cost :math:`O(n^{2})`.
+        :attr:`covariance` (and :attr:`precision`) is :math:`C_{0} + \sigma^{2} D` for the reference amplitude :math:`\sigma` = ``scale``,
+        with respect to which the log-determinant entering the log-likelihood is normalized.
+        """
+        covariance = np.array(covariance, dtype='f8')
+        self.varying_covariance = None
+        if diagonal is not None or templates is not None:
+            self.varying_covariance = SNCovariance(covariance, diagonal=diagonal, templates=templates)
+            self._logdet = np.sum(np.log(self.varying_covariance.eigenvalues + scale**2)) + self.varying_covariance.logdet_diagonal  # log-determinant of the reference covariance
+            if diagonal is not None:
+                covariance = covariance + scale**2 * np.diag(diagonal)
+        self.covariance = covariance
+        self.set_precision(covariance=self.covariance)
+
+    def calculate(self, scale=0., variances=None):
+        """
+        Compute log-likelihood from :attr:`flattheory` and :attr:`flatdata`.
+        If covariance varies (see :meth:`set_covariance`), ``scale`` and template ``variances`` are used,
+        and the log-likelihood includes the change in log-determinant with respect to the reference covariance.
+        """
+        if self.varying_covariance is None:
+            return super(BaseSNLikelihood, self).calculate()
+        self.flatdiff = self.flattheory - self.flatdata
+        chi2, logdet = self.varying_covariance(self.flatdiff, scale=scale, variances=variances)[:2]
+        self.loglikelihood = -0.5 * (chi2 + logdet - self._logdet)
+
+    def _whiten(self, flatdiff):
+        # Covariance varies: no fixed whitening matrix
+        if self.varying_covariance is not None:
+            return None
+        return super(BaseSNLikelihood, self)._whiten(flatdiff)
+
     def read_config(self, fn):
 
         class Parser(UserDict):
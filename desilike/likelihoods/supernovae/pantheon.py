@@ -2,7 +2,7 @@ import os
 
 import numpy as np
 
-from desilike import plotting, utils
+from desilike import plotting
 from .base import BaseSNLikelihood
 
 
@@ -19,22 +19,49 @@ class PantheonSNLikelihood(BaseSNLikelihood):
     data_dir : str, Path, default=None
         Data directory. Defaults to path saved in desilike's configuration,
         as provided by :class:`Installer` if likelihood has been installed.
+
+    marginalize_Mb : bool, default=False
+        If ``True``, analytically marginalize over the absolute magnitude ``Mb``, given its (Gaussian or flat, with no limits) prior,
+        as a template of the covariance matrix (see :class:`SNCovariance`); ``Mb`` is then removed from parameters.
     """
     config_fn = 'pantheon.yaml'
     installer_section = 'PantheonSNLikelihood'
 
-    def initialize(self, *args, **kwargs):
+    def initialize(self, *args, marginalize_Mb=False, **kwargs):
         super(PantheonSNLikelihood, self).initialize(*args, **kwargs)
-        # Add statistical error
-        self.covariance += np.diag(self.light_curve_params['dmb']**2)
-        self.precision = utils.inv(self.covariance)
+        # Statistical errors enter the diagonal, systematics the base covariance
+        diagonal = self.light_curve_params['dmb']**2
+        self._Mb_loc, self._Mb_variances = 0., None
+        if marginalize_Mb:
+            param = self.params['Mb']
+            if param.prior.dist not in ['norm', 'uniform'] or param.prior.is_limited():
+                raise ValueError('Prior must be norm or uniform, with no limits, to analytically marginalize over {}'.format(param))
+            self._Mb_loc, self._Mb_variances = getattr(param.prior, 'loc', 0.), [getattr(param.prior, 'scale', np.inf)**2]
+            del self.params['Mb']
+            self.set_covariance(self.covariance, diagonal=diagonal, templates=np.ones_like(diagonal), scale=1.)
+        else:
+            self.set_covariance(self.covariance + np.diag(diagonal))
         self.std = np.diag(self.covariance)**0.5
 
-    def calculate(self, Mb=0):
+    def calculate(self, Mb=None):
+        if Mb is None: Mb = self._Mb_loc  # Mb marginalized over, with the covariance template
         z = self.light_curve_params['zcmb']
         self.flattheory = 5 * np.log10(self.cosmo.luminosity_distance(z)) + 25
         self.flatdata = self.light_curve_params['mb'] - Mb - 5 * np.log10((1 + self.light_curve_params['zhel']) / (1 + z))
-        super(PantheonSNLikelihood, self).calculate()
+        super(PantheonSNLikelihood, self).calculate(scale=1., variances=self._Mb_variances)
+
+    def _get_solved_flatderivs(self, params):
+        # flatdiff depends linearly on Mb, with derivative 1: analytic marginalization over Mb
+        # is then a rank-1 update with the cached whitening matrix, with no differentiation of the pipeline
+        toret = []
+        for param in params:
+            if param in self.params and param.basename == 'Mb':
+                toret.append(np.ones_like(self.std))
+            elif param in self.all_params:  # e.g. cosmological parameter
+                return None
+            else:
+                toret.append(np.zeros_like(self.std))
+        return np.array(toret)
 
     @plotting.plotter
     def plot(self, fig=None):
@@ -0,0 +1,242 @@
+import numpy as np
+
+from desilike import setup_logging
+
+
+def test_chi2():
+    from desilike.likelihoods.base import chi2, get_whitening
+
+    rng = np.random.RandomState(seed=42)
+    size = 20
+    matrix = rng.normal(size=(size, size))
+    covariance = matrix.dot(matrix.T) + size * np.eye(size)
+    precision = np.linalg.inv(covariance)
+    flatdiff = rng.normal(size=(5, size))
+    ref = np.array([diff.dot(precision).dot(diff) for diff in flatdiff])
+    for whitening in [get_whitening(covariance=covariance), get_whitening(precision=precision)]:
+        assert np.allclose(whitening.dot(whitening.T), precision)
+        assert np.allclose(chi2(flatdiff, precision, whitening=whitening), ref)
+        assert np.allclose(chi2(flatdiff[0], precision, whitening=whitening), ref[0])
+    assert np.allclose(chi2(flatdiff, precision), ref)
+    assert get_whitening(precision=np.ones(size)) is None
+    assert get_whitening(covariance=-covariance) is None
+
+
+from desilike.base import BaseCalculator
+from desilike.jax import numpy as jnp
+
+
+class Model(BaseCalculator):
+
+    _params = {'a': {'value': 1., 'prior': {'limits': [0., 2.]}},
+               'b': {'value': 0., 'prior': {'dist': 'norm', 'loc': 0., 'scale': 10.}},
+               'c': {'value': 0., 'prior': {'dist': 'norm', 'loc': 0., 'scale': 10.}}}
+
+    def initialize(self, nonlinear=False):
+        self.x = np.linspace(0.1, 1., 20)
+        self.nonlinear = nonlinear
+
+    def calculate(self, a=1., b=0., c=0.):
+        # Parameters may have a leading batch dimension
+        a, b, c = (jnp.asarray(value)[..., None] for value in (a, b, c))
+        self.y = jnp.exp(-a * self.x) + b * self.x**a + c + (0.1 * c**2 * self.x if self.nonlinear else 0.)
+
+
+from desilike.likelihoods import BaseGaussianLikelihood
+
+
+class Likelihood(BaseGaussianLikelihood):
+
+    def initialize(self, *args, model=None, **kwargs):
+        if model is None:
+            model = Model()
+        self.model = model
+        super(Likelihood, self).initialize(*args, **kwargs)
+
+    @property
+    def flattheory(self):
+        return self.model.y
+
+
+def test_gaussian_likelihood():
+
+    rng = np.random.RandomState(seed=42)
+    x = np.linspace(0.1, 1., 20)
+    matrix = rng.normal(size=(20, 20))
+    covariance = matrix.dot(matrix.T) + 20. * np.eye(20)
+    data = np.exp(-x) + rng.normal(size=20)
+    likelihood = Likelihood(data=data, covariance=covariance)
+    likelihood2 = Likelihood(data=data, precision=np.linalg.inv(covariance))
+    assert np.allclose(likelihood.precision, likelihood2.precision)
+    for a in [0.5, 1., 1.5]:
+        diff = np.exp(-a * x) - data
+        assert np.allclose(likelihood(a=a), likelihood2(a=a))
+        assert np.allclose(likelihood.loglikelihood, -0.5 * diff.dot(np.linalg.inv(covariance)).dot(diff))
+
+
+def test_solve():
+
+    rng = np.random.RandomState(seed=42)
+    x = np.linspace(0.1, 1., 20)
+    matrix = rng.normal(size=(20, 20))
+    covariance = 1e-2 * (matrix.dot(matrix.T) / 20. + np.eye(20))
+    data = np.exp(-1.2 * x) + 0.5 * x**1.2 + 0.1 + 0.05 * rng.normal(size=20)
+
+    for nonlinear in [False, True]:
+        for solved in ['.best', '.marg']:
+            likelihood = Likelihood(data=data, covariance=covariance, model=Model(nonlinear=nonlinear))
+            for param in likelihood.all_params.select(name=['b', 'c']): param.update(derived=solved)
+            for a in [0.8, 1.2, 1.2]:
+                likelihood(a=a)
+                assert likelihood._solve_cache['linear'] is not nonlinear
+                if nonlinear: continue  # solution depends on the starting point
+                loglikelihood, values = likelihood.loglikelihood, [likelihood.runtime_info.pipeline.input_values[name] for name in ['b', 'c']]
+                likelihood._solve_cache['linear'] = False  # full Fisher differentiation
+                likelihood(a=a)
+                assert np.allclose(likelihood.loglikelihood, loglikelihood)
+                assert np.allclose([likelihood.runtime_info.pipeline.input_values[name] for name in ['b', 'c']], values)
+                likelihood._solve_cache['linear'] = True
+                # Linear least squares solution
+                design = np.array([x**a, np.ones_like(x)])
+                precision = np.linalg.inv(covariance)
+                hessian = design.dot(precision).dot(design.T) + np.eye(2) / 10.**2
+                assert np.allclose(values, np.linalg.solve(hessian, design.dot(precision).dot(data - np.exp(-a * x))))
+
+
+def test_solve_batch():
+
+    class BatchModel(Model):
+
+        _batch = True
+
+    class BatchLikelihood(Likelihood):
+
+        _batch = True
+
+    rng = np.random.RandomState(seed=42)
+    x = np.linspace(0.1, 1., 20)
+    matrix = rng.normal(size=(20, 20))
+    covariance = 1e-2 * (matrix.dot(matrix.T) / 20. + np.eye(20))
+    data = np.exp(-1.2 * x) + 0.5 * x**1.2 + 0.1 + 0.05 * rng.normal(size=20)
+    a = np.linspace(0.5, 1.5, 10)
+
+    for solved in ['.best', '.marg']:
+        likelihood = BatchLikelihood(data=data, covariance=covariance, model=BatchModel())
+        for param in likelihood.all_params.select(name=['b', 'c']): param.update(derived=solved)
+        likelihood()
+        pipeline = likelihood.runtime_info.pipeline
+        assert pipeline.more_batch_calculate is not None
+        ncalls = likelihood.model.runtime_info.monitor.counter
+        pipeline.mpicalculate(a=a)
+        assert likelihood.model.runtime_info.monitor.counter - ncalls == 3  # one batch evaluation + one per solved parameter
+        batch = pipeline.derived
+        pipeline.more_batch_calculate = None  # point-by-point
+        pipeline.mpicalculate(a=a)
+        for param in pipeline.derived.params():
+            assert np.allclose(batch[param], pipeline.derived[param])
+        assert np.allclose(likelihood(a=a[-1]), batch['loglikelihood'][-1, 0] + batch['logprior'][-1, 0])
+
+
+def test_solve_closed():
+
+    class ClosedLikelihood(Likelihood):
+
+        def initialize(self, *args, closed=True, **kwargs):
+            self.closed = closed
+            super(ClosedLikelihood, self).initialize(*args, **kwargs)
+
+        def _get_solved_flatderivs(self, params):
+            if self.closed and params.names() == ['c']:
+                return np.ones((1, self.flatdata.size), dtype='f8')
+            return None
+
+    rng = np.random.RandomState(seed=42)
+    x = np.linspace(0.1, 1., 20)
+    matrix = rng.normal(size=(20, 20))
+    covariance = 1e-2 * (matrix.dot(matrix.T) / 20. + np.eye(20))
+    data = np.exp(-1.2 * x) + 0.1 + 0.05 * rng.normal(size=20)
+
+    for solved in ['.best', '.marg']:
+        likelihoods = [ClosedLikelihood(data=data, covariance=covariance, closed=closed) for closed in [True, False]]
+        for likelihood in likelihoods:
+            likelihood.all_params['b'].update(fixed=True)
+            likelihood.all_params['c'].update(derived=solved)
+        for a in [0.8, 1.2, 1.]:
+            assert np.allclose(likelihoods[0](a=a), likelihoods[1](a=a))
+            assert np.allclose(likelihoods[0].runtime_info.pipeline.input_values['c'], likelihoods[1].runtime_info.pipeline.input_values['c'])
+        assert likelihoods[0]._solve_cache['closed'] and not likelihoods[1]._solve_cache['closed']
+        ncalls = likelihoods[0].model.runtime_info.monitor.counter
+        likelihoods[0](a=0.9)
+        assert likelihoods[0].model.runtime_info.monitor.counter - ncalls == 1  # no differentiation
+
+
+def test_sum_parallel():
+
+    import gc
+    from desilike.likelihoods import SumLikelihood
+    from desilike.samplers import MCMCSampler
+
+    class OffsetLikelihood(Likelihood):
+
+        _params = {'d': {'value': 0., 'prior': {'dist': 'norm', 'loc': 0., 'scale': 1.}}}
+
+        def calculate(self, d=0.):
+            self.offset = d
+            super(OffsetLikelihood, self).calculate()
+
+        @property
+        def flattheory(self):
+            return self.model.y + self.offset
+
+    x = np.linspace(0.1, 1., 20)
+
+    def get_likelihood(parallel=None, solved=False):
+        rng = np.random.RandomState(seed=42)
+        model, likelihoods = Model(), []
+        for param in model.init.params.select(basename=['b', 'c']): param.update(fixed=True)
+        for i in range(3):
+            data = np.exp(-1.2 * x) + 0.1 * i + 0.05 * rng.normal(size=20)
+            likelihood = OffsetLikelihood(data=data, covariance=0.05**2 * np.eye(20), model=model)
+            for param in likelihood.init.params: param.update(namespace='like{:d}'.format(i))
+            for name in ['loglikelihood', 'logprior']: likelihood.init.params['like{:d}.{}'.format(i, name)] = {}
+            if solved: likelihood.init.params['like{:d}.d'.format(i)].update(derived='.marg')
+            likelihoods.append(likelihood)
+        return SumLikelihood(likelihoods, parallel=parallel)
+
+    for solved in [False, True]:
+        ref = get_likelihood(solved=solved)
+        for parallel in [2, 'mpi']:
+            likelihood = get_likelihood(parallel=parallel, solved=solved)
+            assert set(likelihood.varied_params.names()) == set(ref.varied_params.names())
+            for a in [0.8, 1.2]:
+                params = {'a': a} if solved else {'a': a, 'like0.d': 0.1, 'like1.d': -0.1, 'like2.d': 0.2}
+                assert np.allclose(likelihood(**params), ref(**params))
+                assert np.allclose(likelihood.loglikelihood, np.ravel(ref.loglikelihood)[0])
+                assert np.allclose(likelihood.logprior, np.ravel(ref.logprior)[0])
+            if parallel == 2:
+                assert len(likelihood._workers) == 2
+                likelihood.close()
+                assert np.allclose(likelihood(a=1.), ref(a=1.))
+                likelihood.close()
+
+    # Sequential MCMC with parallel component likelihoods
+    likelihood = get_likelihood(parallel=2, solved=True)
+    sampler = MCMCSampler(likelihood, chains=1, seed=42)
+    chain = sampler.run(max_iterations=100, check=False)[0]
+    assert chain.shape == (100,) and np.all(np.isfinite(chain['loglikelihood']))
+    processes = [process for process, connection in likelihood._workers]
+    assert all(process.is_alive() for process in processes)
+    del sampler, likelihood
+    gc.collect()  # worker processes are stopped when the likelihood is deleted
+    assert not any(process.is_alive() for process in processes)
+
+
+if __name__ == '__main__':
+
+    setup_logging()
+    test_chi2()
+    test_gaussian_likelihood()
+    test_solve()
+    test_solve_batch()
+    test_solve_closed()
+    test_sum_parallel()
@@ -1,6 +1,7 @@
 import numpy as np
 
 from desilike import setup_logging
+from desilike.base import BaseCalculator
 from desilike.install import Installer
 from desilike.likelihoods.supernovae import PantheonSNLikelihood
 
@@ -15,7 +16,105 @@ def test_install():
     assert np.allclose((likelihood + likelihood)(), 2. * likelihood() - likelihood.logprior)
 
 
+def test_sn_covariance():
+    from desilike.likelihoods.supernovae.base import SNCovariance
+
+    rng = np.random.RandomState(seed=42)
+    size = 30
+    matrix = rng.normal(size=(size, size))
+    covariance = matrix.dot(matrix.T) / size + np.eye(size)
+    diagonal = rng.uniform(0.5, 2., size=size)
+    templates = np.array([np.ones(size), np.linspace(0., 1., size)]).T
+    flatdiff = rng.normal(size=(4, size))
+    sncovariance = SNCovariance(covariance, diagonal=diagonal, templates=templates)
+    for scale in [0., 0.5]:
+        for variances in [[1., 2.], [np.inf, 2.], [np.inf, np.inf]]:
+            chi2, logdet, amplitudes = sncovariance(flatdiff, scale=scale, variances=variances)
+            cov = covariance + scale**2 * np.diag(diagonal)
+            finite = np.isfinite(variances)
+            # Flat priors: marginalize over amplitudes with dense linear algebra
+            precision = np.linalg.inv(cov + templates[:, finite].dot(np.diag(np.array(variances)[finite])).dot(templates[:, finite].T))
+            ptemplates = precision.dot(templates[:, ~finite])
+            hessian = templates[:, ~finite].T.dot(ptemplates)
+            precision = precision - ptemplates.dot(np.linalg.solve(hessian, ptemplates.T))
+            ref_logdet = np.linalg.slogdet(cov + templates[:, finite].dot(np.diag(np.array(variances)[finite])).dot(templates[:, finite].T))[1] + np.linalg.slogdet(hessian)[1]
+            assert np.allclose(chi2, np.sum(flatdiff.dot(precision) * flatdiff, axis=-1))
+            assert np.allclose(logdet, ref_logdet)
+            assert np.allclose(sncovariance(flatdiff[0], scale=scale, variances=variances)[0], chi2[0])
+            # Best fit amplitudes
+            hessian = templates.T.dot(np.linalg.solve(cov, templates)) + np.diag(1. / np.array(variances))
+            assert np.allclose(amplitudes, np.linalg.solve(hessian, templates.T.dot(np.linalg.solve(cov, flatdiff.T))).T)
+
+
+class Cosmology(BaseCalculator):
+
+    _params = {'Omega_m': {'value': 0.3, 'prior': {'limits': [0.1, 0.9]}}}
+
+    def calculate(self, Omega_m=0.3):
+        self.Omega_m = Omega_m
+
+    def luminosity_distance(self, z):
+        # Low-redshift expansion, in Mpc/h
+        return 2997.92458 * z * (1. + (1. - 0.75 * self.Omega_m) * z)
+
+
+def test_pantheon_marginalization():
+
+    import os
+    import tempfile
+
+    rng = np.random.RandomState(seed=42)
+    size = 30
+    z = np.sort(rng.uniform(0.01, 1., size))
+    matrix = rng.normal(size=(size, size))
+    syscovariance = 1e-2 * matrix.dot(matrix.T) / size
+    dmb = rng.uniform(0.1, 0.2, size)
+    flattheory = 5 * np.log10(Cosmology()(Omega_m=0.3).luminosity_distance(z)) + 25
+    mb = flattheory - 19.3 + dmb * rng.normal(size=size)
+    covariance = syscovariance + np.diag(dmb**2)
+    precision = np.linalg.inv(covariance)
+    ones = np.ones(size)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        with open(os.path.join(data_dir, 'test.dataset'), 'w') as file:
+            file.write('mag_covmat_file = sys.txt\ndata_file = lcparam.txt\n')
+        with open(os.path.join(data_dir, 'sys.txt'), 'w') as file:
+            file.write('{:d}\n'.format(size) + '\n'.join(str(value) for value in syscovariance.ravel()) + '\n')
+        with open(os.path.join(data_dir, 'lcparam.txt'), 'w') as file:
+            file.write('#name zcmb zhel mb dmb\n' + ''.join('sn{:d} {} {} {} {}\n'.format(i, *values) for i, values in enumerate(zip(z, z, mb, dmb))))
+
+        def get_likelihood(**kwargs):
+            return PantheonSNLikelihood(config_fn='test.dataset', data_dir=data_dir, cosmo=Cosmology(), **kwargs)
+
+        likelihood = get_likelihood()
+        flatdiff = flattheory - (mb + 19.3)
+        assert np.allclose(likelihood(Mb=-19.3), -0.5 * flatdiff.dot(precision).dot(flatdiff) + likelihood.logprior)
+        # Mb marginalized over with a flat prior: template in the covariance matrix, or generic analytic marginalization
+        likelihood = get_likelihood(marginalize_Mb=True)
+        likelihood.init.params['Mb'].update(prior=None)
+        likelihood()
+        assert 'Mb' not in likelihood.all_params
+        assert np.allclose(likelihood.covariance, covariance)
+        flatdiff = flattheory - mb
+        pones = precision.dot(ones)
+        ref = -0.5 * (flatdiff.dot(precision).dot(flatdiff) - flatdiff.dot(pones)**2 / ones.dot(pones) + np.log(ones.dot(pones)))
+        assert np.allclose(likelihood.loglikelihood, ref)
+        solved = get_likelihood()
+        solved.init.params['Mb'].update(prior=None, derived='.marg')
+        assert np.allclose(solved(), likelihood())
+        # Gaussian prior
+        likelihood = get_likelihood(marginalize_Mb=True)
+        likelihood.init.params['Mb'].update(prior={'dist': 'norm', 'loc': -19.3, 'scale': 0.1})
+        likelihood()
+        flatdiff = flattheory - (mb + 19.3)
+        full = covariance + 0.1**2 * np.outer(ones, ones)
+        ref = -0.5 * (flatdiff.dot(np.linalg.solve(full, flatdiff)) + np.linalg.slogdet(full)[1] - np.linalg.slogdet(covariance)[1])
+        assert np.allclose(likelihood.loglikelihood, ref)
+
+
 if __name__ == '__main__':
 
     setup_logging()
     test_install()
+    test_sn_covariance()
+    test_pantheon_marginalization()
@@ -53,6 +53,8 @@ class TracerPowerSpectrumMultipolesObservable(BaseCalculator):
           one can provide the list of multipoles ``ells`` and the corresponding (list of) :math:`k` wavenumbers as a (list of) array ``k``,
           and optionally ``shotnoise``.
     """
+    _batch = True
+
     def initialize(self, data=None, covariance=None, klim=None, wmatrix=None, transform=None, **kwargs):
         self.k, self.kedges, self.ells, self.shotnoise = None, None, None, None
         self.flatdata, self.mocks, self.covariance = None, None, None
@@ -101,6 +101,8 @@ class WindowedPowerSpectrumMultipoles(BaseCalculator):
     theory : BaseTheoryPowerSpectrumMultipoles
         Theory power spectrum multipoles, defaults to :class:`KaiserTracerPowerSpectrumMultipoles`.
     """
+    _batch = True
+
     def initialize(self, klim=None, k=None, ells=None, wmatrix=None, kinrebin=1, kinlim=None, ellsin=None, shotnoise=0., fiber_collisions=None, theory=None):
         _default_step = 0.01
 
@@ -229,11 +231,11 @@ class WindowedPowerSpectrumMultipoles(BaseCalculator):
         self.flatshotnoise = np.concatenate([np.full_like(k, shotnoise * (ell == 0), dtype='f8') for ell, k in zip(self.ells, self.k)])
 
     def _apply(self, theory):
-        theory = jnp.ravel(theory)
+        theory = jnp.reshape(theory, theory.shape[:-2] + (-1,))  # keep leading batch axis, if any
         if self.matrix_full is not None:
-            theory = jnp.dot(self.matrix_full, theory)
+            theory = jnp.dot(theory, self.matrix_full.T)
         if self.kmask is not None:
-            theory = theory[self.kmask]
+            theory = theory[..., self.kmask]
         if self.offset is not None:
             theory = theory + self.offset
         return theory
@@ -250,7 +252,7 @@ class WindowedPowerSpectrumMultipoles(BaseCalculator):
         nout = 0
         for kk in self.k:
             sl = slice(nout, nout + len(kk))
-            toret.append(self.flatpower[sl])
+            toret.append(self.flatpower[..., sl])
             nout = sl.stop
         return toret
 
@@ -1,7 +1,9 @@
 """Classes to handle parameters."""
 
+import io
 import os
 import re
+import json
 import fnmatch
 import copy
 import numbers
@@ -1962,6 +1964,45 @@ def _reshape(array, shape):
         raise ValueError('Error with array {}'.format(repr(array))) from exc
 
 
+def _json_default(obj):
+    # Cast numpy types to Python base types, for :func:`json.dump`
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+def _npy_append(fn, array):
+    """
+    Append ``array`` along the first axis to *.npy* file ``fn``: new rows are written at the end of the file,
+    then the header is updated in place (*numpy* pads it such that its length does not change when the first axis grows).
+    """
+    array = np.ascontiguousarray(array)
+    with open(fn, 'r+b') as file:
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(file)
+        offset = file.tell()
+        if fortran_order or dtype != array.dtype or tuple(shape[1:]) != array.shape[1:]:
+            raise ValueError('Cannot append array of dtype {} and shape {} to {} (dtype {} and shape {})'.format(array.dtype, array.shape, fn, dtype, shape))
+        shape = (shape[0] + array.shape[0],) + tuple(shape[1:])
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else np.lib.format.write_array_header_2_0
+        write_header(header, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+        header = header.getvalue()
+        if len(header) == offset:
+            file.seek(offset + (shape[0] - array.shape[0]) * int(np.prod(shape[1:], dtype='intp')) * dtype.itemsize)
+            file.truncate()  # in case a previous write was interrupted
+            file.write(array.tobytes())
+            file.flush()
+            file.seek(0)
+            file.write(header)
+            return
+    # Header length changed (older numpy versions do not pad headers): rewrite whole file
+    np.save(fn, np.concatenate([np.load(fn), array], axis=0))
+
+
 class Samples(BaseParameterCollection):
 
     """Class that holds samples, as a collection of :class:`ParameterArray`."""
@@ -2077,6 +2118,150 @@ class Samples(BaseParameterCollection):
             new[param] = others[0][param].clone(value=np.concatenate([np.atleast_1d(other[param]) for other in others], axis=0))
         return new
 
+    def append(self, other, intersection=False):
+        """
+        Append (in-place) input samples ``other`` along the first axis, which requires both samples to hold same parameters,
+        except if ``intersection == True``, in which case common parameters are selected.
+        Arrays are stored in buffers with (geometrically) growing capacity, and are views of these buffers:
+        hence the cost of appending is (amortized) proportional to the size of ``other`` --- while repeated :meth:`concatenate`
+        is quadratic in the total number of samples.
+        """
+        if not other.params():
+            return self
+        if not self.data:
+            for array in other: self.set(array.copy())
+            return self
+        self_names, other_names = self.names(), other.names()
+        if intersection:
+            for name in self_names:
+                if name not in other_names: del self[name]
+        elif set(self_names) != set(other_names):
+            raise ValueError('Cannot concatenate values as parameters do not match: {} != {}.'.format(self_names, other_names))
+        buffers = self.__dict__.setdefault('_buffers', {})
+        for iarray, array in enumerate(self.data):
+            name, param, derivs = str(array.param), array.param, array.derivs
+            if not array.ndim: array = array.reshape(1)
+            value = np.atleast_1d(other[name]).view(np.ndarray)
+            size, new_size = len(array), len(array) + len(value)
+            dtype = np.result_type(array.dtype, value.dtype)
+            buffer = buffers.get(name, None)
+            # Is array still the beginning of the buffer? (it may have been replaced in the meantime)
+            owned = buffer is not None and array.base is buffer and array.ctypes.data == buffer.ctypes.data and array.shape[1:] == buffer.shape[1:]
+            if not owned or buffer.dtype != dtype or buffer.shape[0] < new_size:
+                capacity = max(2 * new_size, 16)
+                new_buffer = np.empty((capacity,) + array.shape[1:], dtype=dtype)
+                new_buffer[:size] = array
+                buffer = buffers[name] = new_buffer
+            buffer[size:new_size] = value
+            new_array = buffer[:new_size].view(ParameterArray)
+            new_array.param, new_array.derivs = param, derivs
+            self.data[iarray] = new_array
+        return self
+
+    def __copy__(self):
+        new = super(Samples, self).__copy__()
+        new.__dict__.pop('_buffers', None)  # buffers are owned by self only, which is the only one allowed to append to them
+        return new
+
+    _columns_header = 'header.json'
+
+    def write_columns(self, dirname, append=False):
+        """
+        Save samples to directory ``dirname``, as one *.npy* file per parameter,
+        plus a *json* header file holding parameters, attributes and number of samples.
+        Contrary to :meth:`save`, rows can be appended to existing files, and single parameters / rows read back
+        without loading everything (see :meth:`read_columns`).
+
+        Parameters
+        ----------
+        dirname : str, Path
+            Directory name.
+
+        append : bool, default=False
+            If ``True``, append samples (along their first axis) to those already saved in ``dirname``,
+            such that the cost of writing only scales with the size of ``self``.
+            Parameters must match.
+        """
+        self = self if self.shape else self.reshape(1)
+        header_fn = os.path.join(dirname, self._columns_header)
+        header = None
+        if append and os.path.exists(header_fn):
+            with open(header_fn) as file:
+                header = json.load(file)
+            names = [Parameter.from_state(column['param']).name for column in header['columns']]
+            if self.data and set(names) != set(self.names()):
+                raise ValueError('Cannot append samples as parameters do not match: {} != {}.'.format(names, self.names()))
+        self.log_info('Saving {}.'.format(dirname))
+        utils.mkdir(dirname)
+        columns = []
+        for array in self:
+            column = {'file': '{}.npy'.format(array.param.name), 'param': array.param.__getstate__(),
+                      'derivs': None if array.derivs is None else [dict(deriv) for deriv in array.derivs]}
+            fn = os.path.join(dirname, column['file'])
+            if header is None: np.save(fn, array.view(np.ndarray))
+            else: _npy_append(fn, array.view(np.ndarray))
+            columns.append(column)
+        if header is not None and not self.data:
+            columns = header['columns']
+        state = {name: getattr(self, name) for name in self._attrs}
+        header = {'__class__': utils.serialize_class(self.__class__)[0], 'size': (header['size'] if header is not None else 0) + len(self),
+                  'columns': columns, 'state': state}
+        # Write header last, and atomically, such that an interrupted write leaves a valid directory
+        tmp_fn = header_fn + '.tmp'
+        with open(tmp_fn, 'w') as file:
+            json.dump(header, file, default=_json_default)
+        os.replace(tmp_fn, header_fn)
+
+    @classmethod
+    def read_columns(cls, dirname, params=None, start=None, stop=None, mmap_mode=None):
+        """
+        Load samples saved with :meth:`write_columns`.
+
+        Parameters
+        ----------
+        dirname : str, Path
+            Directory name.
+
+        params : list, ParameterCollection, default=None
+            Parameters to load. Defaults to all saved parameters.
+
+        start : int, default=None
+            Index of the first sample (along the first axis) to load. Defaults to 0.
+
+        stop : int, default=None
+            Index of the last sample (excluded) to load. Defaults to the number of saved samples.
+
+        mmap_mode : str, default=None
+            If not ``None``, e.g. 'r', arrays are memory-mapped (see :func:`numpy.load`), hence only read from disk when accessed.
+
+        Returns
+        -------
+        samples : Samples
+        """
+        with open(os.path.join(dirname, cls._columns_header)) as file:
+            header = json.load(file)
+        try:
+            new_cls = utils.import_class(header['__class__'])
+        except ImportError:
+            pass
+        else:
+            if issubclass(new_cls, cls): cls = new_cls
+        cls.log_info('Loading {}.'.format(dirname))
+        if params is not None:
+            params = [str(param) for param in params]
+        index = slice(start, stop)
+        data = []
+        for column in header['columns']:
+            param = Parameter.from_state(column['param'])
+            if params is not None and param.name not in params: continue
+            value = np.load(os.path.join(dirname, column['file']), mmap_mode=mmap_mode or 'r')[:header['size']][index]
+            if mmap_mode is None: value = np.array(value)
+            data.append({'value': value, 'param': param, 'derivs': column['derivs']})
+        new = cls.__new__(cls)
+        new.__setstate__({**header['state'], 'data': []})
+        new.data = [ParameterArray(**item) for item in data]
+        return new
+
     def update(self, *args, **kwargs):
         """
         Update samples with new one; arguments can be a :class:`Samples`
@@ -124,6 +124,7 @@ def _iterate_over_params(self, params, method, **kwargs):
 
     if self.mpicomm.rank == 0 and self.save_fn is not None:
         self.profiles.save(self.save_fn)
+    self.pipeline.dump_profile(mpicomm=self.mpicomm)
     return self.profiles
 
 
@@ -131,6 +132,7 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
 
     name = 'base'
     _check_same_input = False
+    _dump_profile = True
 
     def __init__(self, likelihood, rng=None, seed=None, max_tries=1000, profiles=None, ref_scale=1., rescale=False, covariance=None, save_fn=None, mpicomm=None):
         """
@@ -263,10 +265,11 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
                         self.log_info('Error "{}" raised is caught up with -inf loglikelihood. Set logging level to debug to get full stack trace.'.format(error[0]))
             if update_derived:
                 if self.derived is None:
-                    self.derived = [points, self.pipeline.derived]
+                    # Copies, as arrays will be appended to in-place
+                    self.derived = [points.copy(), self.pipeline.derived.copy()]
                 else:
-                    self.derived = [Samples.concatenate([self.derived[0], points]),
-                                    Samples.concatenate([self.derived[1], self.pipeline.derived])]
+                    self.derived[0].append(points)
+                    self.derived[1].append(self.pipeline.derived)
             logposterior = logprior.copy()
             logposterior[mask_finite_prior] = 0.
             for name, values in di.items():
@@ -449,6 +452,7 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
 
         if self.mpicomm.rank == 0 and self.save_fn is not None:
             self.profiles.save(self.save_fn)
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.profiles
 
     def interval(self, params=None, **kwargs):
@@ -600,6 +604,7 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
 
         if self.mpicomm.rank == 0 and self.save_fn is not None:
             self.profiles.save(self.save_fn)
+        if self._dump_profile: self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.profiles
 
     def profile(self, params=None, grid=None, size=30, cl=2, **kwargs):
@@ -648,7 +653,7 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
         nprocs_per_param = max((self.mpicomm.size - 1) // nparams, 1)
         list_profiles = [None] * nparams
         profiles_bak, save_fn_bak, mpicomm_bak = self.profiles, self.save_fn, self.mpicomm
-        self.save_fn = None
+        self.save_fn, self._dump_profile = None, False  # no need to dump profile of pipeline for each parameter
         with TaskManager(nprocs_per_task=nprocs_per_param, use_all_nprocs=True, mpicomm=self.mpicomm) as tm:
             self.mpicomm = tm.mpicomm
             for iparam, param in tm.iterate(list(enumerate(params))):
@@ -656,6 +661,7 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
                 profiles = self.grid(params=param, grid=grid[iparam], size=size[iparam], cl=cl[iparam], **kwargs)
                 list_profiles[iparam] = profiles
         self.profiles, self.save_fn, self.mpicomm = profiles_bak, save_fn_bak, mpicomm_bak
+        self._dump_profile = True
         profiles = Profiles()
         for iprofile, profile in enumerate(list_profiles):
             mpiroot_worker = self.mpicomm.rank if profile is not None else None
@@ -674,4 +680,5 @@ class BaseProfiler(BaseClass, metaclass=RegisteredProfiler):
 
         if self.mpicomm.rank == 0 and self.save_fn is not None:
             self.profiles.save(self.save_fn)
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.profiles
\ No newline at end of file
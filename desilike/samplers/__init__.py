@@ -4,6 +4,8 @@ from .emcee import EmceeSampler
 from .zeus import ZeusSampler
 from .pocomc import PocoMCSampler
 from .mcmc import MCMCSampler
+from .hmc import HMCSampler
+from .tempering import PTSampler
 from .dynesty import StaticDynestySampler, DynamicDynestySampler
 from .polychord import PolychordSampler
 from .nautilus import NautilusSampler
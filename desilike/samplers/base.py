@@ -1,3 +1,4 @@
+import os
 import sys
 import numbers
 import functools
@@ -6,7 +7,7 @@ import logging
 import numpy as np
 
 from desilike import mpi, PipelineError
-from desilike.utils import BaseClass, TaskManager, is_path
+from desilike.utils import BaseClass, TaskManager, is_path, enum, mkdir
 from desilike.samples import Chain, Samples, load_source
 from desilike.samples import diagnostics as sample_diagnostics
 from desilike.parameter import ParameterPriorError
@@ -22,13 +23,12 @@ class RegisteredSampler(type(BaseClass)):
         return cls
 
 
-def batch_iterate(func, min_iterations=0, max_iterations=sys.maxsize, check_every=200, **kwargs):
-    count_iterations = 0
-    is_converged = False
+def batch_iterate(func, min_iterations=0, max_iterations=sys.maxsize, check_every=200, count_iterations=0, **kwargs):
     if max_iterations < 0:
         raise ValueError('max_iterations must be positive')
     if check_every < 1:
         raise ValueError('check_every must be >= 1, found {:d}'.format(check_every))
+    is_converged = count_iterations >= max_iterations
     while not is_converged:
         niter = min(max_iterations - count_iterations, check_every)
         count_iterations += niter
@@ -69,7 +69,7 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
     nwalkers = 1
     _check_same_input = False
 
-    def __init__(self, likelihood, rng=None, seed=None, max_tries=1000, chains=None, ref_scale=1., save_fn=None, mpicomm=None):
+    def __init__(self, likelihood, rng=None, seed=None, max_tries=1000, chains=None, ref_scale=1., save_fn=None, checkpoint_fn=None, mpicomm=None):
         """
         Initialize posterior sampler.
 
@@ -96,6 +96,14 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
 
         save_fn : str, Path, default=None
             If not ``None``, save samples to this location.
+            If it ends with '.npy', chains are saved with :meth:`Chain.save`; else, as directories of columns
+            (see :meth:`Chain.write_columns`), to which new samples are appended at each checkpoint.
+
+        checkpoint_fn : str, Path, default=None
+            If not ``None`` (requires ``save_fn``), save the full sampler state (random state, proposal, adaptation, diagnostics)
+            to this file at each checkpoint, i.e. every ``check_every`` iterations (samples being saved in ``save_fn``).
+            If this file exists, the sampler (and its chains, ``chains`` is then ignored) is restored from it,
+            such that the interrupted run resumes as if it had not been interrupted (exactly so if run on a single process).
 
         mpicomm : mpi.COMM_WORLD, default=None
             MPI communicator. If ``None``, defaults to ``likelihood``'s :attr:`BaseLikelihood.mpicomm`.
@@ -112,6 +120,16 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
             self.log_info('Varied parameters: {}.'.format(self.varied_params.names()))
         if not self.varied_params:
             raise ValueError('No parameters to be varied!')
+        self.checkpoint_fn = None if checkpoint_fn is None else str(checkpoint_fn)
+        checkpoint = None
+        if self.checkpoint_fn is not None:
+            if save_fn is None:
+                raise ValueError('Provide save_fn to save chains along with the checkpoint')
+            if self.mpicomm.rank == 0 and os.path.isfile(self.checkpoint_fn):
+                self.log_info('Loading checkpoint {}.'.format(self.checkpoint_fn))
+                checkpoint = np.load(self.checkpoint_fn, allow_pickle=True)[()]
+                chains = len(checkpoint['sizes'])
+            checkpoint = self.mpicomm.bcast(checkpoint, root=0)
         if self.mpicomm.rank == 0:
             if chains is None:
                 if save_fn is not None and not is_path(save_fn):
@@ -137,6 +155,17 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
         self._set_rng(rng=rng, seed=seed)
         self.diagnostics = {}
         self.derived = None
+        self._nsaved = [0] * self.nchains
+        self._chain_statistics = [None] * self.nchains
+        self._checkpoint = checkpoint
+        if checkpoint is not None and self.mpicomm.rank == 0:
+            # Chains are cut to their size at checkpoint, as samples may have been saved after
+            for ichain, (size, attrs) in enumerate(zip(checkpoint['sizes'], checkpoint['attrs'])):
+                if not size: continue
+                chain = Chain.load(self.save_fn[ichain])
+                if len(chain) == size: self._nsaved[ichain] = size  # else, rewrite at next save
+                self.chains[ichain] = chain[:size]
+                self.chains[ichain].attrs = attrs
 
     @bcast_values
     def logposterior(self, values):
@@ -170,10 +199,11 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
                         self.log_info('Error "{}" raised is caught up with -inf loglikelihood. Set logging level to debug (setup_logging("debug")) to get full stack trace.'.format(repr(error[0])))
             if update_derived:
                 if self.derived is None:
-                    self.derived = [points, self.pipeline.derived]
+                    # Copies, as arrays will be appended to in-place
+                    self.derived = [points.copy(), self.pipeline.derived.copy()]
                 else:
-                    self.derived = [Samples.concatenate([self.derived[0], points], intersection=True),
-                                    Samples.concatenate([self.derived[1], self.pipeline.derived], intersection=True)]
+                    self.derived[0].append(points, intersection=True)
+                    self.derived[1].append(self.pipeline.derived, intersection=True)
             logposterior = logprior.copy()
             logposterior[mask_finite_prior] = 0.
             for name, values in di.items():
@@ -204,6 +234,31 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
             state[name] = getattr(self, name)
         return state
 
+    def _get_sampler_state(self):
+        # Sampler state to be saved in checkpoint, on top of chains
+        return {'rng': self.rng.get_state(), 'diagnostics': self.diagnostics}
+
+    def _set_sampler_state(self, state):
+        # Restore sampler state returned by :meth:`_get_sampler_state`
+        self.rng.set_state(state['rng'])
+        self.diagnostics = state['diagnostics']
+
+    def _save_checkpoint(self, niterations=0):
+        # Write sampler state to self.checkpoint_fn; chains are expected to be saved already
+        if self.checkpoint_fn is None: return
+        state = self._get_sampler_state()
+        if self.mpicomm.rank == 0:
+            state['sizes'] = [len(chain) if chain is not None else 0 for chain in self.chains]
+            state['attrs'] = [dict(chain.attrs) if chain is not None else {} for chain in self.chains]
+            state['niterations'] = niterations
+            self.log_info('Saving checkpoint {}.'.format(self.checkpoint_fn))
+            mkdir(os.path.dirname(self.checkpoint_fn))
+            # Write to temporary file first, such that an interrupted write leaves the previous checkpoint valid
+            tmp_fn = self.checkpoint_fn + '.tmp'
+            with open(tmp_fn, 'wb') as file:
+                np.save(file, state, allow_pickle=True)
+            os.replace(tmp_fn, self.checkpoint_fn)
+
     def _set_rng(self, rng=None, seed=None):
         self.rng = self.mpicomm.bcast(rng, root=0)
         if self.rng is None:
@@ -211,6 +266,14 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
             self.rng = np.random.RandomState(seed=seed)
 
     def _prepare(self):
+        self._set_update(self._get_update())
+
+    def _get_update(self):
+        # Collective; return sampler update (e.g. proposal covariance) given current chains
+        return None
+
+    def _set_update(self, update):
+        # Apply sampler update returned by :meth:`_get_update`
         pass
 
     def _finalize_one(self, chain):
@@ -220,6 +283,10 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
     def nchains(self):
         return len(self.chains)
 
+    def _get_last(self, chain):
+        # Last state of the chain, to resume sampling from
+        return np.array([chain[param][-1] for param in self.varied_params]).T
+
     def _get_start(self, start=None, max_tries=None):
         if max_tries is None:
             max_tries = self.max_tries
@@ -246,7 +313,7 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
         logposterior = np.full(shape[:2], -np.inf)
         for ichain, chain in enumerate(self.chains):
             if self.mpicomm.bcast(chain is not None and chain.size, root=0):
-                start[ichain] = self.mpicomm.bcast(np.array([chain[param][-1] for param in self.varied_params]).T if self.mpicomm.rank == 0 else None, root=0)
+                start[ichain] = self.mpicomm.bcast(self._get_last(chain) if self.mpicomm.rank == 0 else None, root=0)
                 logposterior[ichain] = self.logposterior(start[ichain])
 
         start.shape = (shape[0] * shape[1], -1)
@@ -280,6 +347,16 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
     def mpicomm(self, mpicomm):
         self._mpicomm = self.pipeline.mpicomm = mpicomm
 
+    def _save_chain(self, ichain, chain, append=False):
+        # Save chain to self.save_fn[ichain]; if append, only samples that are not saved yet are written
+        fn = str(self.save_fn[ichain])
+        if fn.endswith('.npy'):
+            chain.save(fn)
+        else:
+            nsaved = self._nsaved[ichain] if append else 0
+            chain[nsaved:].write_columns(fn, append=nsaved > 0)
+            self._nsaved[ichain] = len(chain)
+
     def _set_derived(self, chain):
         chain = Chain(chain, loglikelihood=self.likelihood._param_loglikelihood, logprior=self.likelihood._param_logprior)
         for param in self.pipeline.params.select(fixed=True, derived=False):
@@ -344,7 +421,8 @@ class BasePosteriorSampler(BaseClass, metaclass=RegisteredSampler):
                             self.chains[ichain].attrs[name] = value
             if self.save_fn is not None:
                 for ichain, chain in enumerate(self.chains):
-                    if chain is not None: chain.save(self.save_fn[ichain])
+                    if chain is not None: self._save_chain(ichain, chain, append=True)
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.chains
 
 
@@ -352,7 +430,7 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
 
     """Base class for samplers which can run independent chains in parallel."""
 
-    def run(self, min_iterations=0, max_iterations=sys.maxsize, check_every=300, check=None, **kwargs):
+    def run(self, min_iterations=0, max_iterations=sys.maxsize, check_every=300, check=None, asynchronous=False, **kwargs):
         """
         Run chains. Sampling can be interrupted anytime, and resumed by providing
         the path to the saved chains in ``chains`` argument of :meth:`__init__`.
@@ -360,6 +438,10 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
         One will typically run sampling on ``nchains * nprocs_per_chain + 1`` processes,
         with ``nchains >= 1`` the number of chains and ``nprocs_per_chain = max((mpicomm.size - 1) // nchains, 1)``
         the number of processes per chain --- plus 1 root process to distribute the work.
+        With ``asynchronous = True``, chains do not wait for each other every ``check_every`` iterations:
+        each chain keeps sampling and pushes its new samples to the root process, which saves them,
+        runs convergence checks on the samples received so far and sends back a stop signal
+        or a sampler update (e.g. proposal covariance).
 
         Parameters
         ----------
@@ -378,6 +460,10 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
             If ``True`` or ``None``, convergence checks are run.
             A dictionary of convergence criteria can be provided, see :meth:`check`.
 
+        asynchronous : bool, default=False
+            If ``True``, run chains asynchronously, without synchronization every ``check_every`` iterations.
+            Requires at least ``nchains + 1`` processes; else chains are run synchronously.
+
         **kwargs : dict
             Optional sampler-specific arguments.
         """
@@ -388,7 +474,23 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
         if run_check and not isinstance(check, dict):
             check = {}
 
+        count_iterations = 0
+        if self._checkpoint is not None:
+            # Resume interrupted run
+            self._set_sampler_state(self._checkpoint)
+            count_iterations = self._checkpoint['niterations']
+            self._checkpoint = None
+
+        if asynchronous:
+            if self.mpicomm.size - 1 >= self.nchains:
+                self._run_async(min_iterations=min_iterations, max_iterations=max_iterations, check_every=check_every, check=check if run_check else None, count_iterations=count_iterations, **kwargs)
+                self.pipeline.dump_profile(mpicomm=self.mpicomm)
+                return self.chains
+            if self.mpicomm.rank == 0:
+                self.log_warning('Asynchronous run requires at least nchains + 1 = {:d} processes, found {:d}; running chains synchronously.'.format(self.nchains + 1, self.mpicomm.size))
+
         def _run_batch(niterations):
+            nonlocal count_iterations
             chains, ncalls = [[None] * self.nchains for i in range(2)]
             start = self._get_start()
             mpicomm_bak = self.mpicomm
@@ -419,37 +521,144 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
             self.diagnostics['naccepted'] = [chain.size if chain is not None else 0 for chain in chains]
 
             if self.mpicomm.rank == 0:
-                for ichain, (chain, new_chain) in enumerate(zip(self.chains, chains)):
-                    if new_chain is not None:
-                        if chain is None:
-                            self.chains[ichain] = new_chain.deepcopy()
-                        else:
-                            self.chains[ichain] = Chain.concatenate(chain, new_chain)
-                        for name in ['size', 'nvaried', 'ndof']:
-                            try:
-                                value = getattr(self.likelihood, name)
-                            except AttributeError:
-                                pass
-                            else:
-                                self.chains[ichain].attrs[name] = value
-                if self.save_fn is not None:
-                    for ichain, chain in enumerate(self.chains):
-                        if chain is not None: chain.save(self.save_fn[ichain])
+                for ichain, new_chain in enumerate(chains):
+                    if new_chain is not None: self._add_chain(ichain, new_chain)
 
             is_converged = False
             if run_check:
                 is_converged = self.check(**check)
+            count_iterations += niterations
+            self._save_checkpoint(niterations=count_iterations)
             return is_converged
 
-        batch_iterate(_run_batch, min_iterations=min_iterations, max_iterations=max_iterations, check_every=check_every)
+        batch_iterate(_run_batch, min_iterations=min_iterations, max_iterations=max_iterations, check_every=check_every, count_iterations=count_iterations)
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.chains
 
+    def _add_chain(self, ichain, new_chain):
+        # Append new_chain to self.chains[ichain] (on root), then save
+        chain = self.chains[ichain]
+        if chain is None:
+            self.chains[ichain] = new_chain.deepcopy()
+        else:
+            self.chains[ichain] = Chain.concatenate(chain, new_chain)
+            self.chains[ichain].attrs.update(new_chain.attrs)
+        for name in ['size', 'nvaried', 'ndof']:
+            try:
+                value = getattr(self.likelihood, name)
+            except AttributeError:
+                pass
+            else:
+                self.chains[ichain].attrs[name] = value
+        if self.save_fn is not None:
+            self._save_chain(ichain, self.chains[ichain], append=True)
+
+    def _run_async(self, min_iterations=0, max_iterations=sys.maxsize, check_every=300, check=None, count_iterations=0, **kwargs):
+        # Each chain is run by a group of processes, which sends its samples to the root process every ``check_every`` iterations,
+        # and picks up updates / stop signal from the root process without waiting for them.
+        if max_iterations < 0:
+            raise ValueError('max_iterations must be positive')
+        if check_every < 1:
+            raise ValueError('check_every must be >= 1, found {:d}'.format(check_every))
+        tags = enum('SAMPLES', 'UPDATE', 'STOP', 'EXIT')
+        status = mpi.Status()
+        start = self._get_start()
+        self._prepare()
+        basecomm = self.mpicomm
+        seeds = basecomm.bcast(self.rng.randint(0, high=0xffffffff, size=self.nchains) if basecomm.rank == 0 else None, root=0)
+        groups = np.array_split(np.arange(1, basecomm.size), self.nchains)
+        roots = [int(group[0]) for group in groups]
+        color = 0
+        for ichain, group in enumerate(groups):
+            if basecomm.rank in group: color = ichain + 1
+        self.mpicomm = basecomm.Split(color, 0)
+        ncalls, naccepted = [0] * self.nchains, [0] * self.nchains
+
+        if basecomm.rank == 0:
+            self.log_info('Running {:d} chains asynchronously on {} processes.'.format(self.nchains, [len(group) for group in groups]))
+            niterations, finished = [count_iterations] * self.nchains, [False] * self.nchains
+            is_converged, requests = False, []
+
+            def isend(value, tag):
+                for ichain, root in enumerate(roots):
+                    if not finished[ichain]:
+                        requests.append(basecomm.isend(value, dest=root, tag=tag))
+
+            while not all(finished):
+                ichain, ncall, niterations[ichain], last, has_chain = basecomm.recv(source=mpi.ANY_SOURCE, tag=tags.SAMPLES, status=status)
+                ncalls[ichain] += ncall
+                if has_chain:
+                    new_chain = Chain.recv(source=status.Get_source(), tag=tags.SAMPLES, mpicomm=basecomm)
+                    naccepted[ichain] += new_chain.size
+                    self._add_chain(ichain, new_chain)
+                    self._save_checkpoint(niterations=min(niterations))
+                self.log_debug('Received {:d} iterations of chain {:d}.'.format(niterations[ichain], ichain))
+                if last:
+                    finished[ichain] = True
+                    requests.append(basecomm.isend(None, dest=roots[ichain], tag=tags.EXIT))
+                    continue
+                if is_converged or any(chain is None for chain in self.chains):
+                    continue
+                # Chains may have different lengths; diagnostics are computed on the common length
+                chains = self.chains
+                size = min(chain.shape[0] for chain in chains)
+                self.chains = [chain[:size] for chain in chains]
+                try:
+                    if check is not None and min(niterations) >= min_iterations:
+                        is_converged = self.check(**check)
+                    update = None if is_converged else self._get_update()
+                finally:
+                    self.chains = chains
+                if is_converged:
+                    isend(None, tags.STOP)
+                elif update is not None:
+                    isend(update, tags.UPDATE)
+            for request in requests: request.wait()
+        else:
+            ichain = color - 1
+            self.rng = np.random.RandomState(seed=seeds[ichain])
+            start, count = start[ichain], count_iterations
+            while True:
+                niter = min(max_iterations - count, check_every)
+                self._set_rng(rng=self.rng)
+                self.derived = None
+                self._ichain = ichain
+                chain = self._run_one(start, niterations=niter, **kwargs)
+                count += niter
+                last, update = False, None
+                if self.mpicomm.rank == 0:
+                    ncall = self.derived[1][self.likelihood._param_loglikelihood].size if self.derived is not None else 0
+                    if chain is not None:
+                        chain = self._set_derived(chain)
+                        if chain.size: start = self._get_last(chain)
+                    while basecomm.iprobe(source=0, tag=mpi.ANY_TAG, status=status):
+                        tag = status.Get_tag()
+                        value = basecomm.recv(source=0, tag=tag)
+                        if tag == tags.STOP: last = True
+                        elif tag == tags.UPDATE: update = value
+                    last |= count >= max_iterations
+                    basecomm.send((ichain, ncall, count, last, chain is not None), dest=0, tag=tags.SAMPLES)
+                    if chain is not None:
+                        chain.send(dest=0, tag=tags.SAMPLES, mpicomm=basecomm)
+                last, update, start = self.mpicomm.bcast((last, update, start), root=0)
+                if last: break
+                self._set_update(update)
+            if self.mpicomm.rank == 0:
+                # Discard messages sent by root in the meantime
+                while True:
+                    basecomm.recv(source=0, tag=mpi.ANY_TAG, status=status)
+                    if status.Get_tag() == tags.EXIT: break
+        self.mpicomm.Free()
+        self.mpicomm = basecomm
+        self.diagnostics['ncall'] = self.mpicomm.bcast(ncalls, root=0)
+        self.diagnostics['naccepted'] = self.mpicomm.bcast(naccepted, root=0)
+
 
     def check(self, nsplits=4, burnin=0.5, stable_over=2,
               max_eigen_gr=0.03, max_diag_gr=None, max_cl_diag_gr=None, nsigmas_cl_diag_gr=1., max_geweke=None, max_geweke_pvalue=None,
               min_iterations_over_iact=None, reliable_iterations_over_iact=50, max_dact=None,
               min_eigen_gr=None, min_diag_gr=None, min_cl_diag_gr=None, min_geweke=None, min_geweke_pvalue=None,
-              max_iterations_over_iact=None, min_dact=None, diagnostics=None, quiet=False):
+              max_iterations_over_iact=None, min_dact=None, block_size=20, diagnostics=None, quiet=False):
         """
         Run convergence checks.
 
@@ -483,6 +692,10 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
         reliable_iterations_over_iact : int, default=50
             After ``reliable_iterations_over_iact`` auto-correlation time estimation is considered reliable.
 
+        block_size : int, default=20
+            Number of iterations (steps) per block of the streaming statistics (see below).
+            Smaller blocks give a finer resolution for ``burnin`` and splits of short chains, at a larger memory cost.
+
         diagnostics : dict, default=None
             Dictionary where computed statistics are added.
             Default is :attr:`diagnostics`.
@@ -493,6 +706,9 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
         Note
         ----
         All max_* have a min_* counterpart, and vice-versa.
+        Statistics are updated with new samples only (see :class:`~desilike.samples.diagnostics.StreamingStatistics`):
+        ``burnin`` and splits are rounded to blocks of iterations, and the integrated autocorrelation time is estimated with batch means.
+        If splits are too short (in blocks) for Geweke statistics, these are computed from the samples.
 
         Returns
         -------
@@ -558,50 +774,79 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
                     self.log_info('{}.'.format(msg))
                 return True
 
+            # Statistics are updated with new samples only, and estimated on blocks of iterations
+            for ichain, chain in enumerate(self.chains):
+                statistics = self._chain_statistics[ichain]
+                if statistics is None or len(chain) < statistics.nblocks * statistics.block_size or statistics.block_size != block_size:
+                    statistics = self._chain_statistics[ichain] = sample_diagnostics.StreamingStatistics(self.varied_params, block_size=block_size)
+                statistics.update(chain)
+            nblocks = min(statistics.nblocks for statistics in self._chain_statistics)
+
             if 0 < burnin < 1:
-                burnin = int(burnin * self.chains[0].shape[0] + 0.5)
+                burnin = int(burnin * nblocks + 0.5)
+            else:
+                burnin = int(burnin / block_size + 0.5)
 
-            lensplits = (self.chains[0].shape[0] - burnin) // nsplits
+            lensplits = (nblocks - burnin) // nsplits
 
-            split_samples = [chain[burnin + islab * lensplits:burnin + (islab + 1) * lensplits] for islab in range(nsplits) for chain in self.chains]
+            split_samples = [(statistics, burnin + islab * lensplits, burnin + (islab + 1) * lensplits) for islab in range(nsplits) for statistics in self._chain_statistics]
 
-            if any(samples.size < 1 for samples in split_samples):
+            if lensplits < 1:
                 toret = False
             else:
                 if verbose: self.log_info('Diagnostics:')
                 item = '- '
                 toret = True
 
+                def gelman_rubin(statistic='mean', **kwargs):
+                    if statistic == 'mean':
+                        means = [statistics.mean(start, stop) for statistics, start, stop in split_samples]
+                    else:
+                        means = [statistic(statistics, start, stop) for statistics, start, stop in split_samples]
+                    covs = [statistics.covariance(start, stop) for statistics, start, stop in split_samples]
+                    wsums, w2sums = np.array([statistics.weight_sums(start, stop) for statistics, start, stop in split_samples]).T
+                    return sample_diagnostics._gelman_rubin(np.array(means), np.array(covs), wsums, w2sums, **kwargs)[0]
+
                 try:
-                    eigen_gr = sample_diagnostics.gelman_rubin(split_samples, self.varied_params, method='eigen', check_valid='ignore').max() - 1
+                    eigen_gr = gelman_rubin(method='eigen', check_valid='ignore').max() - 1
                 except ValueError:
                     eigen_gr = np.nan
                 toret &= full_test('eigen_gr', 'max eigen Gelman-Rubin - 1', eigen_gr, min_eigen_gr, max_eigen_gr)
 
                 try:
-                    diag_gr = sample_diagnostics.gelman_rubin(split_samples, self.varied_params, method='diag').max() - 1
+                    diag_gr = gelman_rubin(method='diag').max() - 1
                 except ValueError:
                     diag_gr = np.nan
                 toret &= full_test('diag_gr', 'max diag Gelman-Rubin - 1', diag_gr, min_diag_gr, max_diag_gr)
 
-                def cl_lower(samples, params):
-                    return np.array([samples.interval(param, nsigmas=nsigmas_cl_diag_gr)[0] for param in params])
+                def cl_lower(statistics, start, stop):
+                    return statistics.interval(start, stop, nsigmas=nsigmas_cl_diag_gr)[0]
 
-                def cl_upper(samples, params):
-                    return np.array([samples.interval(param, nsigmas=nsigmas_cl_diag_gr)[1] for param in params])
+                def cl_upper(statistics, start, stop):
+                    return statistics.interval(start, stop, nsigmas=nsigmas_cl_diag_gr)[1]
 
                 try:
-                    cl_diag_gr = np.max([sample_diagnostics.gelman_rubin(split_samples, self.varied_params, statistic=cl_lower, method='diag'),
-                                         sample_diagnostics.gelman_rubin(split_samples, self.varied_params, statistic=cl_upper, method='diag')]) - 1
+                    cl_diag_gr = np.max([gelman_rubin(statistic=cl_lower, method='diag'), gelman_rubin(statistic=cl_upper, method='diag')]) - 1
                 except ValueError:
                     cl_diag_gr = np.nan
                 toret &= full_test('cl_diag_gr', 'max diag Gelman-Rubin - 1 at {:.1f} sigmas'.format(nsigmas_cl_diag_gr), cl_diag_gr, min_cl_diag_gr, max_cl_diag_gr)
 
-                try:
-                    # Source: https://github.com/JohannesBuchner/autoemcee/blob/38feff48ae524280c8ea235def1f29e1649bb1b6/autoemcee.py#L337
-                    all_geweke = sample_diagnostics.geweke(split_samples, self.varied_params, first=0.1, last=0.5)
-                except ValueError:
-                    all_geweke = np.nan
+                # Source: https://github.com/JohannesBuchner/autoemcee/blob/38feff48ae524280c8ea235def1f29e1649bb1b6/autoemcee.py#L337
+                # Geweke statistics on the first 10% and last 50% of each split
+                ifirst, ilast = int(0.1 * lensplits + 0.5), int(0.5 * lensplits + 0.5)
+                if 0 < ifirst and ilast < lensplits:
+                    all_geweke = []
+                    for statistics, start, stop in split_samples:
+                        diff = np.abs(statistics.mean(start, start + ifirst) - statistics.mean(start + ilast, stop))
+                        diff /= (np.diag(statistics.covariance(start, start + ifirst)) + np.diag(statistics.covariance(start + ilast, stop)))**0.5
+                        all_geweke.append(diff)
+                    all_geweke = np.array(all_geweke).T
+                else:  # not enough blocks: compute from the samples of each split
+                    split_chains = [chain[(burnin + islab * lensplits) * block_size:(burnin + (islab + 1) * lensplits) * block_size] for islab in range(nsplits) for chain in self.chains]
+                    try:
+                        all_geweke = sample_diagnostics.geweke(split_chains, self.varied_params, first=0.1, last=0.5)
+                    except ValueError:
+                        all_geweke = np.nan
                 geweke = np.max(all_geweke)
                 toret &= full_test('geweke', 'max Geweke', geweke, min_geweke, max_geweke)
 
@@ -612,18 +857,12 @@ class BaseBatchPosteriorSampler(BasePosteriorSampler):
                     geweke_pvalue = np.nan
                 toret &= full_test('geweke_pvalue', 'Geweke p-value', geweke_pvalue, min_geweke_pvalue, max_geweke_pvalue)
 
-                split_samples = []
-                for chain in self.chains:
-                    chain = chain[burnin:]
-                    chain = chain.reshape(len(chain), -1)
-                    for iwalker in range(chain.shape[1]):
-                        split_samples.append(chain[:, iwalker])
                 try:
-                    iact = sample_diagnostics.integrated_autocorrelation_time(split_samples, self.varied_params, check_valid='ignore')
+                    iact = np.mean([statistics.integrated_autocorrelation_time(burnin, nblocks) for statistics in self._chain_statistics], axis=0)
                 except ValueError:
                     iact = np.full(len(self.varied_params), np.nan, dtype='f8')
                 add_diagnostics('iact', iact)
-                niterations = len(split_samples[0])
+                niterations = (nblocks - burnin) * block_size
                 iact = iact.max()
                 name = '({:d} iterations / integrated autocorrelation time)'.format(niterations)
                 if reliable_iterations_over_iact * iact < niterations:
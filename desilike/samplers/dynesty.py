@@ -155,7 +155,7 @@ class BaseDynestySampler(BasePosteriorSampler):
                         self.derived = self.resume_derived
                 chain = self._set_derived(chain)
                 self.resume_chain = chain = self._set_derived(chain)
-                self.resume_chain.save(self.save_fn[self._ichain])
+                self._save_chain(self._ichain, self.resume_chain)
                 utils.save_sampler(self.sampler, self.state_fn[self._ichain])
 
             self.resume_derived = self.derived
@@ -114,6 +114,7 @@ class GridSampler(BaseClass, metaclass=RegisteredSampler):
                 self.samples.save(self.save_fn)
         else:
             self.samples = None
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.samples
 
     def __enter__(self):
@@ -0,0 +1,365 @@
+import numpy as np
+
+from desilike import utils, PipelineError
+from desilike.samples import Chain
+from .base import BaseBatchPosteriorSampler
+
+
+def _adapt_windows(nadapt, init_buffer=75, term_buffer=50, base_window=25):
+    # Return the end of the initial (step size only) adaptation phase, and the ends of the (doubling) windows
+    # where the mass matrix is estimated, following Stan
+    if nadapt < init_buffer + term_buffer + base_window:
+        init_buffer, term_buffer = int(0.15 * nadapt), int(0.1 * nadapt)
+        base_window = nadapt - init_buffer - term_buffer
+    ends, start, size = [], init_buffer, base_window
+    while size > 0:
+        end = start + size
+        if end + 2 * size > nadapt - term_buffer:
+            ends.append(nadapt - term_buffer)
+            break
+        ends.append(end)
+        start, size = end, 2 * size
+    return init_buffer, ends
+
+
+class DualAveraging(utils.BaseClass):
+
+    """Dual averaging of the step size, see https://arxiv.org/abs/1111.4246."""
+
+    _attrs = ['target', 'gamma', 't0', 'kappa', 'mu', 'log_step_size', 'log_step_size_bar', 'h_bar', 't']
+
+    def __init__(self, step_size, target=0.8, gamma=0.05, t0=10., kappa=0.75):
+        self.target, self.gamma, self.t0, self.kappa = float(target), float(gamma), float(t0), float(kappa)
+        self.mu = np.log(10. * step_size)
+        self.log_step_size = self.log_step_size_bar = np.log(step_size)
+        self.h_bar, self.t = 0., 0
+
+    def update(self, accept_stat):
+        self.t += 1
+        eta = 1. / (self.t + self.t0)
+        self.h_bar = (1. - eta) * self.h_bar + eta * (self.target - accept_stat)
+        self.log_step_size = self.mu - np.sqrt(self.t) / self.gamma * self.h_bar
+        x_eta = self.t**(-self.kappa)
+        self.log_step_size_bar = x_eta * self.log_step_size + (1. - x_eta) * self.log_step_size_bar
+        return np.exp(self.log_step_size)
+
+    @property
+    def step_size(self):
+        return np.exp(self.log_step_size_bar)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self._attrs}
+
+
+class HMCSampler(BaseBatchPosteriorSampler):
+    """
+    Hamiltonian Monte Carlo sampler, with the No-U-Turn criterion (NUTS) to set the trajectory length,
+    using the gradient of the log-posterior computed with jax through the (jitted) pipeline.
+    Step size (with dual averaging) and diagonal mass matrix are adapted during warmup.
+    Walkers are independent HMC chains, which are evolved all at once (log-posterior and gradient are vectorized with jax.vmap).
+
+    Note
+    ----
+    The pipeline must be traceable by jax, see :meth:`BasePipeline.get_jit`.
+
+    Reference
+    ---------
+    - https://arxiv.org/abs/1111.4246
+    - https://arxiv.org/abs/1206.1901
+    - https://mc-stan.org/docs/reference-manual/hmc-algorithm-parameters.html
+    """
+    name = 'hmc'
+
+    def __init__(self, *args, nwalkers=4, nsteps=None, step_size=None, max_tree_depth=10, target_accept=0.8, adapt=1000, **kwargs):
+        """
+        Initialize HMC sampler.
+
+        Parameters
+        ----------
+        likelihood : BaseLikelihood
+            Input likelihood.
+
+        nwalkers : int, str, default=4
+            Number of walkers, i.e. independent HMC chains, which are evolved all at once.
+            Defaults to :attr:`Chain.shape[1]` of input chains, if any.
+            Can be given in dimension units, e.g. ``'2 * ndim'``.
+
+        nsteps : int, default=None
+            If ``None``, trajectory length is set by the No-U-Turn criterion (NUTS).
+            Else, number of leapfrog steps of each trajectory (standard HMC).
+
+        step_size : float, default=None
+            Initial leapfrog step size (in units of the mass matrix). If ``None``, a reasonable value is looked for.
+
+        max_tree_depth : int, default=10
+            With NUTS, maximum tree depth, i.e. trajectories have at most ``2**max_tree_depth`` leapfrog steps.
+
+        target_accept : float, default=0.8
+            Target mean acceptance probability, for step size adaptation.
+
+        adapt : int, bool, default=1000
+            Number of (warmup) iterations during which step size and mass matrix are adapted.
+            ``False`` for no adaptation.
+
+        rng : np.random.RandomState, default=None
+            Random state. If ``None``, ``seed`` is used to set random state.
+
+        seed : int, default=None
+            Random seed.
+
+        max_tries : int, default=1000
+            A :class:`ValueError` is raised after this number of likelihood (+ prior) calls without finite posterior.
+
+        chains : str, Path, Chain
+            Path to or chains to resume from.
+
+        ref_scale : float, default=1.
+            Rescale parameters' :attr:`Parameter.ref` reference distribution by this factor.
+
+        save_fn : str, Path, default=None
+            If not ``None``, save samples to this location.
+
+        mpicomm : mpi.COMM_WORLD, default=None
+            MPI communicator. If ``None``, defaults to ``likelihood``'s :attr:`BaseLikelihood.mpicomm`.
+        """
+        super(HMCSampler, self).__init__(*args, **kwargs)
+        ndim = len(self.varied_params)
+        shapes = self.mpicomm.bcast([chain.shape if chain is not None else None for chain in self.chains], root=0)
+        if any(shape is not None for shape in shapes):
+            try:
+                nwalkers = shapes[0][1]
+                assert all(shape[1] == nwalkers for shape in shapes)
+            except (IndexError, AssertionError) as exc:
+                raise ValueError('Impossible to find number of walkers from input chains of shapes {}'.format(shapes)) from exc
+        self.nwalkers = utils.evaluate(nwalkers, type=int, locals={'ndim': ndim})
+        self.nsteps = None if nsteps is None else int(nsteps)
+        self.max_tree_depth = int(max_tree_depth)
+        self.target_accept = float(target_accept)
+        self.adapt = 0 if adapt is False else int(adapt)
+        self.step_size = step_size
+        self.inv_metric = np.array([param.proposal**2 if param.proposal is not None else 1. for param in self.varied_params], dtype='f8')
+        # Step size and mass matrix adaptation state, for each chain
+        self._adaptation = [None] * self.nchains
+
+    def _get_start(self, *args, **kwargs):
+        start = super(HMCSampler, self)._get_start(*args, **kwargs)
+        # Adaptation state is saved in chain.attrs, as chains may be run by different processes from one batch to the other
+        for ichain, chain in enumerate(self.chains):
+            self._adaptation[ichain] = self.mpicomm.bcast(chain.attrs.get('adaptation', None) if self.mpicomm.rank == 0 and chain is not None else None, root=0)
+        return start
+
+    def run(self, *args, **kwargs):
+        """
+        Run chains. Sampling can be interrupted anytime, and resumed by providing the path to the saved chains in ``chains`` argument of :meth:`__init__`
+        (adaptation then resumes from the state saved in the chains' :attr:`Chain.attrs`).
+
+        One will typically run sampling on ``nchains * nprocs_per_chain + 1`` processes, with ``nchains >= 1`` the number of chains
+        and ``nprocs_per_chain = max((mpicomm.size - 1) // nchains, 1)`` the number of processes per chain --- plus 1 root process to distribute the work.
+
+        Parameters
+        ----------
+        min_iterations : int, default=100
+            Minimum number of iterations (HMC trajectories) to run (to avoid early stopping
+            if convergence criteria below are satisfied by chance at the beginning of the run).
+
+        max_iterations : int, default=sys.maxsize
+            Maximum number of iterations (HMC trajectories) to run.
+
+        check_every : int, default=300
+            Samples are saved and convergence checks are run every ``check_every`` iterations.
+
+        check : bool, dict, default=None
+            If ``False``, no convergence checks are run.
+            If ``True`` or ``None``, convergence checks are run.
+            A dictionary of convergence criteria can be provided, see :meth:`check`.
+
+        asynchronous : bool, default=False
+            If ``True``, run chains asynchronously, without synchronization every ``check_every`` iterations.
+            Requires at least ``nchains + 1`` processes; else chains are run synchronously.
+
+        thin_by : int, default=1
+            Thin samples by this factor.
+        """
+        return super(HMCSampler, self).run(*args, **kwargs)
+
+    def _logposterior_and_grad(self, values):
+        # Log-posterior and its gradient, computed with jax
+        derived, grad = self._func(*values.T)
+        logposterior = sum(np.array(derived[name], dtype='f8') for name in self._func_names)
+        grad = np.array(grad, dtype='f8')
+        mask = np.isfinite(logposterior) & np.isfinite(grad).all(axis=-1)
+        logposterior[~mask] = -np.inf
+        grad[~mask] = 0.
+        self._ncalls += len(values)
+        return logposterior, grad
+
+    def _kinetic(self, momentum, inv_metric):
+        return 0.5 * np.sum(momentum**2 * inv_metric, axis=-1)
+
+    def _leapfrog(self, position, momentum, grad, step_size, inv_metric):
+        # step_size is of shape (nwalkers, 1), its sign giving the direction in time
+        momentum = momentum + 0.5 * step_size * grad
+        position = position + step_size * inv_metric * momentum
+        logposterior, grad = self._logposterior_and_grad(position)
+        momentum = momentum + 0.5 * step_size * grad
+        return position, momentum, logposterior, grad
+
+    def _find_step_size(self, position, logposterior, grad, inv_metric, step_size=1.):
+        # Heuristic of https://arxiv.org/abs/1111.4246, algorithm 4: double or halve step size until acceptance crosses 0.5
+        momentum = self.rng.standard_normal(size=position.shape) / np.sqrt(inv_metric)
+        hamiltonian = logposterior - self._kinetic(momentum, inv_metric)
+
+        def mean_accept(step_size):
+            new = self._leapfrog(position, momentum, grad, np.full((len(position), 1), step_size), inv_metric)
+            with np.errstate(over='ignore', invalid='ignore'):
+                return np.mean(np.nan_to_num(np.minimum(1., np.exp(new[2] - self._kinetic(new[1], inv_metric) - hamiltonian)), nan=0.))
+
+        direction = 1. if mean_accept(step_size) > 0.5 else -1.
+        for i in range(100):
+            new_step_size = step_size * 2.**direction
+            if (mean_accept(new_step_size) > 0.5) != (direction > 0):
+                break
+            step_size = new_step_size
+        return step_size
+
+    def _is_turning(self, minus, plus, inv_metric):
+        # No-U-Turn criterion, for each walker
+        diff = plus[0] - minus[0]
+        return (np.sum(diff * inv_metric * minus[1], axis=-1) < 0.) | (np.sum(diff * inv_metric * plus[1], axis=-1) < 0.)
+
+    def _build_tree(self, edge, log_slice, direction, depth, step_size, inv_metric, hamiltonian0):
+        # Build (for all walkers at once) a tree of depth ``depth`` from ``edge``, see https://arxiv.org/abs/1111.4246, algorithm 6
+        # Trees are tuples of (minus edge, plus edge, proposal, number of valid points, not terminated, sum of acceptance probabilities, number of points)
+        # with edges = (position, momentum, gradient) and proposal = (position, logposterior, gradient)
+        if depth == 0:
+            position, momentum, logposterior, grad = self._leapfrog(*edge, step_size=direction[:, None] * step_size, inv_metric=inv_metric)
+            hamiltonian = logposterior - self._kinetic(momentum, inv_metric)
+            with np.errstate(over='ignore', invalid='ignore'):
+                accept = np.nan_to_num(np.minimum(1., np.exp(hamiltonian - hamiltonian0)), nan=0.)
+            hamiltonian = np.where(np.isnan(hamiltonian), -np.inf, hamiltonian)
+            new = (position, momentum, grad)
+            return [new, new, (position, logposterior, grad), (log_slice <= hamiltonian).astype('i8'), log_slice < hamiltonian + 1000., accept, np.ones_like(accept)]
+        tree = self._build_tree(edge, log_slice, direction, depth - 1, step_size, inv_metric, hamiltonian0)
+        active = tree[4]
+        if not active.any():
+            return tree
+        minus = direction < 0
+        edge = tuple(np.where(minus[:, None], m, p) for m, p in zip(tree[0], tree[1]))
+        subtree = self._build_tree(edge, log_slice, direction, depth - 1, step_size, inv_metric, hamiltonian0)
+        for itree, mask in [(0, active & minus), (1, active & ~minus)]:
+            tree[itree] = tuple(np.where(mask[:, None], s, t) for s, t in zip(subtree[itree], tree[itree]))
+        n = tree[3] + subtree[3]
+        mask = active & (self.rng.uniform(size=n.size) * np.maximum(n, 1) < subtree[3])
+        tree[2] = tuple(np.where(mask if t.ndim == 1 else mask[:, None], s, t) for s, t in zip(subtree[2], tree[2]))
+        tree[3] = np.where(active, n, tree[3])
+        tree[5] = np.where(active, tree[5] + subtree[5], tree[5])
+        tree[6] = np.where(active, tree[6] + subtree[6], tree[6])
+        tree[4] = active & subtree[4] & ~self._is_turning(tree[0], tree[1], inv_metric)
+        return tree
+
+    def _nuts(self, position, logposterior, grad, step_size, inv_metric):
+        momentum = self.rng.standard_normal(size=position.shape) / np.sqrt(inv_metric)
+        hamiltonian0 = logposterior - self._kinetic(momentum, inv_metric)
+        log_slice = hamiltonian0 - self.rng.standard_exponential(size=len(position))
+        minus = plus = (position, momentum, grad)
+        proposal = (position, logposterior, grad)
+        n, active = np.ones(len(position), dtype='i8'), np.ones(len(position), dtype='?')
+        accept, naccept = np.zeros(len(position), dtype='f8'), np.ones(len(position), dtype='f8')
+        for depth in range(self.max_tree_depth):
+            direction = self.rng.choice([-1., 1.], size=len(position))
+            edge = tuple(np.where((direction < 0)[:, None], m, p) for m, p in zip(minus, plus))
+            tree = self._build_tree(edge, log_slice, direction, depth, step_size, inv_metric, hamiltonian0)
+            mask = active & (direction < 0)
+            minus = tuple(np.where(mask[:, None], t, m) for t, m in zip(tree[0], minus))
+            mask = active & (direction > 0)
+            plus = tuple(np.where(mask[:, None], t, p) for t, p in zip(tree[1], plus))
+            mask = active & tree[4] & (self.rng.uniform(size=n.size) * n < tree[3])
+            proposal = tuple(np.where(mask if t.ndim == 1 else mask[:, None], t, p) for t, p in zip(tree[2], proposal))
+            n = np.where(active, n + tree[3], n)
+            accept = np.where(active, tree[5], accept)
+            naccept = np.where(active, tree[6], naccept)
+            active = active & tree[4] & ~self._is_turning(minus, plus, inv_metric)
+            if not active.any(): break
+        return proposal, accept / naccept
+
+    def _hmc(self, position, logposterior, grad, step_size, inv_metric):
+        momentum = self.rng.standard_normal(size=position.shape) / np.sqrt(inv_metric)
+        hamiltonian0 = logposterior - self._kinetic(momentum, inv_metric)
+        new = (position, momentum, logposterior, grad)
+        step_size = np.full((len(position), 1), step_size)
+        for istep in range(self.nsteps):
+            new = self._leapfrog(new[0], new[1], new[3], step_size, inv_metric)
+        with np.errstate(over='ignore', invalid='ignore'):
+            accept = np.nan_to_num(np.minimum(1., np.exp(new[2] - self._kinetic(new[1], inv_metric) - hamiltonian0)), nan=0.)
+        mask = self.rng.uniform(size=accept.size) < accept
+        proposal = tuple(np.where(mask if t.ndim == 1 else mask[:, None], t, p) for t, p in zip((new[0], new[2], new[3]), (position, logposterior, grad)))
+        return proposal, accept
+
+    def _run_one(self, start, niterations=300, thin_by=1):
+        self._func_names = [str(self.likelihood._param_loglikelihood), str(self.likelihood._param_logprior)]
+        self._func = self.pipeline.get_jit(params=self.varied_params, grad=self._func_names)
+        if self._func is None:
+            raise PipelineError('{} requires the pipeline to be traceable by jax'.format(self.__class__.__name__))
+        self._ncalls = 0
+        adaptation = self._adaptation[self._ichain]
+        if adaptation is None:
+            adaptation = {'iteration': 0, 'step_size': self.step_size, 'inv_metric': self.inv_metric}
+        # Copy, with lists (from json) cast back to arrays
+        adaptation = {name: np.array(value, dtype='f8') if isinstance(value, (list, np.ndarray)) else value for name, value in adaptation.items()}
+        dual_averaging = DualAveraging.from_state(adaptation['dual_averaging']) if 'dual_averaging' in adaptation else None
+        position = start = np.array(start, dtype='f8')
+        ndim = position.shape[-1]
+        logposterior, grad = self._logposterior_and_grad(position)
+        inv_metric = adaptation['inv_metric']
+        if adaptation['step_size'] is None:
+            adaptation['step_size'] = self._find_step_size(position, logposterior, grad, inv_metric)
+        step_size = adaptation['step_size']
+        init_buffer, window_ends = _adapt_windows(self.adapt)
+        if adaptation['iteration'] < self.adapt and dual_averaging is None:
+            dual_averaging = DualAveraging(step_size, target=self.target_accept)
+            adaptation['window'] = []
+        if 'window' in adaptation:
+            adaptation['window'] = np.array(adaptation['window'], dtype='f8').reshape(-1, ndim)
+        positions, logposteriors, accepts = [], [], []
+        for iteration in range(1, niterations + 1):
+            if self.nsteps is None:
+                proposal, accept = self._nuts(position, logposterior, grad, step_size, inv_metric)
+            else:
+                proposal, accept = self._hmc(position, logposterior, grad, step_size, inv_metric)
+            position, logposterior, grad = proposal
+            accepts.append(np.mean(accept))
+            if adaptation['iteration'] < self.adapt:
+                it = adaptation['iteration']
+                step_size = dual_averaging.update(accepts[-1])
+                if init_buffer <= it < window_ends[-1]:
+                    adaptation['window'] = np.concatenate([adaptation['window'], position], axis=0)
+                if it + 1 in window_ends:
+                    window = adaptation['window']
+                    nsamples = len(window)
+                    inv_metric = adaptation['inv_metric'] = nsamples / (nsamples + 5.) * np.var(window, axis=0, ddof=1) + 1e-3 * 5. / (nsamples + 5.)
+                    step_size = self._find_step_size(position, logposterior, grad, inv_metric, step_size=step_size)
+                    dual_averaging = DualAveraging(step_size, target=self.target_accept)
+                    adaptation['window'] = np.empty((0, ndim), dtype='f8')
+                if it + 1 == self.adapt:
+                    step_size = dual_averaging.step_size
+                    dual_averaging = None
+                    del adaptation['window']
+                adaptation['iteration'] += 1
+                adaptation['step_size'] = step_size
+            if iteration % thin_by == 0:
+                positions.append(position.copy())
+                logposteriors.append(logposterior.copy())
+        adaptation.pop('dual_averaging', None)
+        if dual_averaging is not None:
+            adaptation['dual_averaging'] = dual_averaging.__getstate__()
+        self._adaptation[self._ichain] = adaptation
+        if self.mpicomm.rank == 0:
+            self.log_info('Step size = {:.4g}, mean acceptance = {:.3f}, {:.1f} gradient evaluations per iteration and walker.'.format(step_size, np.mean(accepts), self._ncalls / (niterations * self.nwalkers)))
+        if not positions:
+            return None
+        positions = np.array(positions)
+        # Derived parameters are filled in with the standard pipeline, in one go for all stored points (and starting points, which they may repeat)
+        new = np.any(positions != np.concatenate([start[None, ...], positions[:-1]], axis=0), axis=-1)
+        self.logposterior(np.concatenate([start, positions[new]], axis=0))
+        data = [positions[..., iparam] for iparam, param in enumerate(self.varied_params)] + [np.array(logposteriors)]
+        return Chain(data=data, params=self.varied_params + ['logposterior'], attrs={'adaptation': adaptation})
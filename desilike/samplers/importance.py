@@ -111,6 +111,7 @@ class ImportanceSampler(BaseClass):
             if self.save_fn is not None:
                 for ichain, chain in enumerate(self.chains):
                     if chain is not None: chain.save(self.save_fn[ichain])
+        self.pipeline.dump_profile(mpicomm=self.mpicomm)
         return self.chains
 
     def __enter__(self):
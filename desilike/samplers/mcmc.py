@@ -10,16 +10,6 @@ from desilike.samples import Chain, load_source
 from .base import BaseBatchPosteriorSampler
 
 
-class State(object):
-
-    _attrs = ['coords', 'log_prob', 'weight']
-
-    def __init__(self, *args, **kwargs):
-        attrs = {k: v for k, v in zip(self._attrs, args)}
-        attrs.update(kwargs)
-        self.__dict__.update(attrs)
-
-
 class MHSampler(object):
 
     """Metropolis-Hasting MCMC algorithm, with dragging option, as in cobaya, following emcee interface."""
@@ -38,21 +28,22 @@ class MHSampler(object):
         self.max_tries = int(max_tries)
         self.rng = rng or np.random.RandomState()
         self.vectorize = int(vectorize)
-        self.states = []
+        self.reset()
 
     def sample(self, start, iterations=1, thin_by=1):
-        self.state = State(start, self.log_prob_fn(start), 1)
+        coords, log_prob, weight = np.array(start, dtype='f8'), self.log_prob_fn(start), 1
+        self._reserve(self.nstates + iterations // thin_by)
         for iter in range(iterations + 1):  # we skip start
             accept = False
             for itry in range(self.max_tries):
                 if self.nsteps_drag:  # dragging
-                    current_coords_start = np.repeat(self.state.coords[None, :], self.vectorize, axis=0)
-                    current_log_prob_start = np.repeat(self.state.log_prob, self.vectorize, axis=0)
+                    current_coords_start = np.repeat(coords[None, :], self.vectorize, axis=0)
+                    current_log_prob_start = np.full(self.vectorize, log_prob, dtype='f8')
                     current_coords_end = current_coords_start + self.propose[0](self.vectorize)  # slow
                     current_log_prob_end = self.log_prob_fn(current_coords_end)
                     mask_current = current_log_prob_end > -np.inf
                     if not mask_current.any():
-                        self.state.weight += mask_current.size
+                        weight += mask_current.size
                         continue
                     sum_log_prob_start = current_log_prob_start.copy()
                     sum_log_prob_end = current_log_prob_end.copy()
@@ -70,7 +61,7 @@ class MHSampler(object):
                                 frac = istep / naverage
                                 proposal_log_prob_interp = (1 - frac) * proposal_log_prob_start + frac * proposal_log_prob_end
                                 current_log_prob_interp = (1 - frac) * current_log_prob_start + frac * current_log_prob_end
-                                mask_accept = mask_proposal & np.array([self._mh_accept(plogprob, clogprob) for plogprob, clogprob in zip(proposal_log_prob_interp, current_log_prob_interp)])
+                                mask_accept = mask_proposal & self._mh_accept(proposal_log_prob_interp, current_log_prob_interp)
                                 # The dragging step was accepted, do the drag
                                 current_coords_start[mask_accept] = proposal_coords_start[mask_accept]
                                 current_log_prob_start[mask_accept] = proposal_log_prob_start[mask_accept]
@@ -81,48 +72,64 @@ class MHSampler(object):
                     mh_proposal_log_prob, mh_current_log_prob = sum_log_prob_end / naverage, sum_log_prob_start / naverage
                     proposal_coords, proposal_log_prob = current_coords_end, current_log_prob_end
                 else:  # standard MH
-                    proposal_coords = self.state.coords + self.propose(size=self.vectorize)
-                    mh_current_log_prob = np.full(self.vectorize, self.state.log_prob, dtype='f8')
-                    #mh_proposal_log_prob = proposal_log_prob = np.full(self.vectorize, -np.inf, dtype='f8')
+                    proposal_coords = coords + self.propose(size=self.vectorize)
+                    mh_current_log_prob = np.full(self.vectorize, log_prob, dtype='f8')
                     mh_proposal_log_prob = proposal_log_prob = self.log_prob_fn(proposal_coords)
-                for i in range(self.vectorize):
-                    accept = self._mh_accept(mh_proposal_log_prob[i], mh_current_log_prob[i])
-                    if accept:
-                        break
-                    else:
-                        self.state.weight += 1
+                # Proposals are tested in turn: the first accepted one is kept, previous ones add to the weight of the current state
+                mask_accept = self._mh_accept(mh_proposal_log_prob, mh_current_log_prob)
+                accept = mask_accept.any()
                 if accept:
-                    if iter > 0 and iter % thin_by == 0:
-                        self.states.append(self.state)
-                    self.state = State(proposal_coords[i], proposal_log_prob[i], 1)
-                    #print(proposal_log_prob, accept)
-                    #print(self.mpicomm.rank, iter, itry, flush=True)
+                    i = np.argmax(mask_accept)
+                    weight += i
                     break
+                weight += self.vectorize
             if not accept:
                 raise ValueError('Could not find finite log posterior after {:d} tries'.format(self.max_tries))
-            yield self.state
+            if iter > 0 and iter % thin_by == 0:
+                self._append(coords, log_prob, weight)
+            coords, log_prob, weight = proposal_coords[i], proposal_log_prob[i], 1
+            yield coords
 
     def _mh_accept(self, proposal_log_prob, current_log_prob):
-        if proposal_log_prob == -np.inf:
-            return False
-        if proposal_log_prob > current_log_prob:
-            return True
-        return self.rng.standard_exponential() > (current_log_prob - proposal_log_prob)
+        proposal_log_prob, current_log_prob = np.asarray(proposal_log_prob), np.asarray(current_log_prob)
+        # Random numbers are drawn for all proposals at once
+        mask = self.rng.standard_exponential(size=proposal_log_prob.shape) > (current_log_prob - proposal_log_prob)
+        return (proposal_log_prob > -np.inf) & ((proposal_log_prob > current_log_prob) | mask)
+
+    def _reserve(self, size):
+        # Make sure arrays can hold at least size states; arrays previously returned by get_* remain valid
+        if size > self._log_prob.size:
+            size = max(size, 2 * self._log_prob.size)
+            for name in ['_coords', '_weight', '_log_prob']:
+                array = getattr(self, name)
+                new = np.empty((size,) + array.shape[1:], dtype=array.dtype)
+                new[:self.nstates] = array[:self.nstates]
+                setattr(self, name, new)
+
+    def _append(self, coords, log_prob, weight):
+        self._reserve(self.nstates + 1)
+        self._coords[self.nstates] = coords
+        self._log_prob[self.nstates] = log_prob
+        self._weight[self.nstates] = weight
+        self.nstates += 1
 
     def get_chain(self):
-        return np.array([state.coords for state in self.states])
+        return self._coords[:self.nstates]
 
     def get_weight(self):
-        return np.array([state.weight for state in self.states], dtype='i8')
+        return self._weight[:self.nstates]
 
     def get_log_prob(self):
-        return np.array([state.log_prob for state in self.states])
+        return self._log_prob[:self.nstates]
 
     def get_acceptance_rate(self):
-        return len(self.states) / self.get_weight().sum()
+        return self.nstates / self.get_weight().sum()
 
     def reset(self):
-        self.states = []
+        self.nstates = 0
+        self._coords = np.empty((0, self.ndim), dtype='f8')
+        self._weight = np.empty(0, dtype='i8')
+        self._log_prob = np.empty(0, dtype='f8')
 
 
 class IndexCycler(object):
@@ -307,6 +314,7 @@ class BlockProposer(object):
         if not (np.allclose(matrix.T, matrix) and np.all(np.linalg.eigvals(matrix) > 0)):
             raise linalg.LinAlgError('The given covmat is not a positive-definite, symmetric square matrix.')
         L = linalg.cholesky(matrix)
+        self.covariance = matrix
         # Store the basis as transformation matrices
         self.transform = []
         for block_start, bp in zip(self.block_starts, self.proposer):
@@ -314,6 +322,30 @@ class BlockProposer(object):
             self.transform += [L[block_start:, block_start:block_end]]
         return True
 
+    def get_state(self):
+        """Return proposal state: covariance matrix and position in parameter and direction cycles."""
+        state = {'covariance': self.covariance, 'nsamples_slow': self.nsamples_slow, 'nsamples_fast': self.nsamples_fast}
+        state['cyclers'] = [(cycler.loop_index, getattr(cycler, 'indices', None)) for cycler in [self.param_cycler, self.param_cycler_slow, self.param_cycler_fast]]
+        state['proposers'] = [(proposer.loop_index, getattr(proposer, 'rotmat', None)) for proposer in self.proposer]
+        # Cyclers keep the random state they were initialized with
+        state['rng'] = self.param_cycler.rng.get_state()
+        return state
+
+    def set_state(self, state):
+        """Set proposal state, as returned by :meth:`get_state`."""
+        self.set_covariance(state['covariance'])
+        self.nsamples_slow, self.nsamples_fast = state['nsamples_slow'], state['nsamples_fast']
+        for cycler, (loop_index, indices) in zip([self.param_cycler, self.param_cycler_slow, self.param_cycler_fast], state['cyclers']):
+            cycler.loop_index = loop_index
+            if indices is not None: cycler.indices = indices
+        for proposer, (loop_index, rotmat) in zip(self.proposer, state['proposers']):
+            proposer.loop_index = loop_index
+            if rotmat is not None: proposer.rotmat = rotmat
+        rng = np.random.RandomState()
+        rng.set_state(state['rng'])
+        for cycler in [self.param_cycler, self.param_cycler_slow, self.param_cycler_fast] + self.proposer:
+            cycler.rng = rng
+
 
 def _format_blocks(blocks, params):
     blocks, oversample_factors = [b[1] for b in blocks], [b[0] for b in blocks]
@@ -458,7 +490,19 @@ class MCMCSampler(BaseBatchPosteriorSampler):
             if hasattr(self, name):
                 getattr(self, name).rng = self.rng
 
-    def _prepare(self):
+    def _get_sampler_state(self):
+        state = super(MCMCSampler, self)._get_sampler_state()
+        state['proposer'] = self.proposer.get_state()
+        state['learn_diagnostics'] = self.learn_diagnostics
+        return state
+
+    def _set_sampler_state(self, state):
+        super(MCMCSampler, self)._set_sampler_state(state)
+        self.proposer.set_state(state['proposer'])
+        self.learn_diagnostics = state['learn_diagnostics']
+
+    def _get_update(self):
+        # New proposal covariance, learned from chains
         covariance = None
         if self.learn and self.mpicomm.bcast(all(chain is not None for chain in self.chains), root=0):
             learn = self.learn_check is None
@@ -470,7 +514,9 @@ class MCMCSampler(BaseBatchPosteriorSampler):
                 chain = Chain.concatenate([chain.remove_burnin(burnin) for chain in self.chains])
                 if chain.size > 1:
                     covariance = chain.covariance(params=self.varied_params)
-        covariance = self.mpicomm.bcast(covariance, root=0)
+        return self.mpicomm.bcast(covariance, root=0)
+
+    def _set_update(self, covariance):
         if covariance is not None:
             try:
                 self.proposer.set_covariance(covariance)
@@ -505,6 +551,10 @@ class MCMCSampler(BaseBatchPosteriorSampler):
             If ``True`` or ``None``, convergence checks are run.
             A dictionary of convergence criteria can be provided, see :meth:`check`.
 
+        asynchronous : bool, default=False
+            If ``True``, run chains asynchronously, without synchronization every ``check_every`` iterations.
+            Requires at least ``nchains + 1`` processes; else chains are run synchronously.
+
         thin_by : int, default=1
             Thin samples by this factor.
         """
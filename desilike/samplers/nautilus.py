@@ -178,7 +178,7 @@ class NautilusSampler(BasePosteriorSampler):
                         self.derived = self.resume_derived
                 chain = self._set_derived(chain)
                 self.resume_chain = chain = self._set_derived(chain)
-                self.resume_chain.save(self.save_fn[self._ichain])
+                self._save_chain(self._ichain, self.resume_chain)
 
         def wrapper(write_bak):
 
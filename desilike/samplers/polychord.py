@@ -237,7 +237,7 @@ class PolychordSampler(BasePosteriorSampler):
                             self.derived = [Samples.concatenate([resume_derived, derived], intersection=True) for resume_derived, derived in zip(self.resume_derived, self.derived)]
                         chain = self._set_derived(chain)
                         self.resume_chain = chain[:-nlive]
-                        self.resume_chain.save(self.save_fn[self._ichain])
+                        self._save_chain(self._ichain, self.resume_chain)
                         chain[-nlive:].save(prefix + '.state.npy')
                 self.resume_derived = self.derived
                 self.derived = None
@@ -0,0 +1,261 @@
+import numpy as np
+
+from desilike.samples import Chain
+from .mcmc import MCMCSampler
+
+
+def _default_betas(ntemps, ndim, max_temperature=np.inf):
+    # Geometric temperature ladder; the temperature ratio aims at ~25% swap acceptance for Gaussian posteriors, as in ptemcee
+    if np.isinf(max_temperature):
+        ratio = 1. + 2. * np.sqrt(np.log(4.) / ndim)
+        return np.append(ratio**(-np.arange(ntemps - 1)), 0.)
+    return np.logspace(0., -np.log10(max_temperature), ntemps)
+
+
+def _thermodynamic_integration(betas, mean_loglikelihood):
+    # Log-evidence as the integral of mean log-likelihood over inverse temperature, with error estimated from every other temperature
+    betas, mean_loglikelihood = np.asarray(betas, dtype='f8'), np.asarray(mean_loglikelihood, dtype='f8')
+    if betas[-1] != 0.:
+        betas, mean_loglikelihood = np.append(betas, 0.), np.append(mean_loglikelihood, mean_loglikelihood[-1])
+    logz = -np.trapz(mean_loglikelihood, betas)
+    logz2 = -np.trapz(np.append(mean_loglikelihood[:-1:2], mean_loglikelihood[-1]), np.append(betas[:-1:2], 0.))
+    return logz, np.abs(logz - logz2)
+
+
+class PTSampler(MCMCSampler):
+    r"""
+    Parallel tempering extension of :class:`MCMCSampler`: each chain runs a ladder of replicas,
+    sampling the posterior with likelihood raised to powers (inverse temperatures) :math:`1 = \beta_{0} > \beta_{1} > ... \geq 0`.
+    Replicas are updated with Metropolis-Hastings steps (with the same proposal, rescaled by :math:`\beta^{-1/2}`),
+    and states of neighbouring temperatures are exchanged after each step.
+    Temperatures are adapted during ``adapt`` first iterations, such that swap acceptance rates are uniform along the ladder.
+    Only samples of the cold (:math:`\beta = 1`) replica are returned; log-evidence is obtained by thermodynamic integration,
+    see :meth:`log_evidence`.
+    All replicas of a chain are evaluated at once, distributed over the processes of this chain.
+
+    Reference
+    ---------
+    - https://arxiv.org/abs/physics/0508034
+    - https://arxiv.org/abs/1501.05823
+    - https://github.com/willvousden/ptemcee
+    """
+    name = 'pt'
+    _adaptation_time = 100
+
+    def __init__(self, *args, ntemps=8, max_temperature=np.inf, adapt=1000, **kwargs):
+        """
+        Initialize parallel tempering sampler.
+
+        Parameters
+        ----------
+        likelihood : BaseLikelihood
+            Input likelihood.
+
+        ntemps : int, default=8
+            Number of temperatures.
+
+        max_temperature : float, default=np.inf
+            Maximum temperature. If ``np.inf``, the hottest replica samples the prior,
+            and other temperatures are geometrically spaced, with a ratio set by the number of varied parameters.
+
+        adapt : int, default=1000
+            Number of iterations during which temperatures are adapted
+            (the coldest and hottest temperatures are kept fixed). Thermodynamic integration only uses samples after adaptation.
+
+        blocks : list, default=None
+            Parameter blocks are groups of parameters which are updated alltogether
+            with a frequency proportional to oversample_factor.
+            See :class:`MCMCSampler`.
+
+        oversample_power : float, default=0.4
+            If ``blocks`` is ``None``, i.e. parameter blocks are defined at runtime,
+            oversample factors are ~ ``speed**oversample_power``.
+
+        covariance : str, dict, Chain, Profiles, ParameterCovariance, default=None
+            (Initial) proposal covariance, to draw parameter jumps.
+            See :class:`MCMCSampler`.
+
+        proposal_scale : float, default=2.4
+            Scale proposal by this value when drawing jumps.
+
+        learn : bool, default=True
+            If ``True``, learn proposal covariance matrix from the cold replica.
+            See :class:`MCMCSampler`.
+
+        rng : np.random.RandomState, default=None
+            Random state. If ``None``, ``seed`` is used to set random state.
+
+        seed : int, default=None
+            Random seed.
+
+        max_tries : int, default=1000
+            A :class:`ValueError` is raised after this number of likelihood (+ prior) calls without finite posterior.
+
+        chains : str, Path, Chain
+            Path to or chains to resume from.
+
+        ref_scale : float, default=1.
+            Rescale parameters' :attr:`Parameter.ref` reference distribution by this factor.
+
+        save_fn : str, Path, default=None
+            If not ``None``, save samples to this location.
+
+        mpicomm : mpi.COMM_WORLD, default=None
+            MPI communicator. If ``None``, defaults to ``likelihood``'s :attr:`BaseLikelihood.mpicomm`
+        """
+        if kwargs.get('drag', False):
+            raise ValueError('Dragging is not supported with parallel tempering')
+        super(PTSampler, self).__init__(*args, **kwargs)
+        self.ntemps = self.nwalkers = int(ntemps)
+        if self.ntemps < 2:
+            raise ValueError('ntemps must be >= 2, found {:d}'.format(self.ntemps))
+        self.betas = _default_betas(self.ntemps, len(self.varied_params), max_temperature=float(max_temperature))
+        self.adapt = int(adapt)
+        self._tempering = [None] * self.nchains
+
+    def _get_last(self, chain):
+        # All replicas are saved in chain.attrs
+        tempering = chain.attrs.get('tempering', None)
+        if tempering is not None:
+            return np.array(tempering['state'], dtype='f8')
+        return np.repeat(super(PTSampler, self)._get_last(chain)[None, :], self.ntemps, axis=0)
+
+    def _get_start(self, *args, **kwargs):
+        start = super(PTSampler, self)._get_start(*args, **kwargs)
+        for ichain, chain in enumerate(self.chains):
+            self._tempering[ichain] = self.mpicomm.bcast(chain.attrs.get('tempering', None) if self.mpicomm.rank == 0 and chain is not None else None, root=0)
+        return start
+
+    def log_evidence(self):
+        """
+        Return log-evidence and its error (estimated by using every other temperature only) for each chain,
+        obtained by thermodynamic integration of the mean log-likelihood over inverse temperature.
+        """
+        toret = None
+        if self.mpicomm.rank == 0:
+            toret = np.full((self.nchains, 2), np.nan)
+            for ichain, chain in enumerate(self.chains):
+                tempering = chain.attrs.get('tempering', None) if chain is not None else None
+                if tempering is not None and tempering['nsum']:
+                    toret[ichain] = _thermodynamic_integration(tempering['betas'], np.array(tempering['sum_loglikelihood']) / tempering['nsum'])
+        return self.mpicomm.bcast(toret, root=0)
+
+    def run(self, *args, **kwargs):
+        """
+        Run chains. Sampling can be interrupted anytime, and resumed by providing the path to the saved chains in ``chains`` argument of :meth:`__init__`.
+
+        One will typically run sampling on ``nchains * nprocs_per_chain + 1`` processes, with ``nchains >= 1`` the number of chains
+        and ``nprocs_per_chain = max((mpicomm.size - 1) // nchains, 1)`` the number of processes per chain --- plus 1 root process to distribute the work.
+        Replicas of a chain are evaluated in parallel on these ``nprocs_per_chain`` processes, hence ``nprocs_per_chain = ntemps`` is optimal.
+
+        Parameters
+        ----------
+        min_iterations : int, default=100
+            Minimum number of iterations (MCMC steps) to run (to avoid early stopping
+            if convergence criteria below are satisfied by chance at the beginning of the run).
+
+        max_iterations : int, default=sys.maxsize
+            Maximum number of iterations (MCMC steps) to run.
+
+        check_every : int, default=300
+            Samples are saved and convergence checks are run every ``check_every`` iterations.
+
+        check : bool, dict, default=None
+            If ``False``, no convergence checks are run.
+            If ``True`` or ``None``, convergence checks are run.
+            A dictionary of convergence criteria can be provided, see :meth:`check`.
+
+        asynchronous : bool, default=False
+            If ``True``, run chains asynchronously, without synchronization every ``check_every`` iterations.
+            Requires at least ``nchains + 1`` processes; else chains are run synchronously.
+
+        thin_by : int, default=1
+            Thin samples by this factor.
+        """
+        toret = super(PTSampler, self).run(*args, **kwargs)
+        log_evidence = self.log_evidence()
+        if self.mpicomm.rank == 0:
+            for ichain, (logz, logz_err) in enumerate(log_evidence):
+                if not np.isnan(logz):
+                    self.log_info('Chain {:d}: log-evidence from thermodynamic integration = {:.3f} +/- {:.3f}.'.format(ichain, logz, logz_err))
+        return toret
+
+    def _run_one(self, start, niterations=300, thin_by=1):
+        tempering = self._tempering[self._ichain]
+        if tempering is None:
+            tempering = {'betas': self.betas, 'niterations': 0, 'nsum': 0, 'sum_loglikelihood': np.zeros(self.ntemps), 'nswaps': 0, 'naccepted_swaps': np.zeros(self.ntemps - 1)}
+        tempering = {name: np.array(value) if isinstance(value, (list, np.ndarray)) else value for name, value in tempering.items()}
+        betas = tempering['betas']
+        if thin_by == 'auto':
+            thin_by = int(sum(b * s for b, s in zip(self.proposer.blocks, self.proposer.oversample_factors)) / len(self.varied_params))
+
+        def tempered(logposterior, loglikelihood):
+            # logprior + beta * loglikelihood
+            toret = np.full_like(logposterior, -np.inf)
+            mask = np.isfinite(logposterior)
+            toret[mask] = logposterior[mask] - (1. - betas[mask]) * loglikelihood[mask]
+            return toret
+
+        def logposterior(values):
+            logposterior, logprior = self.logposterior(values), self.logprior(values)
+            loglikelihood = np.full_like(logposterior, -np.inf)
+            mask = np.isfinite(logposterior)
+            loglikelihood[mask] = logposterior[mask] - logprior[mask]
+            return logposterior, loglikelihood
+
+        coords = np.array(start, dtype='f8').reshape(self.ntemps, -1)
+        logpost, loglike = logposterior(coords)
+        naccepted = np.zeros(self.ntemps, dtype='i8')
+        nswaps, naccepted_swaps = 0, np.zeros(self.ntemps - 1, dtype='i8')
+        self.sampler.reset()
+        current, changed = None, True
+        for iteration in range(1, niterations + 1):
+            scales = np.zeros_like(betas)
+            scales[betas > 0] = betas[betas > 0]**(-0.5)
+            scales[betas == 0] = np.max(scales) if np.any(betas > 0) else 1.
+            proposal = coords + self.proposer(size=self.ntemps) * scales[:, None]
+            proposal_logpost, proposal_loglike = logposterior(proposal)
+            accept = self.sampler._mh_accept(tempered(proposal_logpost, proposal_loglike), tempered(logpost, loglike))
+            coords[accept], logpost[accept], loglike[accept] = proposal[accept], proposal_logpost[accept], proposal_loglike[accept]
+            naccepted += accept
+            changed |= accept[0]
+            # Swaps, from the hottest to the coldest pair of replicas
+            nswaps += 1
+            for itemp in range(self.ntemps - 1, 0, -1):
+                dlog = (betas[itemp - 1] - betas[itemp]) * (loglike[itemp] - loglike[itemp - 1])
+                swap = self.rng.standard_exponential() > -dlog
+                if swap:
+                    for array in [coords, logpost, loglike]:
+                        array[[itemp - 1, itemp]] = array[[itemp, itemp - 1]]
+                    naccepted_swaps[itemp - 1] += 1
+                    changed |= itemp == 1
+            if tempering['niterations'] < self.adapt:
+                # Temperature adaptation, as in ptemcee; coldest and hottest temperatures are kept fixed
+                # With one replica per temperature, swap acceptance rates are averaged over the run instead of taken at each step
+                rates = naccepted_swaps / nswaps
+                kappa = self.adapt / (tempering['niterations'] + self.adapt) / self._adaptation_time
+                dtemperatures = np.diff(1. / betas[:-1]) * np.exp(kappa * (rates[:-1] - rates[1:]))
+                betas = betas.copy()
+                betas[1:-1] = 1. / (np.cumsum(dtemperatures) + 1. / betas[0])
+            else:
+                tempering['sum_loglikelihood'] += loglike
+                tempering['nsum'] += 1
+            tempering['niterations'] += 1
+            if iteration % thin_by == 0:
+                # Run-length encoding of the cold replica
+                if changed:
+                    if current is not None: self.sampler._append(*current)
+                    current, changed = [coords[0].copy(), logpost[0], 1], False
+                else:
+                    current[2] += 1
+        if current is not None: self.sampler._append(*current)
+        tempering.update(betas=betas, state=coords, nswaps=tempering['nswaps'] + nswaps, naccepted_swaps=tempering['naccepted_swaps'] + naccepted_swaps)
+        self._tempering[self._ichain] = tempering
+        if self.mpicomm.rank == 0:
+            self.log_info('Acceptance rates = {}, swap acceptance rates = {}.'.format(np.round(naccepted / niterations, 3).tolist(), np.round(naccepted_swaps / max(nswaps, 1), 3).tolist()))
+        chain = self.sampler.get_chain()
+        if chain.size:
+            data = [chain[..., iparam] for iparam, param in enumerate(self.varied_params)] + [self.sampler.get_weight(), self.sampler.get_log_prob()]
+            self.sampler.reset()
+            return Chain(data=data, params=self.varied_params + ['fweight', 'logposterior'], attrs={'tempering': tempering})
+        return None
@@ -2,9 +2,9 @@ import pytest
 import numpy as np
 
 from desilike import PipelineError, setup_logging
-from desilike.samplers import (EmceeSampler, ZeusSampler, PocoMCSampler, MCMCSampler,
+from desilike.samplers import (EmceeSampler, ZeusSampler, PocoMCSampler, MCMCSampler, HMCSampler, PTSampler,
                                StaticDynestySampler, DynamicDynestySampler, PolychordSampler, NautilusSampler,
-                               GridSampler, QMCSampler, ImportanceSampler)
+                               GridSampler, ImportanceSampler)
 
 
 def test_samplers():
@@ -96,6 +96,7 @@ def test_nautilus(test=2):
 def test_fixed():
 
     from desilike.theories.galaxy_clustering import KaiserTracerPowerSpectrumMultipoles, ShapeFitPowerSpectrumTemplate
+    from desilike.samplers.qmc import QMCSampler  # not exported by desilike.samplers
     template = ShapeFitPowerSpectrumTemplate(z=0.5)
     theory = KaiserTracerPowerSpectrumMultipoles(template=template)
     for Sampler in [GridSampler, QMCSampler]:
@@ -248,9 +249,194 @@ def test_nested():
     plotting.plot_triangle(list(chains.values()), labels=list(chains.keys()), show=True)
 
 
+def test_mh():
+
+    from desilike.samplers.mcmc import MHSampler
+
+    ndim = 2
+    rng = np.random.RandomState(seed=42)
+    std = np.array([1., 2.])
+
+    def log_prob(x):
+        return -0.5 * np.sum((x / std)**2, axis=-1)
+
+    def propose(size=None):
+        return 2. * std * rng.standard_normal(size=(size, ndim))
+
+    for vectorize in [1, 4]:
+        sampler = MHSampler(ndim, log_prob, propose, vectorize=vectorize, rng=rng)
+        for _ in sampler.sample(start=np.zeros(ndim), iterations=20000): pass
+        chain, weight, logprob = sampler.get_chain(), sampler.get_weight(), sampler.get_log_prob()
+        assert chain.shape == (sampler.nstates, ndim) and weight.min() >= 1
+        assert np.allclose(logprob, log_prob(chain))
+        assert weight.sum() >= 20000
+        assert np.allclose(np.average(chain, weights=weight, axis=0), 0., atol=0.1)
+        assert np.allclose(np.sqrt(np.cov(chain.T, fweights=weight, ddof=0).diagonal()), std, rtol=0.1)
+        for _ in sampler.sample(start=chain[-1], iterations=100, thin_by=2): pass
+        assert np.all(sampler.get_chain()[:len(chain)] == chain)
+        sampler.reset()
+        assert sampler.get_chain().size == 0 and chain.shape[0] > 0
+
+
+class BoundedAffineModel(AffineModel):
+
+    _params = {'a': {'value': 0., 'prior': {'limits': [-5., 5.]}, 'proposal': 0.5}, 'b': {'value': 0., 'prior': {'limits': [-5., 5.]}, 'proposal': 0.5}}
+
+
+class NoiselessLikelihood(BaseGaussianLikelihood):
+
+    # Zero data and covariance 0.3 * identity: the posterior mean is 0, and the posterior covariance is analytic
+    def initialize(self):
+        x = np.linspace(0., 1., 10)
+        super(NoiselessLikelihood, self).initialize(np.zeros_like(x), covariance=0.3 * np.eye(x.size))
+        self.theory = BoundedAffineModel(x=x)
+
+    @property
+    def flattheory(self):
+        return self.theory.y
+
+
+def test_check():
+
+    from desilike.samples import Chain, diagnostics
+
+    likelihood = NoiselessLikelihood()
+    rng = np.random.RandomState(seed=42)
+    chains = [Chain([rng.normal(size=300) for param in likelihood.varied_params], params=likelihood.varied_params) for ichain in range(2)]
+    burnin, nsplits = 150, 4
+    split_chains = [chain[burnin + islab * 37:burnin + (islab + 1) * 37] for islab in range(nsplits) for chain in chains]
+    ref = {'geweke': np.max(diagnostics.geweke(split_chains, likelihood.varied_params, first=0.1, last=0.5)),
+           'eigen_gr': diagnostics.gelman_rubin(split_chains, likelihood.varied_params, method='eigen').max() - 1}
+    for block_size in [1, 20]:  # with blocks of 20 iterations, splits are too short for Geweke statistics on blocks
+        sampler = MCMCSampler(likelihood, chains=chains, seed=42)
+        sampler.check(nsplits=nsplits, burnin=burnin, max_geweke=10., block_size=block_size)
+        assert np.isfinite(sampler.diagnostics['geweke'][-1])
+        if block_size == 1:
+            for name, value in ref.items():
+                assert np.allclose(sampler.diagnostics[name][-1], value)
+
+
+def test_hmc():
+
+    x = np.linspace(0., 1., 10)
+    design = np.column_stack([x, np.ones_like(x)])
+    covariance = np.linalg.inv(design.T.dot(design) / 0.3)
+    likelihood = NoiselessLikelihood()
+    for nsteps in [None, 5]:
+        sampler = HMCSampler(likelihood, chains=2, nwalkers=4, nsteps=nsteps, adapt=200, seed=42)
+        chains = sampler.run(max_iterations=600, check=True, check_every=300)
+        assert chains[0].shape == (600, 4)
+        chain = chains[0].concatenate([chain.remove_burnin(0.5) for chain in chains])
+        assert np.allclose(chain.mean(['a', 'b']), 0., atol=0.1)
+        assert np.allclose(chain.covariance(['a', 'b']), covariance, rtol=0.2, atol=0.02)
+        assert 'loglikelihood' in chain
+        assert np.allclose(chain.logposterior, chain['loglikelihood'] + chain['logprior'])
+    # Only stored points (and starting points) are evaluated with the standard pipeline
+    sampler = HMCSampler(likelihood, chains=1, nwalkers=4, adapt=50, seed=42)
+    chains = sampler.run(max_iterations=100, check=False, check_every=100, thin_by=10)
+    assert chains[0].shape == (10, 4)
+    assert sampler.diagnostics['ncall'][0] <= 4 * (10 + 1)
+
+
+def test_hmc_adaptation():
+
+    # Run with mpiexec -np 3 (or more): chains may then be run by different processes from one batch to the other
+    likelihood = NoiselessLikelihood()
+    for asynchronous in [False, True]:
+        sampler = HMCSampler(likelihood, chains=2, nwalkers=4, adapt=150, seed=42)
+        chains = sampler.run(max_iterations=100, check=False, check_every=50, asynchronous=asynchronous)
+        if sampler.mpicomm.rank == 0:
+            assert all(chain.attrs['adaptation']['iteration'] == 100 for chain in chains)
+        # Resumed run carries on adaptation
+        sampler = HMCSampler(likelihood, chains=chains, adapt=150, seed=42)
+        chains = sampler.run(max_iterations=100, check=False, check_every=50, asynchronous=asynchronous)
+        if sampler.mpicomm.rank == 0:
+            for chain in chains:
+                assert chain.shape == (200, 4)
+                adaptation = chain.attrs['adaptation']
+                assert adaptation['iteration'] == 150 and 'dual_averaging' not in adaptation and np.all(adaptation['inv_metric'] < 1.)
+
+
+def test_async():
+
+    # Run with mpiexec -np 3 (or more) to actually run chains asynchronously
+    likelihood = NoiselessLikelihood()
+    sampler = MCMCSampler(likelihood, chains=2, seed=42)
+    chains = sampler.run(max_iterations=400, check=False, check_every=100, asynchronous=True)
+    if sampler.mpicomm.rank == 0:
+        assert all(chain.shape == (400,) for chain in chains)
+    sampler = MCMCSampler(likelihood, chains=2, seed=42)
+    chains = sampler.run(min_iterations=200, max_iterations=10000, check={'max_eigen_gr': 0.2}, check_every=100, asynchronous=True)
+    if sampler.mpicomm.rank == 0:
+        assert all(200 <= chain.shape[0] < 10000 for chain in chains)
+        assert 'loglikelihood' in chains[0]
+
+
+def test_pt():
+
+    import os
+    import tempfile
+
+    x = np.linspace(0., 1., 10)
+    design = np.column_stack([x, np.ones_like(x)])
+    covariance = np.linalg.inv(design.T.dot(design) / 0.3)
+    likelihood = NoiselessLikelihood()
+    # Gaussian integral over the uniform prior
+    logz = np.log(2. * np.pi * np.linalg.det(covariance)**0.5 / 100.) + likelihood(a=0., b=0.)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        save_fn = [os.path.join(tmp_dir, 'chain_{:d}'.format(i)) for i in range(2)]
+        sampler = PTSampler(likelihood, chains=2, ntemps=6, adapt=200, seed=42, save_fn=save_fn)
+        chains = sampler.run(max_iterations=2000, check=False, check_every=1000)
+        log_evidence = sampler.log_evidence()
+        if sampler.mpicomm.rank == 0:
+            chain = chains[0].concatenate([chain.remove_burnin(0.5) for chain in chains])
+            assert np.allclose(chain.mean(['a', 'b']), 0., atol=0.1)
+            assert np.allclose(chain.covariance(['a', 'b']), covariance, rtol=0.2, atol=0.02)
+            betas = chains[0].attrs['tempering']['betas']
+            assert betas[0] == 1. and betas[-1] == 0. and np.all(np.diff(betas) < 0.)
+            assert np.all(np.abs(log_evidence[:, 0] - logz) < 2. * log_evidence[:, 1] + 0.5)
+        sampler = PTSampler(likelihood, chains=save_fn, ntemps=6, adapt=200, seed=42, save_fn=save_fn)
+        chains = sampler.run(max_iterations=100, check=False)
+        if sampler.mpicomm.rank == 0:
+            assert chains[0].attrs['tempering']['niterations'] == 2100
+            assert np.allclose(chains[0].attrs['tempering']['betas'], betas)
+
+
+def test_checkpoint():
+
+    import os
+    import shutil
+    import tempfile
+    from desilike.samples import Chain
+
+    likelihood = NoiselessLikelihood()
+    for ext in ['', '.npy']:
+        ref = MCMCSampler(likelihood, chains=2, seed=42).run(max_iterations=300, check_every=100, check=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_fn = [os.path.join(tmp_dir, 'chain_{:d}{}'.format(i, ext)) for i in range(2)]
+            checkpoint_fn = os.path.join(tmp_dir, 'checkpoint.npy')
+            # Interrupted run
+            MCMCSampler(likelihood, chains=2, seed=42, save_fn=save_fn, checkpoint_fn=checkpoint_fn).run(max_iterations=200, check_every=100, check=True)
+            shutil.copyfile(checkpoint_fn, checkpoint_fn + '.bak')
+            # Samples saved after checkpoint are dropped
+            MCMCSampler(likelihood, seed=42, save_fn=save_fn, checkpoint_fn=checkpoint_fn).run(max_iterations=250, check_every=50, check=False)
+            shutil.copyfile(checkpoint_fn + '.bak', checkpoint_fn)
+            chains = MCMCSampler(likelihood, seed=84, save_fn=save_fn, checkpoint_fn=checkpoint_fn).run(max_iterations=300, check_every=100, check=True)
+            for ichain, chain in enumerate(chains):
+                assert chain == ref[ichain]
+                assert Chain.load(save_fn[ichain]) == chain
+
+
 if __name__ == '__main__':
 
     setup_logging()
+    test_mh()
+    test_check()
+    test_hmc()
+    test_hmc_adaptation()
+    test_async()
+    test_pt()
+    test_checkpoint()
     #test_nautilus()
     test_samplers()
     #test_fixed()
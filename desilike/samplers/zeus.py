@@ -106,6 +106,10 @@ class ZeusSampler(BaseBatchPosteriorSampler):
             If ``True`` or ``None``, convergence checks are run.
             A dictionary of convergence criteria can be provided, see :meth:`check`.
 
+        asynchronous : bool, default=False
+            If ``True``, run chains asynchronously, without synchronization every ``check_every`` iterations.
+            Requires at least ``nchains + 1`` processes; else chains are run synchronously.
+
         thin_by : int, default=1
             Thin samples by this factor.
         """
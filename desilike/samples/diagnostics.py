@@ -1,5 +1,6 @@
 import logging
 import warnings
+import functools
 
 import numpy as np
 
@@ -79,6 +80,17 @@ def gelman_rubin(chains, params=None, nsplits=None, statistic='mean', method='ei
     covs = np.asarray([chain.covariance(params) for chain in chains])
     wsums = np.asarray([chain.weight.sum() for chain in chains])
     w2sums = np.asarray([(chain.weight * chain.aweight).sum() for chain in chains])
+    toret, matrices = _gelman_rubin(means, covs, wsums, w2sums, method=method, check_valid=check_valid)
+    if isscalar:
+        toret = toret[0]
+    if return_matrices:
+        return toret, matrices
+    return toret
+
+
+def _gelman_rubin(means, covs, wsums, w2sums, method='eigen', check_valid='raise'):
+    # Gelman-Rubin statistics from chain means, covariances, sums of weights and sums of weights x aweights
+    nchains = len(means)
     # W = "within"
     Wn1 = np.average(covs, weights=wsums, axis=0)
     Wn = np.average(((wsums - w2sums / wsums) / wsums)[:, None, None] * covs, weights=wsums, axis=0)
@@ -98,11 +110,7 @@ def gelman_rubin(chains, params=None, nsplits=None, statistic='mean', method='ei
             raise ValueError from exc
     else:
         toret = np.diag(V) / np.diag(Wn1)
-    if isscalar:
-        toret = toret[0]
-    if return_matrices:
-        return toret, (V, Wn1)
-    return toret
+    return toret, (V, Wn1)
 
 
 def autocorrelation(chains, params=None):
@@ -128,16 +136,33 @@ def autocorrelation(chains, params=None):
         chains = [chains]
 
     if params is None: params = chains[0].params(varied=True)
-    if is_parameter_sequence(params):
-        return np.array([autocorrelation(chains, param) for param in params])
+    isscalar = not is_parameter_sequence(params)
+    if isscalar: params = [params]
 
-    toret = 0
-    for chain in chains:
-        value = chain[params].ravel()
-        weight = chain.weight.ravel()
-        x = (value - np.average(value, weights=weight)) * weight
-        toret += _autocorrelation_1d(x)
-    return toret / len(chains)
+    sizes = [chain.size for chain in chains]
+    if not all(size == sizes[0] for size in sizes):
+        raise ValueError('Input chains must have same length, found {}'.format(sizes))
+    size = int(sizes[0])
+    if size < 2:
+        raise ValueError('Not enough samples to estimate autocorrelation, found {:d}'.format(size))
+
+    nchains, nparams = len(chains), len(params)
+    n = 2**(2 * size - 1).bit_length()
+    # Parameters are processed by batches, to limit the size of the padded buffer
+    batch_size = max(min(_max_fft_buffer_size // (nchains * n), nparams), 1)
+    buffer, rfft, irfft = _get_rfft(nchains, n, batch_size)  # zero-padded, reused for all batches
+    weights = [chain.weight.ravel() for chain in chains]
+    toret = np.empty((nparams, size), dtype='f8')
+    for start in range(0, nparams, batch_size):
+        batch = params[start:start + batch_size]
+        for ichain, (chain, weight) in enumerate(zip(chains, weights)):
+            value = np.column_stack([chain[param].ravel() for param in batch])
+            buffer[ichain, :size, :len(batch)] = (value - np.average(value, weights=weight, axis=0)) * weight[:, None]
+        acf = _autocorrelation(buffer, size, rfft, irfft)[..., :len(batch)]
+        toret[start:start + len(batch)] = np.mean(acf, axis=0).T
+    if isscalar:
+        return toret[0]
+    return toret
 
 
 def integrated_autocorrelation_time(chains, params=None, min_corr=None, c=5, reliable=50, check_valid='warn'):
@@ -181,16 +206,13 @@ def integrated_autocorrelation_time(chains, params=None, min_corr=None, c=5, rel
         chains = [chains]
 
     if params is None: params = chains[0].params(varied=True)
-
-    if is_parameter_sequence(params):
-        return np.array([integrated_autocorrelation_time(chains, param, min_corr=min_corr, c=c, reliable=reliable, check_valid=check_valid) for param in params])
+    isscalar = not is_parameter_sequence(params)
+    if isscalar: params = [params]
 
     # Automated windowing procedure following Sokal (1989)
     def auto_window(taus, c):
-        m = np.arange(len(taus)) < c * taus
-        if np.any(m):
-            return np.argmin(m)
-        return len(taus) - 1
+        m = np.arange(taus.shape[-1]) < c * taus
+        return np.where(np.any(m, axis=-1), np.argmin(m, axis=-1), taus.shape[-1] - 1)
 
     sizes = [chain.size for chain in chains]
     if not all(size == sizes[0] for size in sizes):
@@ -202,26 +224,61 @@ def integrated_autocorrelation_time(chains, params=None, min_corr=None, c=5, rel
     corr = autocorrelation(chains, params)
     toret = None
     if min_corr is not None:
-        ix = np.argmin(corr > min_corr * corr[0])
-        toret = 1 + 2 * np.sum(corr[1:ix])
+        ix = np.argmin(corr > min_corr * corr[:, :1], axis=-1)
+        toret = np.array([1 + 2 * np.sum(cc[1:ii]) for cc, ii in zip(corr, ix)])
     elif c is not None:
-        taus = 2 * np.cumsum(corr) - 1  # 1 + 2 sum_{i=1}^{N} f_{i}
+        taus = 2 * np.cumsum(corr, axis=-1) - 1  # 1 + 2 sum_{i=1}^{N} f_{i}
         window = auto_window(taus, c)
-        toret = taus[window]
+        toret = np.take_along_axis(taus, window[:, None], axis=-1)[:, 0]
     else:
         raise ValueError('A criterion must be provided to stop integration of correlation time')
-    if reliable * toret > size:
-        msg = 'The chain is shorter than {:d} times the integrated autocorrelation time for {}. Use this estimate with caution and run a longer chain!\n'.format(reliable, params)
-        msg += 'N/{:d} = {:.0f};\ntau: {}'.format(reliable, size / reliable, toret)
-        if check_valid == 'raise':
-            raise ValueError(msg)
-        elif check_valid == 'warn':
-            warnings.warn(msg)
-        elif check_valid != 'ignore':
-            raise ValueError('check_valid must be one of ["raise", "warn", "ignore"]')
+    for param, tau in zip(params, toret):
+        if reliable * tau > size:
+            msg = 'The chain is shorter than {:d} times the integrated autocorrelation time for {}. Use this estimate with caution and run a longer chain!\n'.format(reliable, param)
+            msg += 'N/{:d} = {:.0f};\ntau: {}'.format(reliable, size / reliable, tau)
+            if check_valid == 'raise':
+                raise ValueError(msg)
+            elif check_valid == 'warn':
+                warnings.warn(msg)
+            elif check_valid != 'ignore':
+                raise ValueError('check_valid must be one of ["raise", "warn", "ignore"]')
+    if isscalar:
+        return toret[0]
     return toret
 
 
+# Maximum number of elements of the padded buffer used for batched FFTs
+_max_fft_buffer_size = 2**26
+
+
+def _get_rfft(nchains, n, nparams):
+    """
+    Return zero-padded buffer of shape (``nchains``, ``n``, ``nparams``), and real FFT and inverse real FFT along axis 1.
+    A new buffer is allocated for each call (not shared between callers), to be reused by the caller for all its FFTs.
+    If pyfftw is installed, FFT plans are built on this buffer, in place, with FFTW_ESTIMATE (cheap, and leaving the buffer untouched),
+    else :mod:`numpy.fft` is used.
+    """
+    try:
+        import pyfftw
+    except ImportError:
+        from numpy import fft
+        buffer = np.zeros((nchains, n, nparams), dtype='f8')
+        return buffer, functools.partial(fft.rfft, axis=1), functools.partial(fft.irfft, n=n, axis=1)
+    buffer = pyfftw.zeros_aligned((nchains, n, nparams), dtype='f8')
+    rfft = pyfftw.builders.rfft(buffer, axis=1, avoid_copy=True, planner_effort='FFTW_ESTIMATE')
+    irfft = pyfftw.builders.irfft(pyfftw.empty_aligned(rfft.output_shape, dtype=rfft.output_dtype), n=n, axis=1, planner_effort='FFTW_ESTIMATE')
+    return buffer, lambda x: rfft(x).copy(), lambda x: irfft(x).copy()
+
+
+def _autocorrelation(x, size, rfft, irfft):
+    # Normalized autocorrelation function along axis 1 of padded array x, for lags < size
+    f = rfft(x)
+    acf = irfft(f.real**2 + f.imag**2)[:, :size]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acf /= acf[:, :1]
+    return acf
+
+
 def _autocorrelation_1d(x):
     """
     Estimate the normalized autocorrelation function.
@@ -237,7 +294,6 @@ def _autocorrelation_1d(x):
     acf : array
         The autocorrelation function of the time series.
     """
-    from numpy import fft
     x = np.atleast_1d(x)
     if x.ndim != 1:
         raise ValueError('Invalid dimensions for 1D autocorrelation function, found {:d}'.format(x.ndim))
@@ -245,13 +301,9 @@ def _autocorrelation_1d(x):
         raise ValueError('Not enough samples to estimate autocorrelation, found {:d}'.format(x.size))
 
     n = 2**(2 * len(x) - 1).bit_length()
-
-    # Compute the FFT and then (from that) the auto-correlation function
-    f = fft.fft(x, n=n)
-    acf = fft.ifft(f * np.conjugate(f))[:len(x)].real
-
-    acf /= acf[0]
-    return acf
+    buffer, rfft, irfft = _get_rfft(1, n, 1)
+    buffer[0, :len(x), 0] = x
+    return _autocorrelation(buffer, len(x), rfft, irfft)[0, :, 0]
 
 
 def geweke(chains, params=None, first=0.1, last=0.5):
@@ -302,3 +354,166 @@ def geweke(chains, params=None, first=0.1, last=0.5):
         toret.append(diff)
 
     return np.array(toret)
+
+
+class StreamingStatistics(utils.BaseClass):
+    """
+    Summary statistics of a chain for convergence diagnostics, updated with new samples only.
+
+    The chain is cut in blocks of ``block_size`` iterations. Cumulative (weighted) sums of samples and of their outer products
+    are accumulated over blocks, such that means and covariances over any range of blocks are obtained in constant time.
+    Per-block quantile sketches are merged in a binary tree, such that confidence intervals over any range of blocks
+    are obtained in a time logarithmic in the number of blocks. Updating with new samples costs O(number of new samples).
+
+    Parameters
+    ----------
+    params : list, ParameterCollection
+        Parameters to compute statistics for.
+
+    block_size : int, default=20
+        Number of iterations (steps) per block.
+        Statistics are estimated over ranges of blocks.
+
+    nquantiles : int, default=512
+        Maximum number of quantiles to keep in each quantile sketch.
+    """
+    def __init__(self, params, block_size=20, nquantiles=512):
+        self.params = [str(param) for param in params]
+        self.block_size = int(block_size)
+        self.nquantiles = int(nquantiles)
+        self.nblocks = 0
+        self._shift = None
+        self._cumsums = {}
+        self._sketches = []
+
+    def update(self, chain):
+        """
+        Update statistics with the new (full blocks of) iterations of ``chain``,
+        which is expected to start with the iterations previously passed to :meth:`update`.
+        """
+        start, stop = self.nblocks * self.block_size, len(chain) // self.block_size * self.block_size
+        if stop < start:
+            raise ValueError('Input chain is shorter ({:d}) than the number of iterations already processed ({:d})'.format(len(chain), start))
+        if stop == start:
+            return self
+        chain = chain[start:stop]
+        nrows, nblocks = len(chain), (stop - start) // self.block_size
+        values = np.stack([chain[param].reshape(nrows, -1) for param in self.params], axis=-1)
+        aweight = chain.aweight.reshape(nrows, -1)
+        weight = chain.fweight.reshape(nrows, -1) * aweight
+        if self._shift is None:  # for numerical stability
+            self._shift = np.average(values.reshape(-1, values.shape[-1]), weights=weight.ravel(), axis=0)
+        values = (values - self._shift).reshape((nblocks, self.block_size) + values.shape[1:])
+        weight, aweight = weight.reshape(values.shape[:-1]), aweight.reshape(values.shape[:-1])
+        sums = {'w': weight.sum(axis=1), 'w2': (weight * aweight).sum(axis=(1, 2)),
+                'x': np.einsum('ijk,ijkl->ikl', weight, values), 'xx': np.einsum('ijk,ijkl,ijkm->ilm', weight, values, values)}
+        for name, value in sums.items():
+            self._append_cumsum(name, value)
+        nvalues = self.block_size * values.shape[2]
+        for value, weight in zip(values.reshape(nblocks, nvalues, -1), weight.reshape(nblocks, nvalues)):
+            self._append_sketch(self._compress(value, weight))
+        self.nblocks += nblocks
+        return self
+
+    def _append_cumsum(self, name, value):
+        # Amortized growth of cumulative sums, of length nblocks + 1
+        cumsum = np.cumsum(value, axis=0)
+        buffer = self._cumsums.get(name, None)
+        size = self.nblocks + 1 + len(value)
+        if buffer is None:
+            buffer = np.zeros((2 * size,) + value.shape[1:], dtype='f8')
+        elif len(buffer) < size:
+            buffer = np.concatenate([buffer, np.zeros_like(buffer, shape=(size,) + buffer.shape[1:])], axis=0)
+        buffer[self.nblocks + 1:size] = buffer[self.nblocks] + cumsum
+        self._cumsums[name] = buffer
+
+    def _compress(self, values, weights):
+        # Return at most nquantiles (weighted) values with the same marginal distributions as input values
+        if len(weights) <= self.nquantiles:
+            return values, weights
+        idx = np.argsort(values, axis=0)
+        cweights = np.cumsum(weights[idx], axis=0)
+        total = cweights[-1, 0]
+        targets = (np.arange(self.nquantiles) + 0.5) / self.nquantiles * total
+        toret = np.empty((self.nquantiles, values.shape[1]), dtype=values.dtype)
+        for iparam in range(values.shape[1]):
+            ind = np.searchsorted(cweights[:, iparam], targets, side='left')
+            toret[:, iparam] = values[idx[ind, iparam], iparam]
+        return toret, np.full(self.nquantiles, total / self.nquantiles, dtype='f8')
+
+    def _merge(self, *sketches):
+        return self._compress(np.concatenate([sketch[0] for sketch in sketches], axis=0), np.concatenate([sketch[1] for sketch in sketches], axis=0))
+
+    def _append_sketch(self, sketch):
+        # Binary tree of sketches: level l holds merged sketches of 2^l consecutive blocks
+        level = 0
+        while True:
+            if len(self._sketches) <= level:
+                self._sketches.append([])
+            sketches = self._sketches[level]
+            sketches.append(sketch)
+            if len(sketches) % 2: break
+            sketch = self._merge(*sketches[-2:])
+            level += 1
+
+    def _get_range(self, start=None, stop=None):
+        if start is None: start = 0
+        if stop is None: stop = self.nblocks
+        if not (0 <= start <= stop <= self.nblocks):
+            raise ValueError('Invalid block range [{}, {}] for {:d} blocks'.format(start, stop, self.nblocks))
+        return start, stop
+
+    def _get_sums(self, start=None, stop=None):
+        start, stop = self._get_range(start, stop)
+        return {name: value[stop] - value[start] for name, value in self._cumsums.items()}
+
+    def mean(self, start=None, stop=None):
+        """Return mean of parameters over blocks ``start`` (included) to ``stop`` (excluded)."""
+        sums = self._get_sums(start, stop)
+        return sums['x'].sum(axis=0) / sums['w'].sum() + self._shift
+
+    def covariance(self, start=None, stop=None, ddof=1):
+        """Return covariance of parameters over blocks ``start`` (included) to ``stop`` (excluded), with the normalization of :func:`numpy.cov`."""
+        sums = self._get_sums(start, stop)
+        wsum, x = sums['w'].sum(), sums['x'].sum(axis=0)
+        fact = wsum - ddof * sums['w2'] / wsum
+        return (sums['xx'] - x[:, None] * x[None, :] / wsum) / fact
+
+    def weight_sums(self, start=None, stop=None):
+        """Return sum of weights and sum of weights x aweights over blocks ``start`` (included) to ``stop`` (excluded)."""
+        sums = self._get_sums(start, stop)
+        return sums['w'].sum(), sums['w2']
+
+    def interval(self, start=None, stop=None, nsigmas=1.):
+        """Return lower and upper bounds (arrays of size the number of parameters) of the ``nsigmas`` confidence interval over blocks ``start`` (included) to ``stop`` (excluded)."""
+        start, stop = self._get_range(start, stop)
+        sketches, level = [], 0
+        while start < stop:
+            if start & 1:
+                sketches.append(self._sketches[level][start])
+                start += 1
+            if stop & 1:
+                stop -= 1
+                sketches.append(self._sketches[level][stop])
+            start, stop, level = start >> 1, stop >> 1, level + 1
+        if not sketches:
+            raise ValueError('Not enough blocks for interval estimation')
+        values = np.concatenate([sketch[0] for sketch in sketches], axis=0) + self._shift
+        weights = np.concatenate([sketch[1] for sketch in sketches], axis=0)
+        return tuple(np.array(limits) for limits in zip(*[utils.interval(value, weights, nsigmas=nsigmas) for value in values.T]))
+
+    def integrated_autocorrelation_time(self, start=None, stop=None):
+        """
+        Estimate integrated autocorrelation time (averaged over walkers) over blocks ``start`` (included) to ``stop`` (excluded),
+        with non-overlapping batch means of about square root of the number of iterations.
+        """
+        start, stop = self._get_range(start, stop)
+        batch_size = max(int(np.sqrt((stop - start) * self.block_size) / self.block_size + 0.5), 1)
+        nbatches = (stop - start) // batch_size
+        if nbatches < 2:
+            raise ValueError('Not enough blocks ({:d}) to estimate autocorrelation time'.format(stop - start))
+        edges = start + batch_size * np.arange(nbatches + 1)
+        w = np.diff(self._cumsums['w'][edges], axis=0)
+        means = np.diff(self._cumsums['x'][edges], axis=0) / w[..., None]
+        var = np.diag(self.covariance(start, stop))
+        return np.mean(batch_size * self.block_size * np.var(means, axis=0, ddof=1) / var, axis=0)
@@ -79,10 +79,37 @@ def test_stats():
     assert np.ndim(diagnostics.gelman_rubin(chains, 'like.a', method='eigen')) == 0
     assert diagnostics.gelman_rubin(chains, ['like.a'], method='eigen').shape == (1,)
     assert np.ndim(diagnostics.integrated_autocorrelation_time(chains, 'like.a')) == 0
+    assert np.allclose(diagnostics.autocorrelation(chains, params)[1], diagnostics.autocorrelation(chains, params[1]))
+    assert np.allclose(diagnostics.integrated_autocorrelation_time(chains, params)[2], diagnostics.integrated_autocorrelation_time(chains, params[2]))
     assert diagnostics.geweke(chains, params=['like.a'] * 2, first=0.25, last=0.75).shape == (2, len(chains))
     print(chain.to_stats(tablefmt='latex_raw'))
 
 
+
+def test_streaming_statistics():
+    params = ['like.a', 'like.b', 'like.c', 'like.d']
+    mean, cov, chain = get_chain(params, nwalkers=4, size=4000)
+    chain.fweight = np.random.RandomState(seed=42).randint(1, 4, size=chain.shape)
+    statistics = diagnostics.StreamingStatistics(params, block_size=20)
+    for size in [55, 55, 1000, 4000]: statistics.update(chain[:size])
+    assert statistics.nblocks == 200
+    sub = chain[400:2200]
+    assert np.allclose(statistics.mean(20, 110), sub.mean(params))
+    assert np.allclose(statistics.covariance(20, 110), sub.covariance(params))
+    lower, upper = statistics.interval(20, 110)
+    assert np.allclose(lower, [sub.interval(param)[0] for param in params], rtol=0.1, atol=0.1)
+    assert np.allclose(upper, [sub.interval(param)[1] for param in params], rtol=0.1, atol=0.1)
+    assert np.allclose(statistics.integrated_autocorrelation_time(), 1., atol=0.5)
+    chains = [chain[islab * 1000:(islab + 1) * 1000] for islab in range(4)]
+    means, covs, weights = [], [], []
+    for islab in range(4):
+        means.append(statistics.mean(islab * 50, (islab + 1) * 50))
+        covs.append(statistics.covariance(islab * 50, (islab + 1) * 50))
+        weights.append(statistics.weight_sums(islab * 50, (islab + 1) * 50))
+    wsums, w2sums = np.array(weights).T
+    gr = diagnostics._gelman_rubin(np.array(means), np.array(covs), wsums, w2sums, method='eigen')[0]
+    assert np.allclose(gr, diagnostics.gelman_rubin(chains, params, method='eigen'))
+
 def test_bcast():
     from desilike.parameter import ParameterArray
     import mpytools as mpy
@@ -128,6 +155,40 @@ def test_solved():
     print(chain.to_stats(tablefmt='pretty'))
 
 
+def test_columns():
+
+    chain_dir = '_chains'
+    params = ['like.a', 'like.b']
+    mean, cov, chain = get_chain(params, nwalkers=4, size=1000)
+    chain['like.a'].param.update(latex='a', prior=ParameterPrior(limits=(-10., 10.)))
+    chain.attrs['ndof'] = np.int64(10)
+    fn = os.path.join(chain_dir, 'chain_columns')
+    chain[:100].write_columns(fn)
+    chain[100:300].write_columns(fn, append=True)
+    chain[300:].write_columns(fn, append=True)
+    chain2 = Chain.load(fn)
+    assert chain2 == chain
+    assert chain2.attrs == chain.attrs
+    assert chain2['like.a'].param.prior == chain['like.a'].param.prior
+    assert chain2._loglikelihood == chain._loglikelihood
+    chain2 = Chain.read_columns(fn, params=['like.b'], start=200, stop=400, mmap_mode='r')
+    assert chain2.names() == ['like.b']
+    assert np.all(chain2['like.b'] == chain['like.b'][200:400])
+    try:
+        Chain([chain['like.a']]).write_columns(fn, append=True)
+    except ValueError:
+        pass
+    else:
+        raise ValueError
+    from desilike.samples import Profiles
+    try:
+        Profiles.load(fn)
+    except IsADirectoryError:
+        pass
+    else:
+        raise ValueError
+
+
 def test_cholesky():
     ndim = 4
     cov = np.random.uniform(size=(ndim, ndim))
@@ -148,6 +209,8 @@ if __name__ == '__main__':
     test_bcast()
     test_misc()
     test_stats()
+    test_streaming_statistics()
     test_plot()
     test_solved()
+    test_columns()
     # test_cholesky()
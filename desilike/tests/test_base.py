@@ -224,6 +224,270 @@ def test_cosmo():
     print(theory.runtime_info.pipeline.params)
 
 
+from desilike.base import BaseCalculator
+
+
+class AffineModel(BaseCalculator):
+
+    _params = {'a': {'value': 0., 'prior': {'limits': [-5., 5.]}}, 'b': {'value': 0., 'prior': {'limits': [-5., 5.]}}}
+
+    def initialize(self, x=None):
+        self.x = x
+
+    def calculate(self, a=0., b=0.):
+        self.y = a * self.x + b
+
+
+from desilike.likelihoods import BaseGaussianLikelihood
+
+
+class Likelihood(BaseGaussianLikelihood):
+
+    def initialize(self, theory=None):
+        x = np.linspace(0., 1., 10)
+        super(Likelihood, self).initialize(np.zeros_like(x), covariance=np.eye(x.size))
+        if theory is None:
+            theory = AffineModel()
+        self.theory = theory
+        self.theory.init.update(x=x)
+
+    @property
+    def flattheory(self):
+        return self.theory.y
+
+
+def test_batch():
+
+    class CountingAffineModel(AffineModel):
+
+        def initialize(self, x=None):
+            super(CountingAffineModel, self).initialize(x=x)
+            self.ncalls = 0
+
+        def calculate(self, a=0., b=0.):
+            self.ncalls += 1
+            super(CountingAffineModel, self).calculate(a=np.asarray(a)[..., None], b=np.asarray(b)[..., None])
+
+    class BatchAffineModel(CountingAffineModel):
+
+        _batch = True
+
+    class BatchLikelihood(Likelihood):
+
+        _batch = True
+
+    rng = np.random.RandomState(seed=42)
+    a, b = rng.uniform(-1., 1., size=(2, 10))
+    ref = None
+    for Model, Lik, ncalls in [(CountingAffineModel, Likelihood, a.size + 1), (BatchAffineModel, Likelihood, a.size + 1), (BatchAffineModel, BatchLikelihood, 2)]:
+        likelihood = Lik(theory=Model())
+        likelihood()
+        pipeline = likelihood.runtime_info.pipeline
+        pipeline.mpicalculate(a=a, b=b)
+        assert likelihood.theory.ncalls == ncalls
+        if ref is None: ref = pipeline.derived
+        for param in ref.params():
+            assert np.allclose(pipeline.derived[param], ref[param])
+        assert np.allclose(likelihood(a=a[0], b=b[0]), ref['loglikelihood'][0] + ref['logprior'][0])
+
+
+def test_jit():
+
+    rng = np.random.RandomState(seed=42)
+    a, b = rng.uniform(-1., 1., size=(2, 10))
+    likelihood = Likelihood()
+    likelihood()
+    pipeline = likelihood.runtime_info.pipeline
+    pipeline.mpicalculate(a=a, b=b)
+    ref = pipeline.derived
+    func = pipeline.get_jit()
+    assert func is not None and pipeline.get_jit() is func
+    derived = func(a, b)
+    for param in ref.params():
+        assert np.allclose(derived[param.name], ref[param])
+    pipeline.jit = True
+    pipeline.mpicalculate(a=a, b=b)
+    for param in ref.params():
+        assert np.allclose(pipeline.derived[param], ref[param])
+    assert np.allclose(likelihood(a=a[0], b=b[0]), ref['loglikelihood'][0] + ref['logprior'][0])
+    func_grad = pipeline.get_jit(grad=['loglikelihood', 'logprior'])
+    derived, grad = func_grad(a, b)
+    assert np.allclose(derived['loglikelihood'], ref['loglikelihood'])
+    x = likelihood.theory.x
+    y = a[:, None] * x + b[:, None]
+    assert grad.shape == (a.size, 2)
+    assert np.allclose(grad, np.column_stack([-np.sum(y * x, axis=-1), -np.sum(y, axis=-1)]))
+    likelihood.all_params['b'].update(fixed=True, value=0.5)
+    assert pipeline.get_jit() is not func
+
+
+def test_cache():
+
+    class CountingAffineModel(AffineModel):
+
+        ncalls = 0  # class attribute, as instance attributes are restored from the cache
+
+        def calculate(self, a=0., b=0.):
+            CountingAffineModel.ncalls += 1
+            super(CountingAffineModel, self).calculate(a=a, b=b)
+
+    likelihood = Likelihood(theory=CountingAffineModel())
+    likelihood()
+    likelihood.theory.runtime_info.set_cache(size=2)
+    ref = [likelihood(a=a, b=0.5) for a in [0.1, 0.2, 0.1, 0.2]]
+    assert CountingAffineModel.ncalls == 1 + 2
+    assert np.allclose(ref[2:], ref[:2])
+    cache = likelihood.theory.runtime_info.cache
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+    likelihood(a=0.3, b=0.5)
+    likelihood(a=0.1, b=0.5)  # discarded
+    assert CountingAffineModel.ncalls == 1 + 4
+    assert cache.memory > 0.
+    likelihood.theory.runtime_info.set_cache(size=10, max_memory=2e-4)
+    for a in np.linspace(0., 1., 5): likelihood(a=a, b=0.5)
+    assert len(likelihood.theory.runtime_info.cache) == 1
+    likelihood.theory.runtime_info.set_cache(size=0)
+    assert likelihood.theory.runtime_info.cache is None
+
+
+def test_dependency_index():
+
+    from desilike.likelihoods import SumLikelihood
+
+    likelihoods = []
+    for namespace in ['LRG', 'ELG']:
+        theory = AffineModel()
+        for param in theory.init.params: param.update(namespace=namespace)
+        likelihoods.append(Likelihood(theory=theory))
+    likelihood = SumLikelihood(likelihoods)
+    likelihood.all_params['ELG.a'].update(derived='{LRG.a}')
+    likelihood()
+    pipeline = likelihood.runtime_info.pipeline
+    theories = [likelihood.theory for likelihood in likelihoods]
+
+    def get_ref(**params):
+        for calculator in pipeline.calculators: calculator.runtime_info.tocalculate = True
+        pipeline._last_values = None
+        return likelihood(**params)
+
+    likelihood(**{'LRG.a': 0.2, 'LRG.b': 0.1, 'ELG.b': 0.3})
+    assert all(theory.runtime_info.calculated for theory in theories)
+    toret = likelihood(**{'ELG.b': 0.4})
+    assert [theory.runtime_info.calculated for theory in theories] == [False, True]
+    assert np.allclose(theories[1].y, 0.2 * theories[1].x + 0.4)
+    assert np.allclose(toret, get_ref(**{'ELG.b': 0.4}))
+    toret = likelihood(**{'LRG.a': 0.5})  # ELG.a depends on LRG.a
+    assert all(theory.runtime_info.calculated for theory in theories)
+    assert np.allclose(theories[1].y, 0.5 * theories[1].x + 0.4)
+    theories[0](**{'LRG.a': 1., 'LRG.b': 1.})  # input values set by another pipeline
+    assert np.allclose(likelihood(), toret)
+    assert np.allclose(likelihood(), get_ref())
+    # Parameter depending on two changed inputs is evaluated once
+    likelihood.all_params['ELG.a'].update(derived='{LRG.a} + {LRG.b}')
+    for i in range(2): likelihood()  # dependency index is up-to-date after the second call
+    pipeline = likelihood.runtime_info.pipeline
+    pipeline.input_values.update({'LRG.a': 0.3, 'LRG.b': 0.2})
+    values, changed = pipeline._eval_input_values()
+    assert np.allclose(values['ELG.a'], 0.5)
+    assert changed and all(len(names) == len(set(names)) for names in changed.values())
+
+
+def test_threads():
+
+    import threading
+    from desilike.base import PipelineError
+    from desilike.likelihoods import SumLikelihood
+
+    class BarrierAffineModel(AffineModel):
+
+        barrier = None
+
+        def calculate(self, a=0., b=0.):
+            if self.barrier is not None: self.barrier.wait(timeout=10)  # fails if models are not run concurrently
+            if a > 4.: raise ValueError
+            super(BarrierAffineModel, self).calculate(a=a, b=b)
+
+    likelihoods = []
+    for namespace in ['LRG', 'ELG']:
+        theory = BarrierAffineModel()
+        for param in theory.init.params: param.update(namespace=namespace)
+        likelihoods.append(Likelihood(theory=theory))
+    likelihood = SumLikelihood(likelihoods)
+    likelihood()
+    pipeline = likelihood.runtime_info.pipeline
+    params = {'LRG.a': 0.2, 'LRG.b': 0.1, 'ELG.a': 0.3, 'ELG.b': 0.3}
+    ref = likelihood(**params)
+    params2 = {name: 2 * value for name, value in params.items()}
+    ref2 = likelihood(**params2)
+    likelihood(**params)
+    pipeline.nthreads = 2
+    BarrierAffineModel.barrier = threading.Barrier(2)
+    assert np.allclose(likelihood(**params2), ref2)
+    BarrierAffineModel.barrier = None
+    assert np.allclose(likelihood(**params), ref)
+    assert np.allclose(pipeline.derived['loglikelihood'], ref)
+    try:
+        likelihood(**{'ELG.a': 4.5})
+    except PipelineError as exc:
+        assert isinstance(exc.__cause__, ValueError)
+    else:
+        raise AssertionError('expected PipelineError')
+    assert np.allclose(likelihood(**params), ref)
+
+
+def test_mpischedule():
+
+    class FailingAffineModel(AffineModel):
+
+        def calculate(self, a=0., b=0.):
+            if b > 0.9: raise ValueError
+            super(FailingAffineModel, self).calculate(a=a, b=b)
+
+    likelihood = Likelihood(theory=FailingAffineModel())
+    likelihood()
+    pipeline = likelihood.runtime_info.pipeline
+    rng = np.random.RandomState(seed=42)
+    a, b = rng.uniform(0., 1., size=(2, 4, 5))
+    ref = None
+    for schedule in ['static', 'dynamic']:
+        pipeline.mpischedule, pipeline.mpichunksize = schedule, 3
+        pipeline.mpicalculate(a=a, b=b)
+        if pipeline.mpicomm.rank == 0:
+            assert sorted(pipeline.errors) == np.flatnonzero(b.ravel() > 0.9).tolist()
+            assert sum(pipeline.mpistats['npoints']) == a.size
+            assert len(pipeline.mpistats['utilization']) == pipeline.mpicomm.size
+            if ref is None: ref = pipeline.derived
+            assert np.allclose(pipeline.derived['loglikelihood'], ref['loglikelihood'])
+
+
+def test_profile():
+
+    import os
+    import json
+    import tempfile
+
+    likelihood = Likelihood(theory=AffineModel())
+    likelihood()
+    pipeline = likelihood.runtime_info.pipeline
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        save_fn, trace_fn = os.path.join(tmp_dir, 'profile.json'), os.path.join(tmp_dir, 'trace.json')
+        pipeline.set_profile(save_fn=save_fn, trace_fn=trace_fn)
+        for a in [0.1, 0.2, 0.3]: likelihood(a=a)
+        likelihood(a=0.3)
+        summary = pipeline.get_profile().summary()
+        assert summary['AffineModel']['calculate']['ncalls'] == 3 and summary['AffineModel']['calculate']['nskipped'] == 1
+        assert summary['Likelihood']['initialize']['ncalls'] == 1
+        assert summary['Likelihood']['calculate']['p50'] <= summary['Likelihood']['calculate']['max']
+        pipeline.dump_profile()
+        with open(save_fn) as file:
+            assert json.load(file) == json.loads(json.dumps(summary))
+        with open(trace_fn) as file:
+            assert len(json.load(file)['traceEvents']) == 2 + 2 * 3
+    pipeline.set_profile(False)
+    likelihood(a=0.4)
+    assert 'calculate' not in pipeline.get_profile().profiles['AffineModel']
+
+
 def test_install():
 
     from desilike.observables.galaxy_clustering import TracerPowerSpectrumMultipolesObservable
@@ -253,4 +517,11 @@ if __name__ == '__main__':
     #test_params()
     test_copy()
     #test_cosmo()
+    test_batch()
+    test_jit()
+    test_cache()
+    test_dependency_index()
+    test_threads()
+    test_mpischedule()
+    test_profile()
     #test_install()
@@ -77,6 +77,31 @@ def test_matrix():
     assert np.ndim(covariance.fom()) == 0
 
 
+def test_samples_append():
+    rng = np.random.RandomState(seed=42)
+    params = [Parameter('a'), Parameter('b', shape=3)]
+    batches = [Samples([rng.uniform(size=n), rng.uniform(size=(n, 3))], params=params) for n in [1, 5, 30, 2, 100]]
+    ref = Samples.concatenate(batches)
+    samples = batches[0].copy()
+    first = None
+    for batch in batches[1:]:
+        samples.append(batch)
+        if first is None: first = samples['a']
+    assert samples == ref
+    assert samples['b'].shape == (138, 3)
+    assert np.allclose(first, ref['a'][:6])  # views remain valid
+    copy = samples.copy()
+    copy.append(batches[0])
+    assert samples == ref
+    assert copy.size == ref.size + 1
+    assert np.allclose(copy['a'][-1], batches[0]['a'][0])
+    samples['a'] = samples['a'] * 2.  # replaced array is not a view of the buffer anymore
+    samples.append(batches[1])
+    assert np.allclose(samples['a'], np.concatenate([2. * ref['a'], batches[1]['a']]))
+    samples.append(Samples({'a': np.ones(2), 'c': np.ones(2)}), intersection=True)
+    assert samples.names() == ['a'] and samples.size == ref.size + 7
+
+
 if __name__ == '__main__':
 
     test_prior()
@@ -84,3 +109,4 @@ if __name__ == '__main__':
     test_param_array()
     test_collection()
     test_matrix()
+    test_samples_append()
@@ -4,12 +4,13 @@ import os
 import sys
 import time
 import logging
+import threading
 import traceback
 import warnings
 import functools
 import importlib
 from pathlib import Path
-from collections import UserDict
+from collections import UserDict, OrderedDict
 import math
 
 import numpy as np
@@ -301,6 +302,12 @@ class BaseClass(object, metaclass=BaseMetaClass):
 
     @classmethod
     def load(cls, filename, fallback_class=None):
+        if os.path.isdir(filename):  # directory of columns, see :meth:`Samples.write_columns`
+            from .parameter import Samples
+            if cls is BaseClass: cls = Samples
+            if not hasattr(cls, 'read_columns'):
+                raise IsADirectoryError('Cannot load {} from directory {}: only samples can be read from a directory of columns'.format(cls.__name__, filename))
+            return cls.read_columns(filename)
         state = np.load(filename, allow_pickle=True)[()]
         if (cls is BaseClass or fallback_class is not None) and '__class__' in state:
             cls = state['__class__']
@@ -753,6 +760,290 @@ class Monitor(BaseClass):
         """Exit context."""
 
 
+_process = None
+
+
+def _get_memory():
+    # Return resident memory (in MB) of the current process, NaN if psutil is not installed
+    global _process
+    if _process is None:
+        try:
+            import psutil
+        except ImportError:
+            _process = False
+        else:
+            _process = psutil.Process(os.getpid())
+    if not _process:
+        return np.nan
+    return _process.memory_info().rss / 1e6
+
+
+class CallProfile(BaseClass):
+    """
+    Record calls, e.g. to :meth:`BaseCalculator.calculate`: start time, duration and memory change
+    (the latter requires package psutil to be installed, else NaN), as well as the number of skipped calls:
+
+    >>> profile = CallProfile()
+    >>> profile.start()
+    >>> ...
+    >>> profile.stop()
+    >>> profile.summary()['ncalls']
+    1
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget about previous calls."""
+        self.starts, self.durations, self.memories, self.threads, self.ranks = [], [], [], [], []
+        self.nskipped = 0
+        self._start = None
+
+    def start(self):
+        """Start recording a call."""
+        self._start = (time.time(), _get_memory())
+
+    def stop(self):
+        """Stop recording a call."""
+        stop = (time.time(), _get_memory())
+        self.starts.append(self._start[0])
+        self.durations.append(stop[0] - self._start[0])
+        self.memories.append(stop[1] - self._start[1])
+        self.threads.append(threading.get_ident())
+        self.ranks.append(0)
+
+    def skip(self):
+        """Record a skipped call."""
+        self.nskipped += 1
+
+    @property
+    def ncalls(self):
+        """Number of recorded calls."""
+        return len(self.durations)
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """
+        Return dictionary of statistics: number of calls ``ncalls``, of skipped calls ``nskipped``,
+        total, mean, maximum and ``percentiles`` of call durations (in seconds), and total memory change ``memory`` (in MB).
+        """
+        durations = np.array(self.durations, dtype='f8')
+        toret = {'ncalls': self.ncalls, 'nskipped': self.nskipped, 'total': durations.sum()}
+        if self.ncalls:
+            toret['mean'] = durations.mean()
+            toret.update({'p{:d}'.format(p): value for p, value in zip(percentiles, np.percentile(durations, percentiles))})
+            toret['max'] = durations.max()
+        else:
+            toret['mean'] = np.nan
+            toret.update({'p{:d}'.format(p): np.nan for p in percentiles})
+            toret['max'] = np.nan
+        toret['memory'] = float(np.sum(self.memories))
+        return {name: (float(value) if name not in ['ncalls', 'nskipped'] else int(value)) for name, value in toret.items()}
+
+    @classmethod
+    def concatenate(cls, *others):
+        """Concatenate input profiles, e.g. from different MPI ranks."""
+        if len(others) == 1 and is_sequence(others[0]): others = others[0]
+        new = cls()
+        for other in others:
+            for name in ['starts', 'durations', 'memories', 'threads', 'ranks']:
+                getattr(new, name).extend(getattr(other, name))
+            new.nskipped += other.nskipped
+        return new
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in ['starts', 'durations', 'memories', 'threads', 'ranks', 'nskipped']}
+
+
+class ProfileReport(BaseClass):
+    """
+    Report of :class:`CallProfile` instances, for several objects (e.g. calculators) and sections (e.g. 'initialize', 'calculate'),
+    typically obtained with :meth:`BasePipeline.get_profile`.
+    """
+    def __init__(self, profiles=None):
+        """
+        Initialize :class:`ProfileReport`.
+
+        Parameters
+        ----------
+        profiles : dict, default=None
+            Dictionary mapping object name to a dictionary mapping section name to :class:`CallProfile`.
+        """
+        self.profiles = dict(profiles or {})
+
+    @classmethod
+    def gather(cls, report, mpicomm=None, mpiroot=0):
+        """Gather :class:`ProfileReport` ``report`` from all ranks of ``mpicomm`` on rank ``mpiroot``, where it is returned; ``None`` is returned on other ranks."""
+        if mpicomm is None or mpicomm.size == 1:
+            return report
+        reports = mpicomm.gather(report, root=mpiroot)
+        if mpicomm.rank != mpiroot:
+            return None
+        profiles = {}
+        for rank, report in enumerate(reports):
+            for name, sections in report.profiles.items():
+                profiles.setdefault(name, {})
+                for section, profile in sections.items():
+                    profile = profile.copy()
+                    profile.ranks = [rank] * profile.ncalls
+                    profiles[name][section] = CallProfile.concatenate([profiles[name][section], profile]) if section in profiles[name] else profile
+        return cls(profiles)
+
+    def summary(self, **kwargs):
+        """Return dictionary mapping object and section names to :meth:`CallProfile.summary`."""
+        return {name: {section: profile.summary(**kwargs) for section, profile in sections.items()} for name, sections in self.profiles.items()}
+
+    def table(self, sort='total', **kwargs):
+        """
+        Return table (string) of statistics, sorted by decreasing ``sort`` statistics (e.g. 'total', 'mean', 'ncalls').
+        Durations are in milliseconds (total in seconds), memory change in MB.
+        """
+        rows = [(name, section, summary) for name, sections in self.summary(**kwargs).items() for section, summary in sections.items()]
+        if sort is not None:
+            rows = sorted(rows, key=lambda row: -np.nan_to_num(row[2][sort]))
+        columns = ['ncalls', 'nskipped', 'total'] + [name for name in (rows[0][2] if rows else {}) if name not in ['ncalls', 'nskipped', 'total']]
+        header = ['name', 'section'] + [column + (' [s]' if column == 'total' else ' [MB]' if column == 'memory' else '' if column.startswith('n') else ' [ms]') for column in columns]
+        lines = [header]
+        for name, section, summary in rows:
+            line = [name, section]
+            for column in columns:
+                value = summary[column]
+                if column.startswith('n'): line.append('{:d}'.format(value))
+                elif column in ['total', 'memory']: line.append('{:.4g}'.format(value))
+                else: line.append('{:.4g}'.format(1e3 * value))
+            lines.append(line)
+        widths = [max(len(line[icol]) for line in lines) for icol in range(len(header))]
+        return '\n'.join(' | '.join(item.ljust(width) for item, width in zip(line, widths)) for line in lines)
+
+    def to_json(self, fn=None, **kwargs):
+        """Return :meth:`summary` as a JSON string; if ``fn`` is provided, save it to this file."""
+        import json
+        toret = json.dumps(self.summary(**kwargs), indent=2)
+        if fn is not None:
+            self.log_info('Saving {}.'.format(fn))
+            mkdir(os.path.dirname(fn))
+            with open(fn, 'w') as file:
+                file.write(toret)
+        return toret
+
+    def to_chrome_trace(self, fn=None):
+        """
+        Return recorded calls as a dictionary in the Chrome trace event format
+        (to be visualized with e.g. chrome://tracing or https://ui.perfetto.dev); if ``fn`` is provided, save it to this file (as JSON).
+        """
+        import json
+        events = []
+        for name, sections in self.profiles.items():
+            for section, profile in sections.items():
+                for start, duration, memory, thread, rank in zip(profile.starts, profile.durations, profile.memories, profile.threads, profile.ranks):
+                    event = {'name': name, 'cat': section, 'ph': 'X', 'ts': 1e6 * start, 'dur': 1e6 * duration, 'pid': rank, 'tid': thread}
+                    if not np.isnan(memory): event['args'] = {'memory': memory}
+                    events.append(event)
+        toret = {'traceEvents': sorted(events, key=lambda event: event['ts']), 'displayTimeUnit': 'ms'}
+        if fn is not None:
+            self.log_info('Saving {}.'.format(fn))
+            mkdir(os.path.dirname(fn))
+            with open(fn, 'w') as file:
+                json.dump(toret, file)
+        return toret
+
+    def __str__(self):
+        return self.table()
+
+
+def _nbytes(value):
+    # Approximate memory footprint of (possibly nested) arrays
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class LRUCache(BaseClass):
+    """
+    Bounded least-recently-used cache, with memory accounting and hit / miss statistics.
+
+    >>> cache = LRUCache(size=2)
+    >>> cache.set('a', 1); cache.set('b', 2)
+    >>> cache.get('a')
+    1
+    >>> cache.set('c', 3)
+    >>> 'b' in cache
+    False
+    """
+    def __init__(self, size=100, max_memory=None):
+        """
+        Initialize :class:`LRUCache`.
+
+        Parameters
+        ----------
+        size : int, default=100
+            Maximum number of entries.
+
+        max_memory : float, default=None
+            Maximum memory, in MB, of stored (array) entries. If ``None``, no limit.
+        """
+        self.size = int(size)
+        self.max_memory = max_memory
+        self.clear()
+
+    def clear(self):
+        """Remove all entries and reset statistics."""
+        self._data = OrderedDict()
+        self._nbytes = {}
+        self.nbytes = 0
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        """Return value for ``key`` (marking it as most recently used) if in cache, else ``default``."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, nbytes=None):
+        """Add ``value`` for ``key``, discarding least recently used entries if :attr:`size` or :attr:`max_memory` is exceeded."""
+        if key in self._data:
+            self.pop(key)
+        if nbytes is None: nbytes = _nbytes(value)
+        self._data[key] = value
+        self._nbytes[key] = nbytes
+        self.nbytes += nbytes
+        max_nbytes = None if self.max_memory is None else self.max_memory * 1e6
+        while self._data and (len(self._data) > self.size or (max_nbytes is not None and self.nbytes > max_nbytes)):
+            self.pop(next(iter(self._data)))
+
+    def pop(self, key):
+        """Remove entry ``key`` and return its value."""
+        self.nbytes -= self._nbytes.pop(key)
+        return self._data.pop(key)
+
+    @property
+    def memory(self):
+        """Memory, in MB, of stored entries."""
+        return self.nbytes / 1e6
+
+    @property
+    def hit_rate(self):
+        """Fraction of :meth:`get` calls that found the requested key."""
+        ncalls = self.hits + self.misses
+        if ncalls == 0: return np.nan
+        return self.hits / ncalls
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return '{}(size={:d}/{:d}, memory={:.3g} MB, hits={:d}, misses={:d})'.format(self.__class__.__name__, len(self), self.size, self.memory, self.hits, self.misses)
+
+
 def expand_dict(di, names):
     """
     Expand input dictionary, taking care of wildcards, e.g.:
@@ -1090,6 +1381,9 @@ class MPITaskManager(BaseClass):
 
     The main function is ``iterate`` which iterates through a set of tasks,
     distributing the tasks in parallel over the available ranks.
+    After ``iterate`` or ``map``, :attr:`stats` (on the root rank, on all ranks for ``map``) holds
+    utilization statistics: ``wall_time`` (time spent distributing tasks), and for each rank of the base communicator,
+    ``tasks`` (list of task numbers) and ``busy_time`` (time spent on these tasks).
 
     Taken from nbodykit.
     """
@@ -1195,8 +1489,12 @@ class MPITaskManager(BaseClass):
         except AttributeError:
             raise ValueError('Workers are only defined when inside the ``with MPITaskManager()`` context')
 
-    def _get_tasks(self):
-        """Internal generator that yields the next available task from a worker."""
+    def _get_tasks(self, results=None):
+        """
+        Internal generator that yields the next available task from a worker.
+        If provided, the result of each task is taken from the ``results`` dictionary (filled by the caller)
+        and sent back to the root when the task is done.
+        """
 
         if self.is_root():
             raise RuntimeError('Root rank mistakenly told to await tasks')
@@ -1224,12 +1522,15 @@ class MPITaskManager(BaseClass):
             if tag == self.tags.START:
 
                 # yield the task value
+                t0 = time.time()
                 yield args
+                busy_time = time.time() - t0
 
                 # wait for everyone in task group before telling root this task is done
                 self.mpicomm.Barrier()
                 if self.mpicomm.rank == 0:
-                    self.basecomm.send([args[0], None], dest=0, tag=self.tags.DONE)
+                    result = results.pop(args[0], None) if results is not None else None
+                    self.basecomm.send([args[0], result, busy_time], dest=0, tag=self.tags.DONE)
 
             # see ya later
             elif tag == self.tags.EXIT:
@@ -1252,6 +1553,9 @@ class MPITaskManager(BaseClass):
         ntasks = len(tasks)
         task_index = 0
         closed_workers = 0
+        self.results = {}
+        self.stats = {'wall_time': 0., 'tasks': [[] for rank in range(self.size)], 'busy_time': [0.] * self.size}
+        t0 = time.time()
 
         # logging info
         self.log_debug('root starting with {:d} worker(s) with {:d} total tasks'.format(self.workers, ntasks))
@@ -1280,6 +1584,10 @@ class MPITaskManager(BaseClass):
 
             # store the results from finished tasks
             elif tag == self.tags.DONE:
+                task_number, result, busy_time = data
+                self.results[task_number] = result
+                self.stats['tasks'][source].append(task_number)
+                self.stats['busy_time'][source] += busy_time
                 self.log_debug('received result from worker {:d}'.format(source))
 
             # track workers that exited
@@ -1287,6 +1595,8 @@ class MPITaskManager(BaseClass):
                 closed_workers += 1
                 self.log_debug('worker {:d} has exited, closed workers = {:d}'.format(source, closed_workers))
 
+        self.stats['wall_time'] = time.time() - t0
+
     def iterate(self, tasks):
         """
         Iterate through a series of tasks in parallel.
@@ -1339,31 +1649,31 @@ class MPITaskManager(BaseClass):
         results : list
             The list of the return values of ``function``.
         """
-        results = []
+        results = None
 
-        # root distributes the tasks and tracks closed workers
+        # root distributes the tasks, tracks closed workers and receives results as they come
         if self.is_root():
             self._distribute_tasks(tasks)
+            results = [self.results.pop(tasknum) for tasknum in range(len(tasks))]
 
         # workers will wait for instructions
         elif self.is_worker():
 
             # iterate through tasks in parallel
-            for tasknum, args in self._get_tasks():
+            worker_results = {}
+            for tasknum, args in self._get_tasks(results=worker_results):
 
                 # make function arguments consistent with *args
                 if not isinstance(args, tuple):
                     args = (args,)
 
-                # compute the result (only worker root needs to save)
+                # compute the result (only worker root needs to send it back)
                 result = function(*args)
                 if self.mpicomm.rank == 0:
-                    results.append((tasknum, result))
+                    worker_results[tasknum] = result
 
-        # put the results in the correct order
-        results = self.basecomm.allgather(results)
-        results = [item for sublist in results for item in sublist]
-        return [r[1] for r in sorted(results, key=lambda x: x[0])]
+        self.stats = self.basecomm.bcast(self.stats if self.is_root() else None, root=0)
+        return self.basecomm.bcast(results, root=0)
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
         """Exit gracefully by closing and freeing the MPI-related variables."""